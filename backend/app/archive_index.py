@@ -0,0 +1,324 @@
+"""
+random-access index over a GOGDB snapshot archive.
+
+a one-time pass records where every product.json and numeric build manifest starts
+in the uncompressed tar stream. optionally the pass also re-packs the archive as a
+sequence of independent xz streams (still a valid .tar.xz), recording where each
+stream starts in both the compressed and uncompressed files, so a member can be
+read by decompressing only the streams that cover it.
+
+the index is a SQLite file next to the archive (<archive>.index).
+"""
+
+import argparse
+import bisect
+import json
+import lzma
+import os
+import sqlite3
+import tarfile
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any, BinaryIO
+
+import logging
+
+from . import json_codec, xz_reader
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = ".index"
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE members (
+    kind TEXT NOT NULL,
+    key INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX idx_members_kind_key ON members (kind, key);
+CREATE TABLE blocks (uoffset INTEGER PRIMARY KEY, coffset INTEGER NOT NULL);
+"""
+
+
+class StaleIndexError(RuntimeError):
+    """index was built for a different version of the archive"""
+
+
+def index_path_for(archive_path: Path) -> Path:
+    return archive_path.with_name(archive_path.name + INDEX_SUFFIX)
+
+
+def _fingerprint(archive_path: Path) -> str:
+    st = archive_path.stat()
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+class _TeeReader:
+    """hands decompressed tar bytes to tarfile while recording them for re-packing"""
+
+    def __init__(self, f: BinaryIO, sink: "_BlockWriter | None") -> None:
+        self._f = f
+        self._sink = sink
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._f.read(size)
+        if self._sink is not None and data:
+            self._sink.write(data)
+        return data
+
+    def drain(self) -> None:
+        while self.read(1024 * 1024):
+            pass
+
+
+class _BlockWriter:
+    """writes the tar stream as independent xz streams of block_size uncompressed bytes each"""
+
+    def __init__(self, out: BinaryIO, block_size: int, preset: int) -> None:
+        self._out = out
+        self._block_size = block_size
+        self._preset = preset
+        self._compressor: lzma.LZMACompressor | None = None
+        self._in_block = 0
+        self.uoffset = 0
+        self.coffset = 0
+        self.blocks: list[tuple[int, int]] = []
+
+    def _emit(self, data: bytes) -> None:
+        self._out.write(data)
+        self.coffset += len(data)
+
+    def write(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            if self._compressor is None:
+                self._compressor = lzma.LZMACompressor(format=lzma.FORMAT_XZ, preset=self._preset)
+                self.blocks.append((self.uoffset, self.coffset))
+            take = min(len(view), self._block_size - self._in_block)
+            self._emit(self._compressor.compress(view[:take]))
+            self._in_block += take
+            self.uoffset += take
+            view = view[take:]
+            if self._in_block >= self._block_size:
+                self._finish_block()
+
+    def _finish_block(self) -> None:
+        if self._compressor is not None:
+            self._emit(self._compressor.flush())
+        self._compressor = None
+        self._in_block = 0
+
+    def close(self) -> None:
+        self._finish_block()
+
+
+def _member_key(member_name: str, raw: bytes) -> tuple[str, int] | None:
+    basename = os.path.basename(member_name)
+    if basename == "product.json":
+        try:
+            return "product", int(json_codec.loads(raw)["id"])
+        except (json.JSONDecodeError, UnicodeDecodeError, KeyError, TypeError, ValueError):
+            return None
+    if basename.endswith(".json") and basename[:-5].isdigit():
+        return "build", int(basename[:-5])
+    return None
+
+
+def build_index(
+    archive_path: Path,
+    *,
+    repack_to: Path | None = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    preset: int = 6,
+) -> Path:
+    """
+    index archive_path (or, with repack_to, a seekable re-pack of it) and return the
+    index file path. the index always describes the archive it sits next to.
+    """
+    archive_path = archive_path.expanduser()
+    target = repack_to.expanduser() if repack_to is not None else archive_path
+    index_path = index_path_for(target)
+    tmp_index = index_path.with_name(index_path.name + ".tmp")
+    tmp_index.unlink(missing_ok=True)
+
+    out = open(target.with_name(target.name + ".tmp"), "wb") if repack_to is not None else None
+    writer = _BlockWriter(out, block_size, preset) if out is not None else None
+    con = sqlite3.connect(tmp_index)
+    try:
+        con.executescript(_SCHEMA)
+        members = 0
+        with xz_reader.open_xz(archive_path) as xz:
+            tee = _TeeReader(xz, writer)
+            with tarfile.open(fileobj=tee, mode="r|") as tf:
+                rows = []
+                for member in tf:
+                    if not member.isfile():
+                        continue
+                    basename = os.path.basename(member.name)
+                    if basename != "product.json" and not (basename.endswith(".json") and basename[:-5].isdigit()):
+                        continue
+                    f = tf.extractfile(member)
+                    if f is None:
+                        continue
+                    found = _member_key(member.name, f.read())
+                    if found is None:
+                        continue
+                    rows.append((found[0], found[1], member.name, member.offset_data, member.size))
+                    if len(rows) >= 10000:
+                        con.executemany("INSERT INTO members VALUES (?, ?, ?, ?, ?)", rows)
+                        members += len(rows)
+                        rows.clear()
+                con.executemany("INSERT INTO members VALUES (?, ?, ?, ?, ?)", rows)
+                members += len(rows)
+            # tar end-of-archive padding still has to reach the re-packed copy
+            tee.drain()
+        if writer is not None and out is not None:
+            writer.close()
+            out.close()
+            os.replace(out.name, target)
+            con.executemany("INSERT INTO blocks VALUES (?, ?)", writer.blocks)
+        con.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [
+                ("archive", target.name),
+                ("fingerprint", _fingerprint(target)),
+                ("seekable", "1" if writer is not None else "0"),
+            ],
+        )
+        con.commit()
+    except BaseException:
+        con.close()
+        tmp_index.unlink(missing_ok=True)
+        if out is not None:
+            out.close()
+            Path(out.name).unlink(missing_ok=True)
+        raise
+    con.close()
+    os.replace(tmp_index, index_path)
+    logger.info("Indexed %d members of %s into %s", members, target, index_path)
+    return index_path
+
+
+class ArchiveIndex:
+    """read members of an indexed archive by product id or build id"""
+
+    def __init__(self, archive_path: Path) -> None:
+        self.archive_path = archive_path.expanduser()
+        index_path = index_path_for(self.archive_path)
+        if not index_path.exists():
+            raise FileNotFoundError(f"No index for {self.archive_path}; run `archive_index build` first")
+        self._con = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+        meta = dict(self._con.execute("SELECT key, value FROM meta"))
+        if meta.get("fingerprint") != _fingerprint(self.archive_path):
+            self._con.close()
+            raise StaleIndexError(f"{index_path} does not match {self.archive_path}; rebuild it")
+        self.seekable = meta.get("seekable") == "1"
+        blocks = self._con.execute("SELECT uoffset, coffset FROM blocks ORDER BY uoffset").fetchall()
+        self._block_uoffsets = [b[0] for b in blocks]
+        self._block_coffsets = [b[1] for b in blocks]
+
+    def close(self) -> None:
+        self._con.close()
+
+    def __enter__(self) -> "ArchiveIndex":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def _locate(self, kind: str, key: int) -> tuple[int, int] | None:
+        row = self._con.execute(
+            "SELECT offset, size FROM members WHERE kind = ? AND key = ? ORDER BY offset DESC LIMIT 1",
+            (kind, key),
+        ).fetchone()
+        return None if row is None else (row[0], row[1])
+
+    def _read_seekable(self, f: BinaryIO, offset: int, size: int) -> bytes:
+        idx = bisect.bisect_right(self._block_uoffsets, offset) - 1
+        skip = offset - self._block_uoffsets[idx]
+        f.seek(self._block_coffsets[idx])
+        out = bytearray()
+        decompressor = lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+        while len(out) < skip + size:
+            if decompressor.eof:
+                # member continues in the next independent stream
+                leftover = decompressor.unused_data
+                decompressor = lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+                out += decompressor.decompress(leftover, max_length=skip + size - len(out))
+                continue
+            if decompressor.needs_input:
+                chunk = f.read(64 * 1024)
+                if not chunk:
+                    raise EOFError(f"{self.archive_path} ended before offset {offset + size}")
+            else:
+                chunk = b""
+            out += decompressor.decompress(chunk, max_length=skip + size - len(out))
+        return bytes(out[skip:skip + size])
+
+    def read(self, kind: str, key: int) -> bytes | None:
+        """raw member bytes, or None if the archive has no such member"""
+        found = self._locate(kind, key)
+        if found is None:
+            return None
+        offset, size = found
+        if self.seekable:
+            with open(self.archive_path, "rb") as f:
+                return self._read_seekable(f, offset, size)
+        # single-stream xz: still a linear decompress up to offset, but no tar or JSON parsing
+        with lzma.open(self.archive_path, "rb") as xz:
+            xz.seek(offset)
+            return xz.read(size)
+
+    def product_ids(self) -> list[int]:
+        return [r[0] for r in self._con.execute("SELECT DISTINCT key FROM members WHERE kind = 'product' ORDER BY key")]
+
+
+def get_product(archive: Path, product_id: int) -> dict[str, Any] | None:
+    with ArchiveIndex(Path(archive)) as index:
+        raw = index.read("product", product_id)
+    return None if raw is None else json_codec.loads(raw)
+
+
+def get_products(archive: Path, product_ids: Iterable[int]) -> dict[int, dict[str, Any]]:
+    products: dict[int, dict[str, Any]] = {}
+    with ArchiveIndex(Path(archive)) as index:
+        for product_id in product_ids:
+            raw = index.read("product", product_id)
+            if raw is not None:
+                products[product_id] = json_codec.loads(raw)
+    return products
+
+
+def get_build_manifest(archive: Path, build_id: int) -> bytes | None:
+    with ArchiveIndex(Path(archive)) as index:
+        return index.read("build", build_id)
+
+
+def _cli(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="random-access index for GOGDB snapshot archives")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="index an archive (optionally re-packing it seekable)")
+    build.add_argument("archive", type=Path)
+    build.add_argument("--repack", type=Path, default=None, help="Write a seekable multi-stream copy here and index that")
+    build.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE, help="Uncompressed bytes per xz stream when re-packing")
+    get = sub.add_parser("get", help="print one product.json by product id")
+    get.add_argument("archive", type=Path)
+    get.add_argument("product_id", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        print(build_index(args.archive, repack_to=args.repack, block_size=args.block_size))
+        return 0
+    product = get_product(args.archive, args.product_id)
+    if product is None:
+        return 1
+    print(json.dumps(product, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_cli())
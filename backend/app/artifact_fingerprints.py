@@ -0,0 +1,50 @@
+from collections.abc import Iterable
+from typing import Optional, TypedDict
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+
+from .db_schema import artifact_fingerprints
+
+
+class FingerprintRow(TypedDict):
+    hash_type: str              # "md5", ...
+    hash_value: str             # lowercase hex
+    exe_size_bytes: int
+    pe_product_name: Optional[str]
+    pe_product_version: Optional[str]
+    sig_timestamp: Optional[str]  # Authenticode signingTime, in date_published format
+
+
+_UPSERT = insert(artifact_fingerprints)
+_UPSERT = _UPSERT.on_conflict_do_update(
+    index_elements=[artifact_fingerprints.c.hash_type, artifact_fingerprints.c.hash_value],
+    set_={
+        c.name: _UPSERT.excluded[c.name]
+        for c in artifact_fingerprints.c
+        if c.name not in ("id", "hash_type", "hash_value")
+    },
+)
+
+
+def upsert_many(conn: Connection, rows: Iterable[FingerprintRow]) -> dict[tuple[str, str], int]:
+    """single executemany over all rows; returns (hash_type, hash_value) -> id"""
+    params = list(rows)
+    if not params:
+        return {}
+    conn.execute(_UPSERT, params)
+    keys = list({(row["hash_type"], row["hash_value"]) for row in params})
+    ids: dict[tuple[str, str], int] = {}
+    # stay well under SQLite's bound-parameter limit (two per key)
+    for start in range(0, len(keys), 250):
+        stmt = select(
+            artifact_fingerprints.c.id,
+            artifact_fingerprints.c.hash_type,
+            artifact_fingerprints.c.hash_value,
+        ).where(
+            tuple_(artifact_fingerprints.c.hash_type, artifact_fingerprints.c.hash_value).in_(keys[start:start + 250])
+        )
+        for row in conn.execute(stmt):
+            ids[(row.hash_type, row.hash_value)] = row.id
+    return ids
@@ -1,30 +1,36 @@
 from collections.abc import Iterable
-from typing import Optional, TypedDict
+from typing import Optional, NamedTuple
 
 from sqlalchemy import select
 from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.engine import Connection
 
+from . import db
 from .db_schema import catalog_build_products
 
 
-class BuildProductRow(TypedDict):
+class BuildProductRow(NamedTuple):
     build_id: int
     product_id: int
     product_name: Optional[str]
     temp_executable: Optional[str]
 
+_UPSERT = insert(catalog_build_products)
+_UPSERT = _UPSERT.on_conflict_do_update(
+    index_elements=[catalog_build_products.c.build_id, catalog_build_products.c.product_id],
+    set_={c.name: _UPSERT.excluded[c.name] for c in catalog_build_products.c if not c.primary_key},
+)
+_UPSERT_SQL = db.positional_sql(_UPSERT, BuildProductRow._fields)
+
+
 def upsert_build_product(conn: Connection, row: BuildProductRow) -> None:
-    stmt = insert(catalog_build_products).values(**row)
-    stmt = stmt.on_conflict_do_update(
-        index_elements=[catalog_build_products.c.build_id, catalog_build_products.c.product_id],
-        set_=row,
-    )
-    conn.execute(stmt)
+    conn.exec_driver_sql(_UPSERT_SQL, row)
 
 def upsert_many(conn: Connection, rows: Iterable[BuildProductRow]) -> None:
-    for row in rows:
-        upsert_build_product(conn, row)
+    """single executemany over all rows, bound positionally"""
+    params = list(rows)
+    if params:
+        conn.exec_driver_sql(_UPSERT_SQL, params)
 
 def get_by_build_id(conn: Connection, build_id: int) -> list[BuildProductRow]:
     stmt = select(catalog_build_products).where(catalog_build_products.c.build_id == build_id)
@@ -1,14 +1,15 @@
 from collections.abc import Iterable
-from typing import Optional, TypedDict
+from typing import Optional, NamedTuple
 
-from sqlalchemy import select
+from sqlalchemy import select, func
 from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.engine import Connection
 
+from . import db
 from .db_schema import catalog_builds
 
 
-class BuildRow(TypedDict):
+class BuildRow(NamedTuple):
     id: int
     product_id: int
     date_published: str
@@ -18,18 +19,23 @@ class BuildRow(TypedDict):
     os: Optional[str]
 
 
+_UPSERT = insert(catalog_builds)
+_UPSERT = _UPSERT.on_conflict_do_update(
+    index_elements=[catalog_builds.c.id],
+    set_={c.name: _UPSERT.excluded[c.name] for c in catalog_builds.c if not c.primary_key},
+)
+_UPSERT_SQL = db.positional_sql(_UPSERT, BuildRow._fields)
+
+
 def upsert_build(conn: Connection, row: BuildRow) -> None:
-    stmt = insert(catalog_builds).values(**row)
-    stmt = stmt.on_conflict_do_update(
-        index_elements=[catalog_builds.c.id],
-        set_=row,
-    )
-    conn.execute(stmt)
+    conn.exec_driver_sql(_UPSERT_SQL, row)
 
 
 def upsert_many(conn: Connection, rows: Iterable[BuildRow]) -> None:
-    for row in rows:
-        upsert_build(conn, row)
+    """single executemany over all rows, bound positionally"""
+    params = list(rows)
+    if params:
+        conn.exec_driver_sql(_UPSERT_SQL, params)
 
 
 def get_latest_for_product(conn: Connection, product_id: int) -> Optional[BuildRow]:
@@ -44,3 +50,53 @@ def get_latest_for_product(conn: Connection, product_id: int) -> Optional[BuildR
     )
     result = conn.execute(stmt).mappings().first()
     return None if result is None else BuildRow(**result)
+
+
+def latest_builds_subquery(*where):
+    """one row per product: its newest build (ties broken by id), restricted by where"""
+    ranked = (
+        select(
+            catalog_builds,
+            func.row_number()
+            .over(
+                partition_by=catalog_builds.c.product_id,
+                order_by=(catalog_builds.c.date_published.desc(), catalog_builds.c.id.desc()),
+            )
+            .label("rank"),
+        )
+        .where(*where)
+        .subquery()
+    )
+    return select(*(ranked.c[c.name] for c in catalog_builds.c)).where(ranked.c.rank == 1).subquery()
+
+
+def get_latest_for_products(conn: Connection, product_ids: Iterable[int]) -> dict[int, BuildRow]:
+    """
+    latest build per product in one query per 500 ids (row_number() over each product's
+    builds, newest first); products without builds are absent
+    """
+    id_list = list(set(product_ids))
+    latest: dict[int, BuildRow] = {}
+    for start in range(0, len(id_list), 500):
+        stmt = select(latest_builds_subquery(catalog_builds.c.product_id.in_(id_list[start:start + 500])))
+        for row in conn.execute(stmt).mappings():
+            latest[row["product_id"]] = BuildRow(**row)
+    return latest
+
+
+def get_for_product(conn: Connection, product_id: int) -> list[BuildRow]:
+    """every build of a product, newest first (idx_catalog_builds_product_date)"""
+    stmt = (
+        select(catalog_builds)
+        .where(catalog_builds.c.product_id == product_id)
+        .order_by(catalog_builds.c.date_published.desc(), catalog_builds.c.id.desc())
+    )
+    return [BuildRow(**row) for row in conn.execute(stmt).mappings()]
+
+
+def list_after(conn: Connection, after_id: int | None, limit: int) -> list[BuildRow]:
+    """keyset page: up to limit builds with id > after_id, by id"""
+    stmt = select(catalog_builds).order_by(catalog_builds.c.id).limit(limit)
+    if after_id is not None:
+        stmt = stmt.where(catalog_builds.c.id > after_id)
+    return [BuildRow(**row) for row in conn.execute(stmt).mappings()]
@@ -1,27 +1,37 @@
 from collections.abc import Iterable
-from typing import TypedDict
+from typing import NamedTuple
 
 from sqlalchemy import select, delete, func
 from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.engine import Connection
 
+from . import db
 from .db_schema import catalog_dlcs
 
 
-class DlcRow(TypedDict):
+class DlcRow(NamedTuple):
     parent_id: int      # base game product_id
     dlc_id: int         # DLC product_id
     installer_qty: int  # number of installers for this DLC (0 = non-installable)
 
 
+_UPSERT = insert(catalog_dlcs)
+_UPSERT = _UPSERT.on_conflict_do_update(
+    index_elements=[catalog_dlcs.c.dlc_id],
+    set_={c.name: _UPSERT.excluded[c.name] for c in catalog_dlcs.c if not c.primary_key},
+)
+_UPSERT_SQL = db.positional_sql(_UPSERT, DlcRow._fields)
+
+
 def update_dlc_link(conn: Connection, row: DlcRow) -> None:
-    stmt = insert(catalog_dlcs).values(**row)
-    stmt = stmt.on_conflict_do_update(
-        index_elements=[catalog_dlcs.c.dlc_id],
-        set_=row,
-    )
+    conn.exec_driver_sql(_UPSERT_SQL, row)
 
-    conn.execute(stmt)
+
+def update_many(conn: Connection, rows: Iterable[DlcRow]) -> None:
+    """single executemany over all rows, bound positionally"""
+    params = list(rows)
+    if params:
+        conn.exec_driver_sql(_UPSERT_SQL, params)
 
 
 def replace_for_parent(conn: Connection, parent_id: int, rows: Iterable[DlcRow]) -> None:
@@ -33,18 +43,8 @@ def replace_for_parent(conn: Connection, parent_id: int, rows: Iterable[DlcRow])
         delete(catalog_dlcs).where(catalog_dlcs.c.parent_id == parent_id)
     )
 
-    for row in rows:
-        if row["installer_qty"] <= 0:
-            # non-installable DLC: ignore
-            continue
-
-        stmt = insert(catalog_dlcs).values(**row)
-        stmt = stmt.on_conflict_do_update(
-            index_elements=[catalog_dlcs.c.dlc_id],
-            set_=row,
-        )
-
-        conn.execute(stmt)
+    # non-installable DLC: ignore
+    update_many(conn, (row for row in rows if row.installer_qty > 0))
 
 
 def count_installable_for_parent(conn: Connection, parent_id: int) -> int:
@@ -74,3 +74,21 @@ def get_installable_for_parent(conn: Connection, parent_id: int) -> list[DlcRow]
     )
     rows = conn.execute(stmt).mappings().all()
     return [DlcRow(**row) for row in rows]
+
+
+def get_installable_for_parents(conn: Connection, parent_ids: Iterable[int]) -> dict[int, list[DlcRow]]:
+    """installable DLCs keyed by parent, ordered by dlc_id; every requested parent gets a list"""
+    id_list = list(set(parent_ids))
+    dlcs: dict[int, list[DlcRow]] = {parent_id: [] for parent_id in id_list}
+    for start in range(0, len(id_list), 500):
+        stmt = (
+            select(catalog_dlcs)
+            .where(
+                catalog_dlcs.c.parent_id.in_(id_list[start:start + 500]),
+                catalog_dlcs.c.installer_qty > 0,
+            )
+            .order_by(catalog_dlcs.c.parent_id, catalog_dlcs.c.dlc_id)
+        )
+        for row in conn.execute(stmt).mappings():
+            dlcs[row["parent_id"]].append(DlcRow(**row))
+    return dlcs
@@ -0,0 +1,38 @@
+from typing import TypedDict
+
+from sqlalchemy import insert, select
+from sqlalchemy.engine import Connection
+
+from .db_schema import catalog_import_runs
+
+
+class ImportRunRow(TypedDict, total=False):
+    id: int  # assigned on insert
+    source: str
+    started_at: str
+    seconds: float
+    new_products: int
+    changed_products: int
+    skipped_products: int
+    unchanged_products: int
+    vanished_products: int
+    new_builds: int
+    changed_builds: int
+    skipped_builds: int
+    unchanged_builds: int
+    vanished_builds: int
+    member_bytes: int
+    rows_written: int
+    parse_seconds: float
+    extract_seconds: float
+    flush_seconds: float
+
+
+def insert_run(conn: Connection, row: ImportRunRow) -> int:
+    return conn.execute(insert(catalog_import_runs).values(**row)).inserted_primary_key[0]
+
+
+def get_recent(conn: Connection, limit: int = 20) -> list[ImportRunRow]:
+    """newest first"""
+    stmt = select(catalog_import_runs).order_by(catalog_import_runs.c.id.desc()).limit(limit)
+    return [ImportRunRow(**row) for row in conn.execute(stmt).mappings()]
@@ -1,27 +1,52 @@
 import argparse
+import hashlib
+import io
 import json
 import os
+import queue
 import tarfile
+import threading
+import time
 import logging
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Iterable, Mapping, Any, Sequence
+from typing import BinaryIO, Iterable, Iterator, Mapping, Any, NamedTuple, Sequence
 
 from sqlalchemy.engine import Connection
 
 from . import db
+from . import metrics
+from . import archive_index
+from . import json_codec, json_stream
+from . import xz_reader
 from . import catalog_products as catalog_products_mgr
 from . import catalog_builds as catalog_builds_mgr
 from . import catalog_dlcs as catalog_dlcs_mgr
 from . import catalog_installers as catalog_installers_mgr
 from . import catalog_build_products as catalog_build_products_mgr
+from . import catalog_member_digests as catalog_member_digests_mgr
+from . import catalog_meta as catalog_meta_mgr
+from . import catalog_import_runs as catalog_import_runs_mgr
+from . import catalog_search as catalog_search_mgr
+from . import library_staleness as library_staleness_mgr
 from .catalog_products import ProductRow
 from .catalog_builds import BuildRow
 from .catalog_installers import InstallerRow
 from .catalog_build_products import BuildProductRow
 from .catalog_dlcs import DlcRow
+from .catalog_member_digests import MemberDigestRow
 
 logger = logging.getLogger(__name__)
 
+_MEMBER_BYTES = metrics.counter("ingest_member_bytes_total", "Decompressed bytes of product and manifest members read")
+_MEMBERS = metrics.counter("ingest_members_total", "Archive members seen, by kind and status (new/changed/skipped/unchanged)")
+_PARSE_SECONDS = metrics.histogram("ingest_json_parse_seconds", "JSON decoding time per parsed member")
+_EXTRACT_SECONDS = metrics.histogram("ingest_row_extraction_seconds", "Row extraction time per parsed member")
+_ROWS_UPSERTED = metrics.counter("ingest_rows_upserted_total", "Rows written by catalog_ingest, by table")
+_FLUSH_SECONDS = metrics.histogram("ingest_flush_seconds", "Time to write one row batch")
+
 def _extract_product_row(data: Mapping[str, Any]) -> ProductRow | None:
     """
     Required keys:
@@ -57,16 +82,7 @@ def _extract_product_row(data: Mapping[str, Any]) -> ProductRow | None:
     is_in_development = bool(data.get("is_in_development", False))
     image_boxart = data.get("image_boxart")
 
-    product: ProductRow = {
-        "id": product_id,
-        "type": product_type,
-        "slug": slug,
-        "title": title,
-        "global_date": global_date,
-        "is_in_development": is_in_development,
-        "image_boxart": image_boxart,
-    }
-    return product
+    return ProductRow(product_id, product_type, slug, title, global_date, is_in_development, image_boxart)
 
 def _extract_dlc_row(data: Mapping[str, Any]) -> DlcRow | None:
     """
@@ -96,11 +112,7 @@ def _extract_dlc_row(data: Mapping[str, Any]) -> DlcRow | None:
 
     installer_qty = len(data.get("dl_installer") or [])
 
-    return DlcRow(
-        parent_id=parent_id,
-        dlc_id=product_id,
-        installer_qty=installer_qty,
-    )
+    return DlcRow(parent_id, product_id, installer_qty)
 
 
 def _extract_build_rows(data: Mapping[str, Any]) -> list[BuildRow]:
@@ -123,18 +135,18 @@ def _extract_build_rows(data: Mapping[str, Any]) -> list[BuildRow]:
             legacy_build_id = None
         date_published = b.get("date_published")
         if not date_published:
-            logger.warning(f"Skipping build {build_id} for product {product_id} with no date_published")
+            logger.warning("Skipping build %s for product %s with no date_published", build_id, product_id)
             continue
         rows.append(
-            {
-                "id": build_id,
-                "product_id": product_id,
-                "date_published": date_published,
-                "generation": int(b.get("generation", 0)),
-                "version": b.get("version"),
-                "legacy_build_id": legacy_build_id,
-                "os": b.get("os"),
-            }
+            BuildRow(
+                build_id,
+                product_id,
+                date_published,
+                int(b.get("generation", 0)),
+                b.get("version"),
+                legacy_build_id,
+                b.get("os"),
+            )
         )
 
     return rows
@@ -153,15 +165,7 @@ def _extract_installer_rows(data: Mapping[str, Any]) -> list[InstallerRow]:
         language_code = language_data.get("code")
         os_field = inst.get("os")
         version = inst.get("version")
-        rows.append(
-            {
-                "product_id": product_id,
-                "installer_id": installer_id,
-                "language": language_code,
-                "os": os_field,
-                "version": version,
-            }
-        )
+        rows.append(InstallerRow(product_id, installer_id, language_code, os_field, version))
     return rows
 
 
@@ -171,61 +175,215 @@ def _extract_build_product_rows(data: Mapping[str, Any]) -> list[BuildProductRow
     try:
         build_id = int(data["buildId"])
     except (KeyError, TypeError, ValueError):
-        logger.warning(f"Skipping gen2 build manifest - invalid or missing buildId: {data.get('buildId')}")
+        logger.warning("Skipping gen2 build manifest - invalid or missing buildId: %s", data.get("buildId"))
         return rows
     
     products = data.get("products") or []
     if not products:
-        logger.debug(f"Gen2 build manifest {build_id} has no products")
+        logger.debug("Gen2 build manifest %s has no products", build_id)
         return rows
     
     for idx, prod in enumerate(products):
         try:
             product_id = int(prod["productId"])
         except (KeyError, TypeError, ValueError):
-            logger.warning(f"Skipping product[{idx}] in build {build_id} - invalid or missing productId: {prod.get('productId')}")
+            logger.warning(
+                "Skipping product[%d] in build %s - invalid or missing productId: %s", idx, build_id, prod.get("productId")
+            )
             continue
         
         product_name = prod.get("name")
         temp_executable = prod.get("temp_executable")
         
-        rows.append(
-            {
-                "build_id": build_id,
-                "product_id": product_id,
-                "product_name": product_name,
-                "temp_executable": temp_executable,
-            }
-        )
+        rows.append(BuildProductRow(build_id, product_id, product_name, temp_executable))
     
     return rows
 
 
+def _extract_build_product_rows_gen1(data: Mapping[str, Any]) -> list[BuildProductRow]:
+    """
+    gen1 (repository v1) manifests list their products under product.gameIDs;
+    they carry no executable, so temp_executable stays empty.
+    """
+    rows: list[BuildProductRow] = []
+
+    try:
+        build_id = int(data["buildId"])
+    except (KeyError, TypeError, ValueError):
+        logger.warning("Skipping gen1 build manifest - invalid or missing buildId: %s", data.get("buildId"))
+        return rows
+
+    product = data.get("product") or {}
+    game_ids = product.get("gameIDs") or []
+    if not game_ids:
+        logger.debug("Gen1 build manifest %s has no gameIDs", build_id)
+        return rows
+
+    for idx, game in enumerate(game_ids):
+        try:
+            product_id = int(game["gameID"])
+        except (KeyError, TypeError, ValueError):
+            logger.warning("Skipping gameIDs[%d] in build %s - invalid or missing gameID", idx, build_id)
+            continue
+
+        name = game.get("name")
+        if isinstance(name, Mapping):
+            name = name.get("en") or next(iter(name.values()), None)
+
+        rows.append(BuildProductRow(build_id, product_id, name, None))
+
+    return rows
+
+
+DEFAULT_BATCH_SIZE = 5000
+# bump whenever a member yields different rows than before (a new extractor, new
+# fields) or digests record more about it: digests recorded by older code no longer
+# mean "already imported", so an incremental import forgets them and parses everything once
+EXTRACTOR_VERSION = 3
+_EXTRACTOR_VERSION_KEY = "extractor_version"
+# build manifests larger than this are parsed off the tar stream instead of read whole
+_STREAM_MEMBER_BYTES = 8 * 1024 * 1024
+_STREAM_CHUNK_BYTES = 256 * 1024
+# in-memory manifests up to this size are decoded whole (json_codec), which beats
+# projecting them even with the stdlib decoder; larger ones are projected to bound
+# the memory a worker spends on depot dicts nobody reads
+_FULL_DECODE_BYTES = 2 * 1024 * 1024
+# manifest fields the gen1/gen2 extractors read
+_MANIFEST_PATHS = (
+    ("version",),
+    ("buildId",),
+    ("products", json_stream.ITEM),
+    ("product", "gameIDs", json_stream.ITEM),
+)
+# archive members handed to a pool worker per task, amortizing pickling/IPC
+_MEMBERS_PER_TASK = 64
+# tasks queued per pool worker between the archive reader and the DB writer
+_QUEUE_DEPTH_PER_WORKER = 4
+
+
+class _RowBatch:
+    """
+    rows buffered across products/manifests, written with one executemany per table.
+    rows are NamedTuples in column order, bound positionally without per-row dicts.
+    flush order follows the FK direction: products first, then rows that reference them.
+    """
+
+    def __init__(self) -> None:
+        self.products: list[ProductRow] = []
+        self.dlcs: list[DlcRow] = []
+        self.builds: list[BuildRow] = []
+        self.installers: list[InstallerRow] = []
+        self.build_products: list[BuildProductRow] = []
+        self.digests: list[MemberDigestRow] = []
+
+    def __len__(self) -> int:
+        return (
+            len(self.products)
+            + len(self.dlcs)
+            + len(self.builds)
+            + len(self.installers)
+            + len(self.build_products)
+            + len(self.digests)
+        )
+
+    def add_product_data(self, data: Mapping[str, Any]) -> None:
+        product = _extract_product_row(data)
+        dlcLink = _extract_dlc_row(data)
+        buildRows = _extract_build_rows(data)
+        installerRows = _extract_installer_rows(data)
+        if not product:
+            return
+        self.products.append(product)
+        if dlcLink is not None:
+            self.dlcs.append(dlcLink)
+        self.builds.extend(buildRows)
+        self.installers.extend(installerRows)
+
+    def add_build_data_gen2(self, data: Mapping[str, Any]) -> None:
+        self.build_products.extend(_extract_build_product_rows(data))
+
+    def add_build_data_gen1(self, data: Mapping[str, Any]) -> None:
+        self.build_products.extend(_extract_build_product_rows_gen1(data))
+
+    def add_build_manifest(self, data: dict[str, Any], build_id: int, source: str) -> str | None:
+        """dispatch a numeric build manifest on its version; returns "gen1"/"gen2" or None"""
+        version = data.get("version")
+        if version not in (1, 2):
+            return None
+        # inject buildId from filename if missing in manifest
+        if "buildId" not in data:
+            data["buildId"] = build_id
+            logger.debug("Injected buildId %s from filename (source: %s)", build_id, source)
+        if version == 2:
+            self.add_build_data_gen2(data)
+            return "gen2"
+        self.add_build_data_gen1(data)
+        return "gen1"
+
+    def extend(self, other: "_RowBatch") -> None:
+        self.products.extend(other.products)
+        self.dlcs.extend(other.dlcs)
+        self.builds.extend(other.builds)
+        self.installers.extend(other.installers)
+        self.build_products.extend(other.build_products)
+        self.digests.extend(other.digests)
+
+    def flush(self, conn: Connection) -> int:
+        """write and clear every buffered row; returns how many were written"""
+        written = len(self)
+        if not written:
+            return 0
+        if metrics.enabled():
+            for table, rows in (
+                ("catalog_products", self.products),
+                ("catalog_dlcs", self.dlcs),
+                ("catalog_builds", self.builds),
+                ("catalog_installers", self.installers),
+                ("catalog_build_products", self.build_products),
+                ("catalog_member_digests", self.digests),
+            ):
+                if rows:
+                    _ROWS_UPSERTED.inc(len(rows), table=table)
+        if self.products or self.dlcs or self.builds or self.installers or self.build_products:
+            catalog_meta_mgr.bump_generation(conn)
+        catalog_products_mgr.upsert_many(conn, self.products)
+        catalog_search_mgr.index_products(conn, self.products)
+        catalog_dlcs_mgr.update_many(conn, self.dlcs)
+        catalog_builds_mgr.upsert_many(conn, self.builds)
+        catalog_installers_mgr.upsert_many(conn, self.installers)
+        catalog_build_products_mgr.upsert_many(conn, self.build_products)
+        catalog_member_digests_mgr.upsert_many(conn, self.digests)
+        if self.builds:
+            library_staleness_mgr.refresh_for_products(conn, (row.product_id for row in self.builds))
+        self.products.clear()
+        self.dlcs.clear()
+        self.builds.clear()
+        self.installers.clear()
+        self.build_products.clear()
+        self.digests.clear()
+        return written
+
+
+def import_build_data_gen1(conn: Connection, data: Mapping[str, Any]) -> None:
+    batch = _RowBatch()
+    batch.add_build_data_gen1(data)
+    batch.flush(conn)
+
 def import_build_data_gen2(conn: Connection, data: Mapping[str, Any]) -> None:
-    rows = _extract_build_product_rows(data)
-    for row in rows:
-        catalog_build_products_mgr.upsert_build_product(conn, row)
+    batch = _RowBatch()
+    batch.add_build_data_gen2(data)
+    batch.flush(conn)
 
 def import_product_data(conn: Connection, data: Mapping[str, Any]) -> None:
     """Import a single product record from an already-parsed dict"""
-    product = _extract_product_row(data)
-    dlcLink = _extract_dlc_row(data)
-    buildRows = _extract_build_rows(data)
-    installerRows = _extract_installer_rows(data)
-    if not product:
-        return
-    catalog_products_mgr.upsert_product(conn, product)
-    if dlcLink is not None:
-        catalog_dlcs_mgr.update_dlc_link(conn, dlcLink)
-    for build in buildRows:
-        catalog_builds_mgr.upsert_build(conn, build)
-    for installer in installerRows:
-        catalog_installers_mgr.upsert_installer(conn, installer)
+    batch = _RowBatch()
+    batch.add_product_data(data)
+    batch.flush(conn)
 
 def import_product_json(conn: Connection, json_path: Path) -> None:
-    with json_path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-    logger.debug(f"Importing product ID {data.get('id')} from {json_path}")
+    with json_path.open("rb") as f:
+        data = json_codec.load(f)
+    logger.debug("Importing product ID %s from %s", data.get("id"), json_path)
     import_product_data(conn, data)
 
 def import_multiple_products(conn: Connection, json_paths: Iterable[Path]) -> None:
@@ -233,42 +391,504 @@ def import_multiple_products(conn: Connection, json_paths: Iterable[Path]) -> No
         import_product_json(conn, path)
 
 
-def import_archive(conn: Connection, archive_path: Path) -> None:
-    """Import product.json and gen2 build manifest (17-digit buildID.json) files from a .tar.xz archive"""
-    archive_path = archive_path.expanduser()
-    with tarfile.open(archive_path, mode="r:xz") as tf:
-        temp_v1_builds = 0
-        for member in tf:
-            if not member.isfile():
+def import_product_records(
+    conn: Connection,
+    records: Iterable[Mapping[str, Any]],
+    *,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """
+    Import already-parsed product records (product.json or a projection of it, such as
+    process_archive output) in batches; returns the number of records seen.
+    """
+    batch = _RowBatch()
+    count = 0
+    for record in records:
+        count += 1
+        batch.add_product_data(record)
+        if len(batch) >= batch_size:
+            batch.flush(conn)
+    batch.flush(conn)
+    return count
+
+
+def apply_changeset(conn: Connection, changeset_path: Path, *, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+    """
+    Apply a JSON-lines changeset from `process_archive diff OLD NEW`.
+    added/changed records carry the product projection and go through the same extractors
+    as product.json, manifest records the same path as archive build manifests;
+    removed products stay in the catalog, matching a full re-import.
+    """
+    batch = _RowBatch()
+    counts = {"added": 0, "changed": 0, "removed": 0, "manifest": 0}
+    with changeset_path.expanduser().open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
                 continue
-            
-            basename = os.path.basename(member.name)
-            f = tf.extractfile(member)
-            if f is None:
+            record = json_codec.loads(line)
+            op = record.get("op")
+            if op not in counts:
+                raise ValueError(f"Unknown changeset op {op!r} in {changeset_path}")
+            counts[op] += 1
+            if op == "manifest":
+                batch.add_build_manifest(record["manifest"], int(record["build_id"]), str(changeset_path))
+            elif op != "removed":
+                batch.add_product_data(record["product"])
+            if len(batch) >= batch_size:
+                batch.flush(conn)
+    batch.flush(conn)
+    logger.info(
+        "Applied changeset %s: added=%d changed=%d removed=%d (removed products kept) manifests=%d",
+        changeset_path, counts["added"], counts["changed"], counts["removed"], counts["manifest"],
+    )
+
+
+def import_products_by_id(
+    conn: Connection,
+    archive_path: Path,
+    product_ids: Iterable[int],
+) -> int:
+    """
+    Import selected products, and the build manifests their builds reference, from an
+    archive indexed with archive_index; returns the number of products found.
+    """
+    batch = _RowBatch()
+    found = 0
+    with archive_index.ArchiveIndex(archive_path) as index:
+        for product_id in product_ids:
+            raw = index.read("product", product_id)
+            if raw is None:
+                logger.warning("Product %s not found in %s", product_id, archive_path)
                 continue
-            
+            found += 1
+            data = json_codec.loads(raw)
+            batch.add_product_data(data)
+            for build in data.get("builds") or []:
+                try:
+                    build_id = int(build["id"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                manifest = index.read("build", build_id)
+                if manifest is not None:
+                    rows = _parse_manifest(f"{build_id}.json", manifest).rows
+                    if rows is not None:
+                        batch.extend(rows)
+    batch.flush(conn)
+    return found
+
+
+def _is_archive_member(basename: str) -> bool:
+    return basename == "product.json" or (basename.endswith(".json") and basename[:-5].isdigit())
+
+
+def _digest(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+class _Member(NamedTuple):
+    rows: _RowBatch | None
+    kind: str | None    # "product", "gen1", "gen2", "build" (unchanged, not parsed) or None if skipped
+    key: int | None     # product id or build id
+    digest: str
+    unchanged: bool
+    size: int = 0                # member bytes
+    parse_seconds: float = 0.0   # JSON decoding, measured where the member was parsed
+    extract_seconds: float = 0.0
+
+
+class _DigestIndex:
+    """member digests recorded by the previous import; read-only while an import runs"""
+
+    def __init__(
+        self, products: dict[int, str], builds: dict[int, str], skipped: dict[str, set[int]] | None = None
+    ) -> None:
+        self.products = products
+        self.builds = builds
+        # keys of members that yielded no rows, by kind
+        self.skipped = skipped or {"product": set(), "build": set()}
+        # product.json carries its own id, so equal bytes imply the same product
+        self._product_keys = {digest: key for key, digest in products.items()}
+
+    @classmethod
+    def load(cls, conn: Connection) -> "_DigestIndex":
+        return cls(
+            catalog_member_digests_mgr.get_all(conn, "product"),
+            catalog_member_digests_mgr.get_all(conn, "build"),
+            {kind: catalog_member_digests_mgr.get_skipped_keys(conn, kind) for kind in ("product", "build")},
+        )
+
+    def unchanged(self, member_name: str, digest: str, size: int) -> _Member | None:
+        basename = os.path.basename(member_name)
+        if basename == "product.json":
+            key = self._product_keys.get(digest)
+            if key is None:
+                return None
+            return _Member(None, "product", key, digest, True, size)
+        key = int(basename[:-5])
+        if self.builds.get(key) != digest:
+            return None
+        return _Member(None, "build", key, digest, True, size)
+
+
+class _HashingReader:
+    """file wrapper feeding everything read through the member digest"""
+
+    def __init__(self, f: BinaryIO) -> None:
+        self._f = f
+        self._hash = hashlib.blake2b(digest_size=16)
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._f.read(size)
+        self._hash.update(data)
+        return data
+
+    def hexdigest(self) -> str:
+        while self.read(_STREAM_CHUNK_BYTES):
+            pass
+        return self._hash.hexdigest()
+
+
+class _Parsed(NamedTuple):
+    rows: _RowBatch | None
+    kind: str | None
+    key: int | None
+    parse_seconds: float
+    extract_seconds: float
+
+
+def _parse_manifest(member_name: str, source: bytes | BinaryIO) -> _Parsed:
+    """
+    extract rows from a numeric build manifest, given as bytes or a stream. small ones
+    are decoded whole; for streams and large ones only the fields the extractors read
+    are materialized (json_stream.project), so depot listings are scanned, never built.
+    """
+    started = time.perf_counter()
+    try:
+        if isinstance(source, bytes) and len(source) <= _FULL_DECODE_BYTES:
+            data = json_codec.loads(source)
+        else:
+            fp = io.BytesIO(source) if isinstance(source, bytes) else source
+            data = json_stream.project(fp, _MANIFEST_PATHS, chunk_size=_STREAM_CHUNK_BYTES)
+    except json_codec.DecodeError:
+        # skip malformed JSON
+        return _Parsed(None, None, None, time.perf_counter() - started, 0.0)
+    parsed = time.perf_counter()
+    if not isinstance(data, dict):
+        return _Parsed(None, None, None, parsed - started, 0.0)
+    batch = _RowBatch()
+    key = int(os.path.basename(member_name)[:-5])  # .json
+    kind = batch.add_build_manifest(data, key, member_name)
+    extracted = time.perf_counter()
+    if kind is None:
+        return _Parsed(None, None, None, parsed - started, extracted - parsed)
+    return _Parsed(batch, kind, key, parsed - started, extracted - parsed)
+
+
+def _parse_manifest_stream(member_name: str, member_size: int, f: BinaryIO, previous: _DigestIndex | None) -> _Member:
+    """
+    parse a large manifest straight off the tar stream, hashing as it goes, so it is
+    never held in memory whole. the digest is only known afterwards, so an unchanged
+    manifest still gets parsed; its rows are dropped here.
+    """
+    reader = _HashingReader(f)
+    parsed = _parse_manifest(member_name, reader)
+    digest = reader.hexdigest()
+    if previous is not None:
+        member = previous.unchanged(member_name, digest, member_size)
+        if member is not None:
+            return member
+    return _Member(
+        parsed.rows, parsed.kind, parsed.key, digest, False, member_size, parsed.parse_seconds, parsed.extract_seconds
+    )
+
+
+def _iter_classified(
+    tf: tarfile.TarFile, previous: _DigestIndex | None
+) -> Iterator[_Member | tuple[str, bytes, str]]:
+    """
+    yields a finished _Member for members whose bytes match the previous import
+    (and for large manifests, parsed in place), and (member_name, raw, digest)
+    for members that still need parsing
+    """
+    for member in tf:
+        if not member.isfile():
+            continue
+        basename = os.path.basename(member.name)
+        if not _is_archive_member(basename):
+            continue
+        f = tf.extractfile(member)
+        if f is None:
+            continue
+        if basename != "product.json" and member.size > _STREAM_MEMBER_BYTES:
+            yield _parse_manifest_stream(member.name, member.size, f, previous)
+            continue
+        raw = f.read()
+        digest = _digest(raw)
+        if previous is not None:
+            unchanged = previous.unchanged(member.name, digest, len(raw))
+            if unchanged is not None:
+                yield unchanged
+                continue
+        yield member.name, raw, digest
+
+
+def _parse_member(member_name: str, raw: bytes, digest: str) -> _Member:
+    """
+    decode one archive member and extract its rows; runs in pool workers, so no DB access.
+    """
+    basename = os.path.basename(member_name)
+    if basename != "product.json":
+        parsed = _parse_manifest(member_name, raw)
+        return _Member(
+            parsed.rows, parsed.kind, parsed.key, digest, False, len(raw), parsed.parse_seconds, parsed.extract_seconds
+        )
+
+    started = time.perf_counter()
+    try:
+        data = json_codec.loads(raw)
+    except json.JSONDecodeError:
+        # skip malformed JSON
+        return _Member(None, None, None, digest, False, len(raw), time.perf_counter() - started)
+    parsed = time.perf_counter()
+
+    batch = _RowBatch()
+    batch.add_product_data(data)
+    try:
+        key = int(data.get("id"))
+    except (TypeError, ValueError):
+        key = None
+    return _Member(batch, "product", key, digest, False, len(raw), parsed - started, time.perf_counter() - parsed)
+
+
+def _parse_members(members: list[tuple[str, bytes, str]]) -> list[_Member]:
+    return [_parse_member(*member) for member in members]
+
+
+_PIPELINE_DONE = object()
+
+
+def _iter_parsed_parallel(
+    archive_path: Path, workers: int, previous: _DigestIndex | None, decompress_threads: int | None
+) -> Iterator[_Member]:
+    """
+    reader thread -> process pool -> caller, in archive order.
+    the reader enqueues futures into a bounded queue, so it stalls once the caller
+    (the DB writer) falls a few tasks per worker behind. unchanged members bypass the pool.
+    """
+    pending: queue.Queue[Any] = queue.Queue(maxsize=workers * _QUEUE_DEPTH_PER_WORKER)
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
             try:
-                data = json.load(f)
-            except json.JSONDecodeError:
-                # skip malformed JSON
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
                 continue
-            
-            if basename == "product.json":
-                import_product_data(conn, data)
-            elif basename.endswith(".json"):
-                name_without_ext = basename[:-5]  # .json
-                if name_without_ext.isdigit():
-                    version = data.get("version")
-                    if version == 2:
-                        # inject buildId from filename if missing in manifest
-                        if "buildId" not in data:
-                            data["buildId"] = int(name_without_ext)
-                            logger.debug(f"Injected buildId {name_without_ext} from filename (source: {member.name})")
-                        import_build_data_gen2(conn, data)
-                    elif version == 1:
-                        # TODO: implement gen1 build manifest import
-                        temp_v1_builds += 1
-        logger.debug(f"Skipped {temp_v1_builds} gen1 build manifests in {archive_path}")
+        return False
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def reader() -> None:
+            try:
+                with xz_reader.open_tar(archive_path, threads=decompress_threads) as tf:
+                    to_parse: list[tuple[str, bytes, str]] = []
+                    resolved: list[_Member] = []
+                    for item in _iter_classified(tf, previous):
+                        # keep archive order: drain one list before starting the other
+                        if isinstance(item, _Member):
+                            if to_parse:
+                                if not put(pool.submit(_parse_members, to_parse)):
+                                    return
+                                to_parse = []
+                            resolved.append(item)
+                            if len(resolved) >= _MEMBERS_PER_TASK:
+                                if not put(resolved):
+                                    return
+                                resolved = []
+                        else:
+                            if resolved:
+                                if not put(resolved):
+                                    return
+                                resolved = []
+                            to_parse.append(item)
+                            if len(to_parse) >= _MEMBERS_PER_TASK:
+                                if not put(pool.submit(_parse_members, to_parse)):
+                                    return
+                                to_parse = []
+                    if to_parse and not put(pool.submit(_parse_members, to_parse)):
+                        return
+                    if resolved and not put(resolved):
+                        return
+                put(_PIPELINE_DONE)
+            except BaseException as exc:
+                put(exc)
+
+        thread = threading.Thread(target=reader, name="archive-reader", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = pending.get()
+                if item is _PIPELINE_DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                if isinstance(item, Future):
+                    yield from item.result()
+                else:
+                    yield from item
+        finally:
+            stop.set()
+            while not pending.empty():
+                item = pending.get_nowait()
+                if isinstance(item, Future):
+                    item.cancel()
+            thread.join()
+
+
+def _iter_parsed_serial(
+    archive_path: Path, previous: _DigestIndex | None, decompress_threads: int | None
+) -> Iterator[_Member]:
+    with xz_reader.open_tar(archive_path, threads=decompress_threads) as tf:
+        for item in _iter_classified(tf, previous):
+            yield item if isinstance(item, _Member) else _parse_member(*item)
+
+
+@dataclass
+class ImportStats:
+    """
+    per-run member counts, compared against the digests left by the previous import,
+    and where the time went; parse/extract seconds are summed over members, so with
+    workers > 1 they can exceed the run's wall time. new/changed members produced
+    rows; skipped ones yielded none (coming-soon or unsupported products, manifests
+    without products), in this run or, if unchanged and not parsed, as recorded with
+    their digest; unchanged ones match the previous digest and yielded rows.
+    """
+    new_products: int = 0
+    changed_products: int = 0
+    skipped_products: int = 0
+    unchanged_products: int = 0
+    vanished_products: int = 0
+    new_builds: int = 0
+    changed_builds: int = 0
+    skipped_builds: int = 0
+    unchanged_builds: int = 0
+    vanished_builds: int = 0
+    member_bytes: int = 0
+    rows_written: int = 0
+    parse_seconds: float = 0.0
+    extract_seconds: float = 0.0
+    flush_seconds: float = 0.0
+    seconds: float = 0.0
+
+    def count(self, kind: str, status: str) -> None:
+        name = f"{status}_{kind}s"
+        setattr(self, name, getattr(self, name) + 1)
+        _MEMBERS.inc(kind=kind, status=status)
+
+
+def _flush(batch: _RowBatch, conn: Connection, stats: ImportStats) -> None:
+    started = time.perf_counter()
+    stats.rows_written += batch.flush(conn)
+    elapsed = time.perf_counter() - started
+    stats.flush_seconds += elapsed
+    _FLUSH_SECONDS.observe(elapsed)
+
+
+def import_archive(
+    conn: Connection,
+    archive_path: Path,
+    *,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int = 1,
+    incremental: bool = True,
+    decompress_threads: int | None = None,
+) -> ImportStats:
+    """
+    Import product.json and gen1/gen2 build manifest (numeric buildID.json) files from a .tar.xz archive
+    rows are buffered across members and written once batch_size rows have accumulated.
+    with workers > 1, JSON decoding and row extraction run in a process pool while the
+    calling thread stays the only one that touches conn.
+    with incremental, members whose bytes match the digest recorded by the previous
+    import are not parsed or written; digests are refreshed either way.
+    decompress_threads is handed to xz_reader.open_tar (None: one per CPU).
+    a summary of the run is added to catalog_import_runs in the same transaction.
+    """
+    archive_path = archive_path.expanduser()
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    started = time.perf_counter()
+    previous = _DigestIndex.load(conn)
+    recorded_version = catalog_meta_mgr.get_value(conn, _EXTRACTOR_VERSION_KEY)
+    if recorded_version != EXTRACTOR_VERSION:
+        if previous.products or previous.builds:
+            logger.info(
+                "Member digests were recorded by extractor version %s (now %d); re-parsing every member",
+                recorded_version, EXTRACTOR_VERSION,
+            )
+            catalog_member_digests_mgr.clear(conn)
+            previous = _DigestIndex({}, {})
+        catalog_meta_mgr.set_value(conn, _EXTRACTOR_VERSION_KEY, EXTRACTOR_VERSION)
+    known = {"product": previous.products, "build": previous.builds}
+    seen: dict[str, set[int]] = {"product": set(), "build": set()}
+    stats = ImportStats()
+    batch = _RowBatch()
+    skip_index = previous if incremental else None
+    observe = metrics.enabled()
+    if workers > 1:
+        parsed = _iter_parsed_parallel(archive_path, workers, skip_index, decompress_threads)
+    else:
+        parsed = _iter_parsed_serial(archive_path, skip_index, decompress_threads)
+    for member in parsed:
+        stats.member_bytes += member.size
+        if not member.unchanged:
+            stats.parse_seconds += member.parse_seconds
+            stats.extract_seconds += member.extract_seconds
+            if observe:
+                _PARSE_SECONDS.observe(member.parse_seconds)
+                _EXTRACT_SECONDS.observe(member.extract_seconds)
+        if member.kind is not None and member.key is not None:
+            kind = "product" if member.kind == "product" else "build"
+            seen[kind].add(member.key)
+            previous_digest = known[kind].get(member.key)
+            if member.rows is not None:
+                produced_rows = len(member.rows) > 0
+            else:  # unchanged, not parsed (incremental): as recorded with its digest
+                produced_rows = member.key not in previous.skipped[kind]
+            if not produced_rows:
+                stats.count(kind, "skipped")
+            elif previous_digest == member.digest:
+                stats.count(kind, "unchanged")
+            else:
+                stats.count(kind, "new" if previous_digest is None else "changed")
+            if previous_digest != member.digest:
+                batch.digests.append(MemberDigestRow(kind, member.key, member.digest, produced_rows))
+        if member.rows is not None:
+            batch.extend(member.rows)
+        if len(batch) >= batch_size:
+            _flush(batch, conn, stats)
+    _flush(batch, conn, stats)
+    _MEMBER_BYTES.inc(stats.member_bytes)
+
+    for kind in ("product", "build"):
+        vanished = known[kind].keys() - seen[kind]
+        setattr(stats, f"vanished_{kind}s", len(vanished))
+        catalog_member_digests_mgr.delete_keys(conn, kind, vanished)
+    stats.seconds = time.perf_counter() - started
+    catalog_import_runs_mgr.insert_run(conn, {"source": str(archive_path), "started_at": started_at, **asdict(stats)})
+    logger.info(
+        "Imported %s: products new=%d changed=%d skipped=%d unchanged=%d vanished=%d; "
+        "builds new=%d changed=%d skipped=%d unchanged=%d vanished=%d",
+        archive_path,
+        stats.new_products, stats.changed_products, stats.skipped_products, stats.unchanged_products,
+        stats.vanished_products,
+        stats.new_builds, stats.changed_builds, stats.skipped_builds, stats.unchanged_builds,
+        stats.vanished_builds,
+    )
+    logger.info(
+        "Import of %s took %.2fs: %.1f MiB of members, parse %.2fs, extract %.2fs, %d rows written in %.2fs",
+        archive_path, stats.seconds, stats.member_bytes / 2**20,
+        stats.parse_seconds, stats.extract_seconds, stats.rows_written, stats.flush_seconds,
+    )
+    return stats
 
 def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(add_help=False)
@@ -282,7 +902,60 @@ def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
         "sources",
         type=Path,
         nargs="+",
-        help="One or more product.json files or .tar.xz archives to import",
+        help="One or more product.json files, .tar.xz archives or .jsonl changesets to import",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Rows buffered per executemany flush when importing archives (default: {DEFAULT_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes decoding and extracting archive members in parallel (default: 1, no pool)",
+    )
+    parser.add_argument(
+        "--decompress-threads",
+        type=int,
+        default=None,
+        help="Threads decoding xz blocks of multi-block archives (default: one per CPU; 1 disables)",
+    )
+    parser.add_argument(
+        "--product-id",
+        dest="product_ids",
+        type=int,
+        action="append",
+        help="Only import this product (repeatable); archives must be indexed with archive_index",
+    )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help=(
+            "Load into a tuned scratch copy without secondary indexes, then swap it in at the end; "
+            "holds the database's write lock throughout, so other writers fail with 'database is locked' "
+            "until it finishes (and it refuses to start while another writer is active)"
+        ),
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-import every archive member, even those unchanged since the last import",
+    )
+    parser.add_argument(
+        "--metrics",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help="Collect ingest counters and timing histograms and write them to PATH as JSON",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help="Run under cProfile and dump the stats to PATH (pstats format: snakeviz, flameprof, gprof2dot)",
     )
     args, _unknown = parser.parse_known_args(argv)
     return args
@@ -297,17 +970,48 @@ def cli(argv: list[str] | None = None) -> None:
     database_cfg = SETTINGS.get("database", {})
     db_path = Path(database_cfg.get("path", "data/catalog.db")).expanduser()
     dbase = db.Database(str(db_path))
-    
-    with dbase.connect() as conn:
+    if args.metrics:
+        metrics.enable()
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        _run_sources(dbase, args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            logger.info("Wrote profile to %s", args.profile)
+        if args.metrics:
+            args.metrics.write_text(metrics.to_json(), encoding="utf-8")
+            logger.info("Wrote metrics to %s", args.metrics)
+
+
+def _run_sources(dbase: db.Database, args: argparse.Namespace) -> None:
+    with (dbase.bulk_load() if args.bulk else dbase.connect()) as conn:
         for path in args.sources:
             if not path.exists():
                 raise FileNotFoundError(path)
             # Handle .tar.xz archives
-            if "".join(path.suffixes[-2:]) == ".tar.xz":
-                import_archive(conn, path)
+            if "".join(path.suffixes[-2:]) == ".tar.xz" and args.product_ids:
+                import_products_by_id(conn, path, args.product_ids)
+            elif "".join(path.suffixes[-2:]) == ".tar.xz":
+                import_archive(
+                    conn,
+                    path,
+                    batch_size=args.batch_size,
+                    workers=args.workers,
+                    incremental=not args.full,
+                    decompress_threads=args.decompress_threads,
+                )
             # Handle bare JSON files (product.json)
             elif path.suffix == ".json":
                 import_product_json(conn, path)
+            # Handle changesets from `process_archive diff`
+            elif path.suffix in (".jsonl", ".ndjson"):
+                apply_changeset(conn, path, batch_size=args.batch_size)
             else:
                 raise ValueError(f"Unsupported source type: {path}")
 
@@ -1,13 +1,14 @@
 from collections.abc import Iterable
-from typing import Optional, TypedDict
+from typing import Optional, NamedTuple
 
 from sqlalchemy import select
 from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.engine import Connection
 
+from . import db
 from .db_schema import catalog_installers
 
-class InstallerRow(TypedDict):
+class InstallerRow(NamedTuple):
     product_id: int
     installer_id: str
     language: Optional[str]
@@ -15,14 +16,27 @@ class InstallerRow(TypedDict):
     version: Optional[str]
 
 
+_UPSERT = insert(catalog_installers)
+_UPSERT = _UPSERT.on_conflict_do_update(
+    index_elements=[catalog_installers.c.product_id, catalog_installers.c.installer_id],
+    set_={c.name: _UPSERT.excluded[c.name] for c in catalog_installers.c if not c.primary_key},
+)
+_UPSERT_SQL = db.positional_sql(_UPSERT, InstallerRow._fields)
+
+
 def upsert_installer(conn: Connection, row: InstallerRow) -> None:
-    stmt = insert(catalog_installers).values(**row)
-    stmt = stmt.on_conflict_do_update(
-        index_elements=[catalog_installers.c.product_id, catalog_installers.c.installer_id],
-        set_=row,
-    )
-    conn.execute(stmt)
+    conn.exec_driver_sql(_UPSERT_SQL, row)
 
 def upsert_many(conn: Connection, rows: Iterable[InstallerRow]) -> None:
-    for row in rows:
-        upsert_installer(conn, row)
+    """single executemany over all rows, bound positionally"""
+    params = list(rows)
+    if params:
+        conn.exec_driver_sql(_UPSERT_SQL, params)
+
+def get_for_product(conn: Connection, product_id: int) -> list[InstallerRow]:
+    stmt = (
+        select(catalog_installers)
+        .where(catalog_installers.c.product_id == product_id)
+        .order_by(catalog_installers.c.installer_id)
+    )
+    return [InstallerRow(**row) for row in conn.execute(stmt).mappings()]
@@ -0,0 +1,64 @@
+from collections.abc import Iterable
+from typing import NamedTuple
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+
+from . import db
+from .db_schema import catalog_member_digests
+
+
+class MemberDigestRow(NamedTuple):
+    kind: str    # "product" (key = product id) or "build" (key = build id)
+    key: int
+    digest: str  # content digest of the archive member bytes
+    produced_rows: bool  # False if the member was parsed but yielded no rows
+
+
+_UPSERT = insert(catalog_member_digests)
+_UPSERT = _UPSERT.on_conflict_do_update(
+    index_elements=[catalog_member_digests.c.kind, catalog_member_digests.c.key],
+    set_={c.name: _UPSERT.excluded[c.name] for c in catalog_member_digests.c if not c.primary_key},
+)
+_UPSERT_SQL = db.positional_sql(_UPSERT, MemberDigestRow._fields)
+
+
+def upsert_many(conn: Connection, rows: Iterable[MemberDigestRow]) -> None:
+    """single executemany over all rows, bound positionally"""
+    params = list(rows)
+    if params:
+        conn.exec_driver_sql(_UPSERT_SQL, params)
+
+
+def get_all(conn: Connection, kind: str) -> dict[int, str]:
+    stmt = select(
+        catalog_member_digests.c.key,
+        catalog_member_digests.c.digest,
+    ).where(catalog_member_digests.c.kind == kind)
+    return {row.key: row.digest for row in conn.execute(stmt)}
+
+
+def get_skipped_keys(conn: Connection, kind: str) -> set[int]:
+    """keys of members that yielded no rows when last parsed"""
+    stmt = select(catalog_member_digests.c.key).where(
+        catalog_member_digests.c.kind == kind,
+        catalog_member_digests.c.produced_rows.is_(False),
+    )
+    return set(conn.execute(stmt).scalars())
+
+
+def delete_keys(conn: Connection, kind: str, keys: Iterable[int]) -> None:
+    key_list = list(set(keys))
+    # stay well under SQLite's bound-parameter limit
+    for start in range(0, len(key_list), 500):
+        conn.execute(
+            delete(catalog_member_digests).where(
+                catalog_member_digests.c.kind == kind,
+                catalog_member_digests.c.key.in_(key_list[start:start + 500]),
+            )
+        )
+
+
+def clear(conn: Connection) -> None:
+    conn.execute(delete(catalog_member_digests))
@@ -0,0 +1,32 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+
+from .db_schema import catalog_meta
+
+_GENERATION = "generation"
+
+_BUMP = insert(catalog_meta).values(key=_GENERATION, value=1)
+_BUMP = _BUMP.on_conflict_do_update(
+    index_elements=[catalog_meta.c.key],
+    set_={"value": catalog_meta.c.value + 1},
+)
+
+
+def bump_generation(conn: Connection) -> None:
+    """mark the catalog as changed; takes effect when conn's transaction commits"""
+    conn.execute(_BUMP)
+
+
+def get_generation(conn: Connection) -> int:
+    stmt = select(catalog_meta.c.value).where(catalog_meta.c.key == _GENERATION)
+    return conn.execute(stmt).scalar_one_or_none() or 0
+
+
+def get_value(conn: Connection, key: str) -> int | None:
+    return conn.execute(select(catalog_meta.c.value).where(catalog_meta.c.key == key)).scalar_one_or_none()
+
+
+def set_value(conn: Connection, key: str, value: int) -> None:
+    stmt = insert(catalog_meta).values(key=key, value=value)
+    conn.execute(stmt.on_conflict_do_update(index_elements=[catalog_meta.c.key], set_={"value": value}))
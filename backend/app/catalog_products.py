@@ -1,14 +1,15 @@
 from collections.abc import Iterable
-from typing import Optional, TypedDict
+from typing import Optional, NamedTuple
 
 from sqlalchemy import select
 from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.engine import Connection
 
+from . import db
 from .db_schema import catalog_products
 
 
-class ProductRow(TypedDict):
+class ProductRow(NamedTuple):
     id: int
     type: str
     slug: str
@@ -18,18 +19,23 @@ class ProductRow(TypedDict):
     image_boxart: Optional[str]
 
 
+_UPSERT = insert(catalog_products)
+_UPSERT = _UPSERT.on_conflict_do_update(
+    index_elements=[catalog_products.c.id],
+    set_={c.name: _UPSERT.excluded[c.name] for c in catalog_products.c if not c.primary_key},
+)
+_UPSERT_SQL = db.positional_sql(_UPSERT, ProductRow._fields)
+
+
 def upsert_product(conn: Connection, row: ProductRow) -> None:
-    stmt = insert(catalog_products).values(**row)
-    stmt = stmt.on_conflict_do_update(
-        index_elements=[catalog_products.c.id],
-        set_=row,
-    )
-    conn.execute(stmt)
+    conn.exec_driver_sql(_UPSERT_SQL, row)
 
 
 def upsert_many(conn: Connection, rows: Iterable[ProductRow]) -> None:
-    for row in rows:
-        upsert_product(conn, row)
+    """single executemany over all rows, bound positionally"""
+    params = list(rows)
+    if params:
+        conn.exec_driver_sql(_UPSERT_SQL, params)
 
 
 def get_by_id(conn: Connection, product_id: int) -> Optional[ProductRow]:
@@ -44,6 +50,33 @@ def get_by_slug(conn: Connection, slug: str) -> Optional[ProductRow]:
     return None if result is None else ProductRow(**result)
 
 
+def get_many_by_id(conn: Connection, ids: Iterable[int]) -> dict[int, ProductRow]:
+    """products keyed by id; ids not in the catalog are absent"""
+    id_list = list(set(ids))
+    products: dict[int, ProductRow] = {}
+    # stay well under SQLite's bound-parameter limit
+    for start in range(0, len(id_list), 500):
+        stmt = select(catalog_products).where(catalog_products.c.id.in_(id_list[start:start + 500]))
+        for row in conn.execute(stmt).mappings():
+            products[row["id"]] = ProductRow(**row)
+    return products
+
+
+def get_many_by_slug(conn: Connection, slugs: Iterable[str]) -> dict[str, list[ProductRow]]:
+    """products keyed by slug (slugs are not unique), ordered by id"""
+    slug_list = list(set(slugs))
+    products: dict[str, list[ProductRow]] = {}
+    for start in range(0, len(slug_list), 500):
+        stmt = (
+            select(catalog_products)
+            .where(catalog_products.c.slug.in_(slug_list[start:start + 500]))
+            .order_by(catalog_products.c.id)
+        )
+        for row in conn.execute(stmt).mappings():
+            products.setdefault(row["slug"], []).append(ProductRow(**row))
+    return products
+
+
 def get_id_by_slug(conn: Connection, slug: str) -> Optional[int]:
     stmt = select(catalog_products.c.id).where(catalog_products.c.slug == slug)
     result = conn.execute(stmt).scalar_one_or_none()
@@ -76,4 +109,11 @@ def get_slugs_by_ids(conn: Connection, ids: Iterable[int]) -> dict[int, str]:
     mapping: dict[int, str] = {}
     for row in rows:
         mapping[row['id']] = row['slug']
-    return mapping
\ No newline at end of file
+    return mapping
+
+def list_after(conn: Connection, after_id: int | None, limit: int) -> list[ProductRow]:
+    """keyset page: up to limit products with id > after_id, by id"""
+    stmt = select(catalog_products).order_by(catalog_products.c.id).limit(limit)
+    if after_id is not None:
+        stmt = stmt.where(catalog_products.c.id > after_id)
+    return [ProductRow(**row) for row in conn.execute(stmt).mappings()]
@@ -0,0 +1,147 @@
+"""
+cached, batched reads of the catalog for request handlers and library views.
+
+lookups go through bounded LRU caches keyed by product id (or slug); misses are
+fetched together with one batched query per call. every call first reads the
+catalog generation (catalog_meta), which catalog_ingest bumps in the same
+transaction as its writes, and drops all cached rows once it has moved on.
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from typing import Generic, Optional, TypeVar
+
+from sqlalchemy.engine import Connection
+
+from . import db
+from . import catalog_products as catalog_products_mgr
+from . import catalog_builds as catalog_builds_mgr
+from . import catalog_dlcs as catalog_dlcs_mgr
+from . import catalog_meta as catalog_meta_mgr
+from .catalog_products import ProductRow
+from .catalog_builds import BuildRow
+from .catalog_dlcs import DlcRow
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class _LRU(Generic[K, V]):
+    """bounded mapping that evicts the least recently used key; not thread-safe"""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict[K, V] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K, default=_MISSING):
+        try:
+            value = self._data[key]
+        except KeyError:
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key: K, value: V) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class CatalogReader:
+    """
+    thread-safe; one instance per process is enough. absent rows are cached too,
+    so asking again for an unknown id does not hit the database until the next import.
+    """
+
+    def __init__(self, database: db.Database, *, maxsize: int = 10000) -> None:
+        self._database = database
+        self._lock = threading.Lock()
+        self._generation: int | None = None
+        self._products: _LRU[int, Optional[ProductRow]] = _LRU(maxsize)
+        self._slugs: _LRU[str, list[ProductRow]] = _LRU(maxsize)
+        self._latest_builds: _LRU[int, Optional[BuildRow]] = _LRU(maxsize)
+        self._installable_dlcs: _LRU[int, list[DlcRow]] = _LRU(maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def _clear(self) -> None:
+        self._products.clear()
+        self._slugs.clear()
+        self._latest_builds.clear()
+        self._installable_dlcs.clear()
+
+    def _lookup(
+        self,
+        cache: _LRU,
+        keys: Iterable,
+        fetch: Callable[[Connection, list], dict],
+        default: Callable[[], object],
+    ) -> dict:
+        """cached values for keys, fetching all misses at once; default() fills absent keys"""
+        keys = list(dict.fromkeys(keys))
+        with self._database.connect_readonly() as conn:
+            generation = catalog_meta_mgr.get_generation(conn)
+            with self._lock:
+                if generation != self._generation:
+                    self._clear()
+                    self._generation = generation
+                found = {}
+                missing = []
+                for key in keys:
+                    value = cache.get(key)
+                    if value is _MISSING:
+                        missing.append(key)
+                    else:
+                        found[key] = value
+                self.hits += len(found)
+                self.misses += len(missing)
+            if not missing:
+                return found
+            fetched = fetch(conn, missing)
+        with self._lock:
+            # a newer import may have landed meanwhile; its rows are fine to return
+            # but must not be cached under the old generation
+            cacheable = generation == self._generation
+            for key in missing:
+                value = fetched.get(key)
+                if value is None:
+                    value = default()
+                found[key] = value
+                if cacheable:
+                    cache.put(key, value)
+        return found
+
+    def products(self, ids: Iterable[int]) -> dict[int, ProductRow]:
+        found = self._lookup(self._products, ids, catalog_products_mgr.get_many_by_id, lambda: None)
+        return {key: row for key, row in found.items() if row is not None}
+
+    def product(self, product_id: int) -> Optional[ProductRow]:
+        return self.products([product_id]).get(product_id)
+
+    def products_by_slug(self, slugs: Iterable[str]) -> dict[str, list[ProductRow]]:
+        found = self._lookup(self._slugs, slugs, catalog_products_mgr.get_many_by_slug, list)
+        return {key: rows for key, rows in found.items() if rows}
+
+    def latest_builds(self, product_ids: Iterable[int]) -> dict[int, BuildRow]:
+        found = self._lookup(self._latest_builds, product_ids, catalog_builds_mgr.get_latest_for_products, lambda: None)
+        return {key: row for key, row in found.items() if row is not None}
+
+    def latest_build(self, product_id: int) -> Optional[BuildRow]:
+        return self.latest_builds([product_id]).get(product_id)
+
+    def installable_dlcs(self, parent_ids: Iterable[int]) -> dict[int, list[DlcRow]]:
+        return self._lookup(self._installable_dlcs, parent_ids, catalog_dlcs_mgr.get_installable_for_parents, list)
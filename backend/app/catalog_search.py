@@ -0,0 +1,125 @@
+"""
+ranked product search over titles and slugs, backed by the FTS5 tables in db_schema.
+
+a query is split into words; every word must match the start of a title or slug
+word ("witch 3" finds "The Witcher 3: Wild Hunt"), ranked by bm25 with title
+matches weighted above slug matches. when that finds fewer than limit products
+and fuzzy is set, the rest is filled from the trigram index: candidates sharing
+the most three-letter sequences with the query are re-ranked by similarity, which
+catches typos ("wticher") and matches inside words.
+"""
+
+import difflib
+import re
+from collections.abc import Iterable
+from typing import Literal, TypedDict
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+
+from .catalog_products import ProductRow
+
+
+class SearchHit(TypedDict):
+    id: int
+    slug: str
+    title: str
+    match: Literal["prefix", "fuzzy"]
+    score: float  # prefix: -bm25 (higher is better); fuzzy: similarity in 0..1
+
+
+_TITLE_WEIGHT = 10.0
+_SLUG_WEIGHT = 4.0
+# trigram candidates fetched per requested fuzzy hit, before re-ranking
+_FUZZY_CANDIDATES = 8
+_FUZZY_MIN_SIMILARITY = 0.4
+
+_WORD = re.compile(r"\w+")
+
+_PREFIX_SEARCH = text(
+    f"SELECT rowid AS id, slug, title, bm25(catalog_search, {_TITLE_WEIGHT}, {_SLUG_WEIGHT}) AS rank"
+    " FROM catalog_search WHERE catalog_search MATCH :query ORDER BY rank LIMIT :limit"
+)
+_TRIGRAM_SEARCH = text(
+    "SELECT rowid AS id, slug, title FROM catalog_search_trigram"
+    " WHERE catalog_search_trigram MATCH :query ORDER BY rank LIMIT :limit"
+)
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _prefix_query(words: list[str]) -> str:
+    return " AND ".join(_quote(word) + "*" for word in words)
+
+
+def _trigram_query(words: list[str]) -> str | None:
+    trigrams = {word[i:i + 3] for word in words for i in range(len(word) - 2)}
+    if not trigrams:
+        return None
+    return " OR ".join(_quote(trigram) for trigram in sorted(trigrams))
+
+
+def _similarity(query: str, hit: dict) -> float:
+    return max(
+        difflib.SequenceMatcher(None, query, hit["title"].lower()).ratio(),
+        difflib.SequenceMatcher(None, query, hit["slug"].lower().replace("_", " ")).ratio(),
+    )
+
+
+def search(conn: Connection, query: str, *, limit: int = 20, fuzzy: bool = True) -> list[SearchHit]:
+    words = _WORD.findall(query.lower())
+    if not words or limit <= 0:
+        return []
+    hits: list[SearchHit] = [
+        SearchHit(id=row.id, slug=row.slug, title=row.title, match="prefix", score=-row.rank)
+        for row in conn.execute(_PREFIX_SEARCH, {"query": _prefix_query(words), "limit": limit})
+    ]
+    if not fuzzy or len(hits) >= limit:
+        return hits
+    trigram_query = _trigram_query(words)
+    if trigram_query is None:
+        return hits
+
+    seen = {hit["id"] for hit in hits}
+    wanted = limit - len(hits)
+    normalized = " ".join(words)
+    candidates = []
+    params = {"query": trigram_query, "limit": wanted * _FUZZY_CANDIDATES + len(seen)}
+    for row in conn.execute(_TRIGRAM_SEARCH, params).mappings():
+        if row["id"] in seen:
+            continue
+        similarity = _similarity(normalized, row)
+        if similarity >= _FUZZY_MIN_SIMILARITY:
+            candidates.append((similarity, row))
+    candidates.sort(key=lambda item: (-item[0], item[1]["id"]))
+    hits.extend(
+        SearchHit(id=row["id"], slug=row["slug"], title=row["title"], match="fuzzy", score=round(similarity, 4))
+        for similarity, row in candidates[:wanted]
+    )
+    return hits
+
+
+def index_products(conn: Connection, rows: Iterable[ProductRow]) -> None:
+    """(re)index upserted products: drop their old entries, insert the new title/slug"""
+    # the last row wins when a batch holds one product twice, as with the upsert
+    latest = {row.id: {"id": row.id, "title": row.title, "slug": row.slug} for row in rows}
+    if not latest:
+        return
+    ids = list(latest)
+    params = list(latest.values())
+    for table in ("catalog_search", "catalog_search_trigram"):
+        delete = text(f"DELETE FROM {table} WHERE rowid IN :ids").bindparams(bindparam("ids", expanding=True))
+        # stay well under SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            conn.execute(delete, {"ids": ids[start:start + 500]})
+        conn.execute(text(f"INSERT INTO {table} (rowid, title, slug) VALUES (:id, :title, :slug)"), params)
+
+
+def rebuild(conn: Connection) -> None:
+    """re-create both indexes from catalog_products"""
+    for table in ("catalog_search", "catalog_search_trigram"):
+        conn.execute(text(f"DELETE FROM {table}"))
+        conn.execute(text(f"INSERT INTO {table} (rowid, title, slug) SELECT id, title, slug FROM catalog_products"))
+        conn.execute(text(f"INSERT INTO {table} ({table}) VALUES ('optimize')"))
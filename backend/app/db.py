@@ -1,38 +1,213 @@
 import argparse
+import os
+import sqlite3
+import time
 from contextlib import contextmanager
 from pathlib import Path
+from collections.abc import Sequence
 from typing import Generator
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.engine import Engine, Connection
+from sqlalchemy.pool import QueuePool
 
 import logging
 from . import db_schema
+from . import metrics
 
 logger = logging.getLogger(__name__)
 
+_COMMIT_SECONDS = metrics.histogram("db_commit_seconds", "Writer transaction commit latency (bulk: swap into the live file)")
+
+# prepared statements kept per sqlite3 connection (the driver default is 128)
+_CACHED_STATEMENTS = 256
+# compiled SQL kept per engine (the SQLAlchemy default is 500)
+_QUERY_CACHE_SIZE = 1000
+
+
 class Database:
-    def __init__(self, path: str):
+    """
+    one writer connection, shared by every connect() caller in turn, and a pool of
+    read-only (mode=ro, query_only) connections for connect_readonly(). in WAL mode
+    readers see the last committed state and never wait behind an import transaction.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        read_pool_size: int = 8,
+        read_max_overflow: int = 8,
+        mmap_mib: int = 256,
+        read_cache_mib: int = 32,
+    ):
         self.db_path = path
-        self.engine: Engine = create_engine(f"sqlite:///{self.db_path}", future=True)
+        self.engine: Engine = create_engine(
+            f"sqlite:///{self.db_path}",
+            future=True,
+            poolclass=QueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=60,
+            query_cache_size=_QUERY_CACHE_SIZE,
+            connect_args={"check_same_thread": False, "cached_statements": _CACHED_STATEMENTS},
+        )
+        event.listen(self.engine, "connect", _writer_pragmas)
         self._init_pragma()
         logger.info(f"Database engine created for {self.db_path}")
         db_schema.ensure_schema(self.engine)
 
+        read_pragmas = (
+            "PRAGMA query_only=ON",
+            "PRAGMA busy_timeout=5000",
+            f"PRAGMA mmap_size={mmap_mib * 1024 * 1024}",
+            f"PRAGMA cache_size=-{read_cache_mib * 1024}",
+        )
+        self.read_engine: Engine = create_engine(
+            f"sqlite:///file:{Path(self.db_path).resolve()}?mode=ro&uri=true",
+            future=True,
+            poolclass=QueuePool,
+            pool_size=read_pool_size,
+            max_overflow=read_max_overflow,
+            pool_timeout=30,
+            query_cache_size=_QUERY_CACHE_SIZE,
+            connect_args={"check_same_thread": False, "cached_statements": _CACHED_STATEMENTS},
+        )
+
+        @event.listens_for(self.read_engine, "connect")
+        def _read_pragmas(dbapi_conn, _record) -> None:
+            cursor = dbapi_conn.cursor()
+            for pragma in read_pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
     def _init_pragma(self) -> None:
         with self.engine.connect() as conn:
             conn.exec_driver_sql("PRAGMA journal_mode=WAL;")
-            conn.exec_driver_sql("PRAGMA busy_timeout=5000;")
+
+    def dispose(self) -> None:
+        self.engine.dispose()
+        self.read_engine.dispose()
 
     @contextmanager
     def connect(self) -> Generator[Connection, None, None]:
-        with self.engine.begin() as conn:
-            yield conn
+        with self.engine.connect() as conn:
+            with conn.begin() as transaction:
+                yield conn
+                started = time.perf_counter()
+                transaction.commit()
+                _COMMIT_SECONDS.observe(time.perf_counter() - started, mode="transaction")
 
     @contextmanager
     def connect_readonly(self) -> Generator[Connection, None, None]:
-        with self.engine.connect() as conn:
+        with self.read_engine.connect() as conn:
             yield conn
 
+    @contextmanager
+    def bulk_load(self, *, cache_mib: int = 512) -> Generator[Connection, None, None]:
+        """
+        transaction on a scratch copy of the database, tuned for bulk writes: no fsync,
+        in-memory temp storage, a large page cache and the secondary catalog indexes
+        dropped until the load is done. on success every table of the copy replaces its
+        live counterpart in one write transaction, so readers keep seeing the previous
+        catalog until it commits. on failure the live database is left untouched.
+
+        the writer connection holds the live database's write lock (BEGIN IMMEDIATE)
+        from the copy-out to the swap, so no write can land in between and be lost:
+        connect() callers in this process wait for the writer connection, and writers
+        in other processes get "database is locked" once their busy timeout runs out.
+        if another writer already holds the lock, this fails the same way instead of
+        starting.
+        """
+        live = Path(self.db_path)
+        scratch = live.with_name(f"{live.name}.bulk-{os.getpid()}")
+        scratch.unlink(missing_ok=True)
+        with self.engine.connect() as writer:
+            guard = writer.connection.dbapi_connection
+            guard.execute("BEGIN IMMEDIATE")
+            try:
+                _sqlite_copy(live, scratch)
+                engine = create_engine(f"sqlite:///{scratch}", future=True)
+
+                @event.listens_for(engine, "connect")
+                def _bulk_pragmas(dbapi_conn, _record) -> None:
+                    cursor = dbapi_conn.cursor()
+                    cursor.execute("PRAGMA journal_mode=MEMORY")
+                    cursor.execute("PRAGMA synchronous=OFF")
+                    cursor.execute("PRAGMA temp_store=MEMORY")
+                    cursor.execute(f"PRAGMA cache_size=-{cache_mib * 1024}")
+                    cursor.execute("PRAGMA locking_mode=EXCLUSIVE")
+                    cursor.close()
+
+                try:
+                    with engine.begin() as conn:
+                        db_schema.drop_catalog_indexes(conn)
+                        yield conn
+                        logger.info("Bulk load done, rebuilding catalog indexes")
+                        db_schema.create_catalog_indexes(conn)
+                finally:
+                    engine.dispose()
+                logger.info(f"Swapping bulk-loaded copy into {live}")
+                started = time.perf_counter()
+                _swap_tables(guard, scratch)
+                guard.commit()
+                _COMMIT_SECONDS.observe(time.perf_counter() - started, mode="bulk")
+            except BaseException:
+                guard.rollback()
+                raise
+            finally:
+                if any(row[1] == "bulk" for row in guard.execute("PRAGMA database_list")):
+                    guard.execute("DETACH DATABASE bulk")
+                scratch.unlink(missing_ok=True)
+
+
+def positional_sql(stmt, fields: Sequence[str]) -> str:
+    """
+    SQLite text for stmt with one ? per field, in fields order, so rows can be passed as
+    plain tuples to Connection.exec_driver_sql (executemany for a list of them)
+    """
+    compiled = stmt.compile(dialect=sqlite.dialect())
+    if list(compiled.positiontup) != list(fields):
+        raise ValueError(f"statement parameters {compiled.positiontup} do not match row fields {list(fields)}")
+    return str(compiled)
+
+
+def _writer_pragmas(dbapi_conn, _record) -> None:
+    # per-connection settings; journal_mode=WAL is persistent and set once in _init_pragma
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+def _swap_tables(conn: sqlite3.Connection, scratch: Path) -> None:
+    """
+    replace the rows of every table in conn's database with those of the same table in
+    scratch, inside conn's open transaction. FTS5 tables are carried over through their
+    shadow tables; the virtual tables themselves hold no rows.
+    """
+    conn.execute("ATTACH DATABASE ? AS bulk", (str(scratch),))
+    tables = [
+        name
+        for (name,) in conn.execute(
+            "SELECT name FROM bulk.sqlite_master WHERE type = 'table' "
+            "AND name NOT LIKE 'sqlite!_%' ESCAPE '!' AND sql NOT LIKE 'CREATE VIRTUAL TABLE%'"
+        )
+    ]
+    for name in tables:
+        conn.execute(f'DELETE FROM main."{name}"')
+        conn.execute(f'INSERT INTO main."{name}" SELECT * FROM bulk."{name}"')
+
+
+def _sqlite_copy(src: Path, dst: Path) -> None:
+    """copy every page of src over dst in a single backup step (one write transaction on dst)"""
+    source = sqlite3.connect(src)
+    target = sqlite3.connect(dst, timeout=60)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
 if __name__ == "__main__":
     from . import log
     from . import config
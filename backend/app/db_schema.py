@@ -1,13 +1,16 @@
 from sqlalchemy import (
     MetaData, Table, Column,
-    Integer, String, Text, Boolean,
-    ForeignKey, UniqueConstraint, Index,
+    Integer, String, Text, Boolean, Float,
+    ForeignKey, UniqueConstraint, Index, text,
 )
 
 metadata = MetaData()
 
 def ensure_schema(engine) -> None:
     metadata.create_all(engine)
+    with engine.begin() as conn:
+        _ensure_search_tables(conn)
+        _ensure_added_columns(conn)
 
 catalog_products = Table(
     "catalog_products",
@@ -60,12 +63,70 @@ catalog_installers = Table(
     Column("version", String, nullable=True),
 )
 
-Index(
+# content digest of each archive member from the last import, for incremental re-imports
+catalog_member_digests = Table(
+    "catalog_member_digests",
+    metadata,
+    Column("kind", String, primary_key=True),
+    Column("key", Integer, primary_key=True),
+    Column("digest", String, nullable=False),
+    # False when the member was imported but yielded no rows (coming-soon product, ...)
+    Column("produced_rows", Boolean, nullable=False, server_default="1"),
+)
+
+# catalog-wide counters; "generation" is bumped by every catalog_ingest write, so
+# readers can tell their cached rows are stale
+catalog_meta = Table(
+    "catalog_meta",
+    metadata,
+    Column("key", String, primary_key=True),
+    Column("value", Integer, nullable=False),
+)
+
+# one row per catalog_ingest.import_archive run: member counts and where the time went
+catalog_import_runs = Table(
+    "catalog_import_runs",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("source", Text, nullable=False),
+    Column("started_at", String, nullable=False),
+    Column("seconds", Float, nullable=False),
+    Column("new_products", Integer, nullable=False),
+    Column("changed_products", Integer, nullable=False),
+    Column("skipped_products", Integer, nullable=False, server_default="0"),
+    Column("unchanged_products", Integer, nullable=False),
+    Column("vanished_products", Integer, nullable=False),
+    Column("new_builds", Integer, nullable=False),
+    Column("changed_builds", Integer, nullable=False),
+    Column("skipped_builds", Integer, nullable=False, server_default="0"),
+    Column("unchanged_builds", Integer, nullable=False),
+    Column("vanished_builds", Integer, nullable=False),
+    Column("member_bytes", Integer, nullable=False),
+    Column("rows_written", Integer, nullable=False),
+    Column("parse_seconds", Float, nullable=False),    # summed over members (and workers)
+    Column("extract_seconds", Float, nullable=False),  # summed over members (and workers)
+    Column("flush_seconds", Float, nullable=False),
+)
+
+idx_catalog_builds_product_date = Index(
     "idx_catalog_builds_product_date",
     catalog_builds.c.product_id,
     catalog_builds.c.date_published.desc(),
 )
-Index("idx_catalog_products_slug", catalog_products.c.slug)
+idx_catalog_products_slug = Index("idx_catalog_products_slug", catalog_products.c.slug)
+
+# secondary catalog indexes; bulk loads drop them and build them once at the end
+CATALOG_INDEXES = (idx_catalog_builds_product_date, idx_catalog_products_slug)
+
+
+def drop_catalog_indexes(conn) -> None:
+    for index in CATALOG_INDEXES:
+        index.drop(conn, checkfirst=True)
+
+
+def create_catalog_indexes(conn) -> None:
+    for index in CATALOG_INDEXES:
+        index.create(conn, checkfirst=True)
 
 
 library_stores = Table(
@@ -89,6 +150,32 @@ library_products = Table(
     UniqueConstraint("store_id", "product_id", name="uix_store_product")
 )
 
+Index("idx_library_products_product", library_products.c.product_id)
+
+# files seen by the last library scan; unchanged (size, mtime_ns) files are not re-hashed
+library_files = Table(
+    "library_files",
+    metadata,
+    Column("store_id", Integer, ForeignKey("library_stores.id"), primary_key=True),
+    Column("path", Text, primary_key=True),  # relative to the store path, "/"-separated
+    Column("size", Integer, nullable=False),
+    Column("mtime_ns", Integer, nullable=False),
+    Column("fingerprint_id", Integer, ForeignKey("artifact_fingerprints.id"), nullable=True),
+)
+
+# per library product, the newest catalog build and whether the local copy predates it;
+# kept current by catalog_ingest (builds change) and library scans (local copies change)
+library_staleness = Table(
+    "library_staleness",
+    metadata,
+    Column("store_id", Integer, ForeignKey("library_stores.id"), primary_key=True),
+    Column("product_id", Integer, ForeignKey("catalog_products.id"), primary_key=True),
+    Column("latest_build_id", Integer, nullable=True),
+    Column("latest_date", String, nullable=True),
+    Column("is_stale", Boolean, nullable=False),
+)
+Index("idx_library_staleness_stale", library_staleness.c.is_stale, library_staleness.c.store_id)
+
 artifact_fingerprints = Table(
     "artifact_fingerprints",
     metadata,
@@ -101,3 +188,44 @@ artifact_fingerprints = Table(
     Column("sig_timestamp", String, nullable=True),
     UniqueConstraint("hash_type", "hash_value", name="uix_hash_type_value")
 )
+
+
+# FTS5 indexes over catalog_products titles and slugs, rowid = product id (see
+# catalog_search). catalog_search tokenizes words and keeps prefix indexes for 2-4
+# characters; catalog_search_trigram backs substring and typo-tolerant matching.
+# virtual tables have no Table form, so they are created from raw DDL.
+CATALOG_SEARCH_DDL = {
+    "catalog_search": (
+        "CREATE VIRTUAL TABLE catalog_search USING fts5("
+        "title, slug, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+    ),
+    "catalog_search_trigram": (
+        "CREATE VIRTUAL TABLE catalog_search_trigram USING fts5(title, slug, tokenize = 'trigram')"
+    ),
+}
+
+
+# columns introduced after their table was first created: (table, column, definition)
+_ADDED_COLUMNS = (
+    ("catalog_import_runs", "skipped_products", "INTEGER NOT NULL DEFAULT 0"),
+    ("catalog_import_runs", "skipped_builds", "INTEGER NOT NULL DEFAULT 0"),
+    ("catalog_member_digests", "produced_rows", "BOOLEAN NOT NULL DEFAULT 1"),
+)
+
+
+def _ensure_added_columns(conn) -> None:
+    """add the _ADDED_COLUMNS an older database is missing"""
+    for table, name, definition in _ADDED_COLUMNS:
+        existing = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {definition}"))
+
+
+def _ensure_search_tables(conn) -> None:
+    """create missing search tables and fill them from catalog_products once"""
+    existing = set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars())
+    for name, ddl in CATALOG_SEARCH_DDL.items():
+        if name in existing:
+            continue
+        conn.execute(text(ddl))
+        conn.execute(text(f"INSERT INTO {name} (rowid, title, slug) SELECT id, title, slug FROM catalog_products"))
@@ -0,0 +1,455 @@
+"""
+watch the [dropzone] path and ingest what lands there.
+
+snapshot archives (.tar.xz) go to catalog_ingest.import_archive, installers (.exe)
+are fingerprinted into artifact_fingerprints. changes are seen through inotify
+(ctypes, Linux) or, elsewhere or when inotify is unavailable, by polling. a file
+is only queued once its size and mtime have stayed the same for settle_seconds,
+so downloads still in progress are left alone.
+
+queued work lives in a small SQLite file next to the catalog (the same sidecar
+approach as archive_index), so it survives restarts and does not contend with
+the catalog's single writer. asyncio workers drain it with a concurrency limit
+per kind; blocking work runs in threads, PE parsing in a process pool. archive
+imports hold the catalog's writer for their whole run, so they are serialized:
+one at a time, with installer fingerprint writes waiting in between. a failed
+item is retried after a growing delay, up to MAX_ATTEMPTS attempts.
+
+the dropzone directory itself is watched, not its subdirectories.
+"""
+
+import argparse
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import sqlite3
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import logging
+
+from . import db
+from . import catalog_ingest
+from . import hashing
+from . import library_scan
+from . import artifact_fingerprints as artifact_fingerprints_mgr
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE = "archive"
+INSTALLER = "installer"
+DEFAULT_LIMITS = {ARCHIVE: 1, INSTALLER: 2}
+MAX_ATTEMPTS = 3
+# delay before retrying a failed item, doubled for each further attempt
+RETRY_DELAY_SECONDS = 30.0
+
+_QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL DEFAULT 0,  -- unix time; failed items wait until then
+    error TEXT,
+    enqueued_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    UNIQUE (path, size, mtime_ns)
+);
+CREATE INDEX IF NOT EXISTS idx_queue_status_kind ON queue (status, kind, id);
+"""
+
+
+def classify(path: Path) -> Optional[str]:
+    name = path.name.lower()
+    if name.endswith(".tar.xz"):
+        return ARCHIVE
+    if name.endswith(".exe"):
+        return INSTALLER
+    return None
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+@dataclass
+class QueueItem:
+    id: int
+    path: str
+    kind: str
+    attempts: int
+
+
+class WorkQueue:
+    """persistent queue of dropped files; each (path, size, mtime) is queued once"""
+
+    def __init__(self, path: Path) -> None:
+        self._con = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.executescript(_QUEUE_SCHEMA)
+        columns = {row[1] for row in self._con.execute("PRAGMA table_info(queue)")}
+        if "not_before" not in columns:
+            # queue files from before retry backoff
+            self._con.execute("ALTER TABLE queue ADD COLUMN not_before REAL NOT NULL DEFAULT 0")
+
+    def close(self) -> None:
+        self._con.close()
+
+    def recover(self) -> int:
+        """requeue items left running by a previous process"""
+        cur = self._con.execute(
+            "UPDATE queue SET status = 'pending', updated_at = ? WHERE status = 'running'", (_now(),)
+        )
+        return cur.rowcount
+
+    def enqueue(self, path: Path, kind: str, size: int, mtime_ns: int) -> bool:
+        now = _now()
+        cur = self._con.execute(
+            "INSERT OR IGNORE INTO queue (path, kind, size, mtime_ns, enqueued_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (str(path), kind, size, mtime_ns, now, now),
+        )
+        return cur.rowcount == 1
+
+    def claim(self, kind: str) -> Optional[QueueItem]:
+        row = self._con.execute(
+            "UPDATE queue SET status = 'running', attempts = attempts + 1, updated_at = ? "
+            "WHERE id = (SELECT id FROM queue WHERE status = 'pending' AND kind = ? AND not_before <= ? "
+            "ORDER BY id LIMIT 1) "
+            "RETURNING id, path, kind, attempts",
+            (_now(), kind, time.time()),
+        ).fetchone()
+        return None if row is None else QueueItem(*row)
+
+    def finish(self, item: QueueItem, error: Optional[str] = None) -> None:
+        not_before = 0.0
+        if error is None:
+            status = "done"
+        elif item.attempts >= MAX_ATTEMPTS:
+            status = "failed"
+        else:
+            status = "pending"
+            not_before = time.time() + RETRY_DELAY_SECONDS * 2 ** (item.attempts - 1)
+        self._con.execute(
+            "UPDATE queue SET status = ?, error = ?, not_before = ?, updated_at = ? WHERE id = ?",
+            (status, error, not_before, _now(), item.id),
+        )
+
+    def release(self, item: QueueItem) -> None:
+        """put an interrupted item back, without counting the attempt"""
+        self._con.execute(
+            "UPDATE queue SET status = 'pending', attempts = max(attempts - 1, 0), updated_at = ? WHERE id = ?",
+            (_now(), item.id),
+        )
+
+    def next_retry_in(self) -> Optional[float]:
+        """seconds until the earliest deferred pending item is due, None if there is none"""
+        due = self._con.execute(
+            "SELECT min(not_before) FROM queue WHERE status = 'pending' AND not_before > ?", (time.time(),)
+        ).fetchone()[0]
+        return None if due is None else max(due - time.time(), 0.0)
+
+    def counts(self) -> dict[str, int]:
+        return dict(self._con.execute("SELECT status, count(*) FROM queue GROUP BY status"))
+
+
+# --- change sources ------------------------------------------------------------
+
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _Inotify:
+    """non-blocking inotify fd on one directory, read from the event loop"""
+
+    def __init__(self, directory: Path) -> None:
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError("libc not found")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def read_names(self) -> tuple[list[str], bool]:
+        """names of changed entries, and whether the kernel queue overflowed"""
+        names: list[str] = []
+        overflow = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return names, overflow
+            pos = 0
+            while pos < len(data):
+                _wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, pos)
+                pos += _EVENT_HEADER.size
+                if mask & _IN_Q_OVERFLOW:
+                    overflow = True
+                name = data[pos:pos + length].rstrip(b"\x00")
+                pos += length
+                if name:
+                    names.append(os.fsdecode(name))
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class Dropzone:
+    def __init__(
+        self,
+        database: db.Database,
+        directory: Path,
+        queue: WorkQueue,
+        *,
+        settle_seconds: float = 5.0,
+        poll_seconds: float = 2.0,
+        limits: Optional[dict[str, int]] = None,
+        use_inotify: bool = True,
+    ) -> None:
+        self.database = database
+        self.directory = directory
+        self.queue = queue
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        # imports run under _db_lock from start to finish; more archive workers would
+        # only wait on each other
+        self.limits[ARCHIVE] = 1
+        self.use_inotify = use_inotify
+        # path -> (size, mtime_ns, monotonic time it last changed)
+        self._unsettled: dict[Path, tuple[int, int, float]] = {}
+        self._queued: dict[Path, tuple[int, int]] = {}
+        self._wakeup = asyncio.Event()
+        self._running: dict[str, int] = {kind: 0 for kind in self.limits}
+        # the catalog has one writer connection; DB writes from workers take turns here
+        # instead of timing out while an archive import holds it
+        self._db_lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task] = set()
+
+    # --- debounce ---
+
+    def _touch(self, path: Path) -> None:
+        if classify(path) is None:
+            return
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            self._unsettled.pop(path, None)
+            return
+        if self._queued.get(path) == (st.st_size, st.st_mtime_ns):
+            return
+        current = self._unsettled.get(path)
+        if current is None or current[:2] != (st.st_size, st.st_mtime_ns):
+            self._unsettled[path] = (st.st_size, st.st_mtime_ns, time.monotonic())
+
+    def _rescan(self) -> None:
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError as exc:
+            logger.warning("Cannot list dropzone %s: %s", self.directory, exc)
+            return
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                self._touch(Path(entry.path))
+
+    def _settle(self) -> None:
+        """queue files whose size and mtime held still for settle_seconds"""
+        now = time.monotonic()
+        for path, (size, mtime_ns, since) in list(self._unsettled.items()):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                del self._unsettled[path]
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                self._unsettled[path] = (st.st_size, st.st_mtime_ns, now)
+                continue
+            if now - since < self.settle_seconds:
+                continue
+            del self._unsettled[path]
+            self._queued[path] = (size, mtime_ns)
+            if self.queue.enqueue(path, classify(path), size, mtime_ns):
+                logger.info("Queued %s (%d bytes)", path, size)
+                self._wakeup.set()
+
+    async def _watch(self) -> None:
+        loop = asyncio.get_running_loop()
+        inotify = None
+        if self.use_inotify:
+            try:
+                inotify = _Inotify(self.directory)
+            except OSError as exc:
+                logger.warning("inotify unavailable (%s); polling %s every %.1fs", exc, self.directory, self.poll_seconds)
+        if inotify is not None:
+            def on_readable() -> None:
+                names, overflow = inotify.read_names()
+                if overflow:
+                    self._rescan()
+                for name in names:
+                    self._touch(self.directory / name)
+            loop.add_reader(inotify.fd, on_readable)
+        self._rescan()
+        tick = min(self.poll_seconds, max(self.settle_seconds / 2, 0.1))
+        last_poll = time.monotonic()
+        try:
+            while True:
+                await asyncio.sleep(tick)
+                if inotify is None and time.monotonic() - last_poll >= self.poll_seconds:
+                    self._rescan()
+                    last_poll = time.monotonic()
+                self._settle()
+        finally:
+            if inotify is not None:
+                loop.remove_reader(inotify.fd)
+                inotify.close()
+
+    # --- workers ---
+
+    def _import_archive(self, path: str) -> None:
+        with self.database.connect() as conn:
+            catalog_ingest.import_archive(conn, Path(path))
+
+    def _write_fingerprints(self, rows) -> None:
+        with self.database.connect() as conn:
+            artifact_fingerprints_mgr.upsert_many(conn, rows)
+
+    async def _fingerprint(self, path: str, pool: ProcessPoolExecutor) -> None:
+        loop = asyncio.get_running_loop()
+        size = os.stat(path).st_size
+        digests, pe_info = await asyncio.gather(
+            asyncio.to_thread(hashing.hash_file, path, library_scan.HASH_TYPES),
+            loop.run_in_executor(pool, library_scan.parse_pe, path),
+        )
+        rows = library_scan.fingerprint_rows(size, digests, pe_info)
+        async with self._db_lock:
+            await asyncio.to_thread(self._write_fingerprints, rows)
+
+    async def _run(self, item: QueueItem, pool: ProcessPoolExecutor) -> None:
+        started = time.monotonic()
+        try:
+            if item.kind == ARCHIVE:
+                async with self._db_lock:
+                    await asyncio.to_thread(self._import_archive, item.path)
+            else:
+                await self._fingerprint(item.path, pool)
+        except asyncio.CancelledError:
+            # shutdown: not a failure, run it again next time
+            self.queue.release(item)
+            logger.info("Dropzone %s %s interrupted; requeued", item.kind, item.path)
+            raise
+        except Exception as exc:
+            self.queue.finish(item, f"{type(exc).__name__}: {exc}")
+            logger.exception("Dropzone %s %s failed (attempt %d)", item.kind, item.path, item.attempts)
+        else:
+            self.queue.finish(item)
+            logger.info("Dropzone %s %s done in %.1fs", item.kind, item.path, time.monotonic() - started)
+        finally:
+            self._running[item.kind] -= 1
+            self._wakeup.set()
+
+    async def _dispatch(self, pool: ProcessPoolExecutor) -> None:
+        while True:
+            try:
+                # failed items become claimable again once their delay has passed
+                await asyncio.wait_for(self._wakeup.wait(), self.queue.next_retry_in())
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            for kind, limit in self.limits.items():
+                while self._running[kind] < limit:
+                    item = self.queue.claim(kind)
+                    if item is None:
+                        break
+                    self._running[kind] += 1
+                    task = asyncio.create_task(self._run(item, pool))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+
+    async def run(self) -> None:
+        recovered = self.queue.recover()
+        if recovered:
+            logger.info("Requeued %d items interrupted by the last shutdown", recovered)
+        self._wakeup.set()
+        with ProcessPoolExecutor(max_workers=max(1, self.limits.get(INSTALLER, 1))) as pool:
+            watcher = asyncio.create_task(self._watch())
+            try:
+                await self._dispatch(pool)
+            finally:
+                watcher.cancel()
+                for task in list(self._tasks):
+                    task.cancel()
+                await asyncio.gather(watcher, *self._tasks, return_exceptions=True)
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument(
+        "--config",
+        type=str,
+        default="config.toml",
+        help="Path to TOML config file (default: config.toml)",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="Poll the dropzone instead of using inotify",
+    )
+    args, _unknown = parser.parse_known_args(argv)
+    return args
+
+
+def cli(argv: list[str] | None = None) -> None:
+    from . import config, log
+    args = _parse_args(argv)
+    SETTINGS = config.load_config(args.config)
+    log.setup_logging(SETTINGS)
+    database_cfg = SETTINGS.get("database", {})
+    db_path = Path(database_cfg.get("path", "data/catalog.db")).expanduser()
+    dropzone_cfg = SETTINGS.get("dropzone", {})
+    directory = Path(dropzone_cfg.get("path", "/tmp/downloads")).expanduser()
+    directory.mkdir(parents=True, exist_ok=True)
+    queue_path = Path(dropzone_cfg.get("queue", db_path.with_name(db_path.name + ".dropzone"))).expanduser()
+
+    dbase = db.Database(str(db_path))
+    queue = WorkQueue(queue_path)
+    dropzone = Dropzone(
+        dbase,
+        directory,
+        queue,
+        settle_seconds=float(dropzone_cfg.get("settle_seconds", 5.0)),
+        poll_seconds=float(dropzone_cfg.get("poll_seconds", 2.0)),
+        limits={INSTALLER: int(dropzone_cfg.get("installer_workers", DEFAULT_LIMITS[INSTALLER]))},
+        use_inotify=not args.poll,
+    )
+    logger.info("Watching dropzone %s (queue %s)", directory, queue_path)
+    try:
+        asyncio.run(dropzone.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    cli()
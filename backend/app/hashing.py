@@ -0,0 +1,123 @@
+"""
+multi-digest file hashing for large installers.
+
+one pass over each file feeds every requested digest. reads go into a reused
+buffer of large, page-aligned chunks (or slices of an mmap), so bytes are not
+copied per digest, and hashlib drops the GIL while it digests each chunk: a
+thread pool hashing several files keeps several disks busy.
+"""
+
+import hashlib
+import mmap
+import os
+import threading
+import time
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+DEFAULT_ALGORITHMS = ("md5", "sha256")
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+@dataclass
+class HashStats:
+    files: int = 0
+    bytes: int = 0
+    seconds: float = 0.0  # summed per-file wall time, so threads count separately
+
+    @property
+    def mb_per_s(self) -> float:
+        return self.bytes / 2**20 / self.seconds if self.seconds else 0.0
+
+
+class HashMeter:
+    """thread-safe running totals for hash_file calls"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stats = HashStats()
+        self._started = time.perf_counter()
+
+    def add(self, size: int, seconds: float) -> None:
+        with self._lock:
+            self._stats.files += 1
+            self._stats.bytes += size
+            self._stats.seconds += seconds
+
+    def snapshot(self) -> HashStats:
+        with self._lock:
+            return HashStats(self._stats.files, self._stats.bytes, self._stats.seconds)
+
+    def wall_mb_per_s(self) -> float:
+        """aggregate throughput since the meter was created"""
+        elapsed = time.perf_counter() - self._started
+        return self.snapshot().bytes / 2**20 / elapsed if elapsed else 0.0
+
+
+def _aligned(chunk_size: int) -> int:
+    page = mmap.PAGESIZE
+    return max(page, chunk_size // page * page)
+
+
+def hash_file(
+    path: str | os.PathLike,
+    algorithms: Sequence[str] = DEFAULT_ALGORITHMS,
+    *,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    use_mmap: bool = False,
+    meter: HashMeter | None = None,
+) -> dict[str, str]:
+    """algorithm -> lowercase hex digest, all computed in a single read of the file"""
+    chunk_size = _aligned(chunk_size)
+    hashers = [hashlib.new(name) for name in algorithms]
+    started = time.perf_counter()
+    size = 0
+    with open(path, "rb", buffering=0) as f:
+        if use_mmap:
+            size = os.fstat(f.fileno()).st_size
+            if size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if hasattr(mm, "madvise"):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+                    view = memoryview(mm)
+                    try:
+                        for start in range(0, size, chunk_size):
+                            chunk = view[start:start + chunk_size]
+                            for h in hashers:
+                                h.update(chunk)
+                            chunk.release()
+                    finally:
+                        view.release()
+        else:
+            buf = bytearray(chunk_size)
+            view = memoryview(buf)
+            while n := f.readinto(buf):
+                chunk = view[:n] if n < chunk_size else view
+                for h in hashers:
+                    h.update(chunk)
+                size += n
+    if meter is not None:
+        meter.add(size, time.perf_counter() - started)
+    return {name: h.hexdigest() for name, h in zip(algorithms, hashers)}
+
+
+def hash_files(
+    paths: Iterable[str | os.PathLike],
+    algorithms: Sequence[str] = DEFAULT_ALGORITHMS,
+    *,
+    threads: int = 4,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    use_mmap: bool = False,
+    meter: HashMeter | None = None,
+) -> Iterator[tuple[str | os.PathLike, dict[str, str] | OSError]]:
+    """(path, digests) in input order; unreadable files yield their OSError instead"""
+
+    def one(path):
+        try:
+            return path, hash_file(path, algorithms, chunk_size=chunk_size, use_mmap=use_mmap, meter=meter)
+        except OSError as exc:
+            return path, exc
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="hash") as pool:
+        yield from pool.map(one, paths)
@@ -0,0 +1,84 @@
+"""
+JSON decoding for snapshot members, through the fastest backend installed.
+
+orjson and msgspec are optional; without either the stdlib json module is used.
+MAGOG_JSON_BACKEND=orjson|msgspec|stdlib picks one explicitly (pool workers
+inherit it from the environment). the faster decoders are stricter than json.loads
+(NaN, lone surrogates, integers beyond 64 bits), so a document they reject is
+decoded again with json.loads: results and errors match the stdlib either way.
+"""
+
+import json
+import os
+from typing import Any, BinaryIO, Callable
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+BACKENDS = ("orjson", "msgspec", "stdlib")
+
+# what loads() raises on malformed input, whichever backend is active
+DecodeError = (json.JSONDecodeError, UnicodeDecodeError)
+
+
+def available() -> list[str]:
+    return [name for name in BACKENDS if name == "stdlib" or globals()[name] is not None]
+
+
+def _fast_decoder(name: str) -> tuple[Callable[[bytes | str], Any], tuple[type[Exception], ...]] | None:
+    if name == "orjson" and orjson is not None:
+        return orjson.loads, (orjson.JSONDecodeError,)
+    if name == "msgspec" and msgspec is not None:
+        return msgspec.json.Decoder().decode, (msgspec.DecodeError,)
+    return None
+
+
+def _select(name: str | None) -> str:
+    if name:
+        if name not in BACKENDS:
+            raise ValueError(f"unknown JSON backend {name!r} (expected one of {', '.join(BACKENDS)})")
+        if name not in available():
+            raise ValueError(f"JSON backend {name!r} is not installed")
+        return name
+    return available()[0]
+
+
+_backend = "stdlib"
+_fast: Callable[[bytes | str], Any] | None = None
+_fast_errors: tuple[type[Exception], ...] = ()
+
+
+def set_backend(name: str | None = None) -> str:
+    """switch backends (None: the fastest installed); returns the one now active"""
+    global _backend, _fast, _fast_errors
+    _backend = _select(name)
+    decoder = _fast_decoder(_backend)
+    _fast, _fast_errors = decoder if decoder is not None else (None, ())
+    return _backend
+
+
+def backend() -> str:
+    return _backend
+
+
+def loads(data: bytes | bytearray | memoryview | str) -> Any:
+    if _fast is not None:
+        try:
+            return _fast(data)
+        except _fast_errors:
+            pass
+    return json.loads(data)
+
+
+def load(fp: BinaryIO) -> Any:
+    return loads(fp.read())
+
+
+set_backend(os.environ.get("MAGOG_JSON_BACKEND") or None)
@@ -0,0 +1,213 @@
+"""
+incremental JSON reader that materializes only selected paths.
+
+paths are tuples of object keys, with "item" standing for every element of an
+array (as in ijson), e.g. ("product", "gameIDs", "item"). everything outside the
+selected paths is scanned and discarded chunk by chunk, so memory stays bounded by
+the chunk size plus the largest selected value, not by the document size.
+"""
+
+import codecs
+import json
+import re
+from collections.abc import Iterable, Iterator
+from typing import Any, BinaryIO
+
+ITEM = "item"
+
+_DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_WS_RE = re.compile(r"[ \t\n\r]*")
+_STRING_RE = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+# runs of anything but brackets, with strings consumed whole (so brackets inside
+# strings are not counted); stops at a bracket, an unterminated string or the end
+_SKIP_RE = re.compile(r'(?:[^"\[\]{}]+|"(?:[^"\\]|\\.)*")*', re.DOTALL)
+_SCALAR_RE = re.compile(r"[^,\]}\s]*")
+
+
+class _Reader:
+    def __init__(self, fp: BinaryIO, chunk_size: int) -> None:
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """append the next chunk, dropping consumed text; False at end of input"""
+        if self.eof:
+            return False
+        data = self._fp.read(self._chunk_size)
+        text = self._decoder.decode(data, final=not data)
+        if not data:
+            self.eof = True
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        return bool(data) or bool(text)
+
+    def _error(self, msg: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(msg, self.buf, self.pos)
+
+    def peek(self) -> str:
+        while True:
+            self.pos = _WS_RE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, ch: str) -> None:
+        if self.peek() != ch:
+            raise self._error(f"expected {ch!r}")
+        self.pos += 1
+
+    def _match_complete(self, pattern: re.Pattern) -> re.Match:
+        """match at pos, refilling while the match runs into the end of the buffer"""
+        while True:
+            m = pattern.match(self.buf, self.pos)
+            if m is not None and (m.end() < len(self.buf) or self.eof):
+                return m
+            if not self.fill() and m is None:
+                raise self._error("unexpected end of input")
+
+    def read_string(self) -> str:
+        if self.peek() != '"':
+            raise self._error("expected string")
+        m = self._match_complete(_STRING_RE)
+        self.pos = m.end()
+        return json.loads(m.group())
+
+    def read_value(self) -> Any:
+        if self.peek() not in '"[{':
+            # bare scalars have no closing delimiter: take the whole token first,
+            # so a number split across chunks is not decoded early
+            m = self._match_complete(_SCALAR_RE)
+            self.pos = m.end()
+            return json.loads(m.group())
+        while True:
+            try:
+                value, end = self._json.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            self.pos = end
+            return value
+
+    def skip_value(self) -> None:
+        ch = self.peek()
+        if ch == '"':
+            self.pos = self._match_complete(_STRING_RE).end()
+            return
+        if ch not in "[{":
+            m = self._match_complete(_SCALAR_RE)
+            if m.end() == self.pos:
+                raise self._error("expected value")
+            self.pos = m.end()
+            return
+        depth = 0
+        while True:
+            self.pos = _SKIP_RE.match(self.buf, self.pos).end()
+            if self.pos >= len(self.buf) or self.buf[self.pos] == '"':
+                # ran out of buffer, possibly inside a string
+                if not self.fill():
+                    raise self._error("unexpected end of input")
+                continue
+            ch = self.buf[self.pos]
+            self.pos += 1
+            depth += 1 if ch in "[{" else -1
+            if depth == 0:
+                return
+
+
+def _walk(
+    reader: _Reader,
+    path: tuple[str, ...],
+    targets: frozenset[tuple[str, ...]],
+    prefixes: frozenset[tuple[str, ...]],
+) -> Iterator[tuple[tuple[str, ...], Any]]:
+    if path in targets:
+        yield path, reader.read_value()
+        return
+    if path not in prefixes:
+        reader.skip_value()
+        return
+    ch = reader.peek()
+    if ch == "{":
+        reader.pos += 1
+        if reader.peek() == "}":
+            reader.pos += 1
+            return
+        while True:
+            key = reader.read_string()
+            reader.expect(":")
+            yield from _walk(reader, path + (key,), targets, prefixes)
+            ch = reader.peek()
+            reader.pos += 1
+            if ch == "}":
+                return
+            if ch != ",":
+                raise reader._error("expected ',' or '}'")
+    elif ch == "[":
+        reader.pos += 1
+        if reader.peek() == "]":
+            reader.pos += 1
+            return
+        while True:
+            yield from _walk(reader, path + (ITEM,), targets, prefixes)
+            ch = reader.peek()
+            reader.pos += 1
+            if ch == "]":
+                return
+            if ch != ",":
+                raise reader._error("expected ',' or ']'")
+    else:
+        reader.skip_value()
+
+
+def iter_paths(
+    fp: BinaryIO,
+    paths: Iterable[tuple[str, ...]],
+    *,
+    chunk_size: int = _DEFAULT_CHUNK_SIZE,
+) -> Iterator[tuple[tuple[str, ...], Any]]:
+    """
+    yield (path, value) for every value at one of paths, in document order.
+    raises json.JSONDecodeError on malformed input.
+    """
+    targets = frozenset(paths)
+    prefixes = frozenset(t[:n] for t in targets for n in range(len(t)))
+    reader = _Reader(fp, chunk_size)
+    yield from _walk(reader, (), targets, prefixes)
+    if reader.peek() != "":
+        raise reader._error("extra data after JSON document")
+
+
+def project(
+    fp: BinaryIO,
+    paths: Iterable[tuple[str, ...]],
+    *,
+    chunk_size: int = _DEFAULT_CHUNK_SIZE,
+) -> dict[str, Any]:
+    """
+    rebuild the parts of a JSON object that lie on paths, e.g.
+    {("version",), ("products", "item")} -> {"version": 2, "products": [...]}
+    "item" may only appear as the last path element here.
+    """
+    paths = list(paths)
+    if any(ITEM in path[:-1] for path in paths):
+        raise ValueError("project() only supports 'item' as the last path element")
+    result: dict[str, Any] = {}
+    for path, value in iter_paths(fp, paths, chunk_size=chunk_size):
+        node: dict[str, Any] = result
+        for key in path[:-2]:
+            node = node.setdefault(key, {})
+        if path[-1] == ITEM:
+            node.setdefault(path[-2], []).append(value)
+        else:
+            if len(path) > 1:
+                node = node.setdefault(path[-2], {})
+            node[path[-1]] = value
+    return result
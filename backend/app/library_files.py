@@ -0,0 +1,50 @@
+from collections.abc import Iterable
+from typing import Optional, TypedDict
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+
+from .db_schema import library_files
+
+
+class LibraryFileRow(TypedDict):
+    store_id: int
+    path: str
+    size: int
+    mtime_ns: int
+    fingerprint_id: Optional[int]
+
+
+_UPSERT = insert(library_files)
+_UPSERT = _UPSERT.on_conflict_do_update(
+    index_elements=[library_files.c.store_id, library_files.c.path],
+    set_={c.name: _UPSERT.excluded[c.name] for c in library_files.c if not c.primary_key},
+)
+
+
+def upsert_many(conn: Connection, rows: Iterable[LibraryFileRow]) -> None:
+    """single executemany over all rows"""
+    params = list(rows)
+    if params:
+        conn.execute(_UPSERT, params)
+
+
+def get_stats(conn: Connection, store_id: int) -> dict[str, tuple[int, int]]:
+    """path -> (size, mtime_ns) as recorded by the last scan"""
+    stmt = select(library_files.c.path, library_files.c.size, library_files.c.mtime_ns).where(
+        library_files.c.store_id == store_id
+    )
+    return {row.path: (row.size, row.mtime_ns) for row in conn.execute(stmt)}
+
+
+def delete_paths(conn: Connection, store_id: int, paths: Iterable[str]) -> None:
+    path_list = list(set(paths))
+    # stay well under SQLite's bound-parameter limit
+    for start in range(0, len(path_list), 500):
+        conn.execute(
+            delete(library_files).where(
+                library_files.c.store_id == store_id,
+                library_files.c.path.in_(path_list[start:start + 500]),
+            )
+        )
@@ -0,0 +1,48 @@
+from collections.abc import Iterable
+from typing import Optional, TypedDict
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+
+from .db_schema import library_products
+
+
+class LibraryProductRow(TypedDict):
+    store_id: int
+    product_id: int
+    last_updated: Optional[str]  # newest local file of the product, in date_published format
+
+
+_UPSERT = insert(library_products)
+_UPSERT = _UPSERT.on_conflict_do_update(
+    index_elements=[library_products.c.store_id, library_products.c.product_id],
+    set_={"last_updated": _UPSERT.excluded.last_updated},
+)
+
+
+def upsert_many(conn: Connection, rows: Iterable[LibraryProductRow]) -> None:
+    """single executemany over all rows"""
+    params = list(rows)
+    if params:
+        conn.execute(_UPSERT, params)
+
+
+def get_for_store(conn: Connection, store_id: int) -> dict[int, Optional[str]]:
+    """product id -> last_updated"""
+    stmt = select(library_products.c.product_id, library_products.c.last_updated).where(
+        library_products.c.store_id == store_id
+    )
+    return {row.product_id: row.last_updated for row in conn.execute(stmt)}
+
+
+def delete_products(conn: Connection, store_id: int, product_ids: Iterable[int]) -> None:
+    id_list = list(set(product_ids))
+    # stay well under SQLite's bound-parameter limit
+    for start in range(0, len(id_list), 500):
+        conn.execute(
+            delete(library_products).where(
+                library_products.c.store_id == store_id,
+                library_products.c.product_id.in_(id_list[start:start + 500]),
+            )
+        )
@@ -0,0 +1,349 @@
+"""
+scan the library stores listed under [library] in config.toml.
+
+each top-level folder of a store is matched to a catalog product by slug; the
+newest file in it becomes the product's last_updated. installers (.exe) are
+fingerprinted: hashed (md5 + sha256, see hashing.py) on a thread pool
+while pefile reads their version resource and Authenticode signing time in a
+process pool. results are written in batches, one transaction each, so an
+interrupted scan keeps what it finished. files whose (path, size, mtime) match
+the previous scan are not opened at all.
+"""
+
+import argparse
+import os
+from collections import deque
+from collections.abc import Iterator, Mapping
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import logging
+
+from . import db
+from . import hashing
+from . import catalog_products as catalog_products_mgr
+from . import library_stores as library_stores_mgr
+from . import library_products as library_products_mgr
+from . import library_files as library_files_mgr
+from . import library_staleness as library_staleness_mgr
+from . import artifact_fingerprints as artifact_fingerprints_mgr
+from .artifact_fingerprints import FingerprintRow
+from .library_files import LibraryFileRow
+from .library_products import LibraryProductRow
+
+logger = logging.getLogger(__name__)
+
+# md5 matches GOG's installer manifests and is what library_files points at;
+# sha256 is stored alongside from the same read
+HASH_TYPE = "md5"
+HASH_TYPES = ("md5", "sha256")
+# files fingerprinted by the scan; everything else only counts towards last_updated
+_FINGERPRINT_SUFFIXES = (".exe",)
+# files hashed/parsed per write transaction
+_FILES_PER_BATCH = 256
+# batches in flight ahead of the one being written
+_BATCHES_AHEAD = 2
+# DER: OID 1.2.840.113549.1.9.5 (PKCS#9 signingTime)
+_SIGNING_TIME_OID = bytes.fromhex("06092a864886f70d010905")
+_IMAGE_DIRECTORY_ENTRY_SECURITY = 4
+
+
+def _date_published_format(ts: float) -> str:
+    """the catalog's date format, so last_updated compares with date_published as text"""
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S+0000")
+
+
+def _walk(root: Path) -> Iterator[tuple[str, os.stat_result]]:
+    """(path relative to root with "/" separators, stat) for every regular file, no symlinks"""
+    stack = [(root, "")]
+    while stack:
+        directory, prefix = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError as exc:
+            logger.warning("Cannot list %s: %s", directory, exc)
+            continue
+        for entry in entries:
+            rel = prefix + entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((Path(entry.path), rel + "/"))
+                elif entry.is_file(follow_symlinks=False):
+                    yield rel, entry.stat(follow_symlinks=False)
+            except OSError as exc:
+                logger.warning("Cannot stat %s: %s", entry.path, exc)
+
+
+def _signing_time(blob: bytes) -> Optional[str]:
+    """
+    first signingTime attribute in a PKCS#7 blob, without a full ASN.1 parse:
+    OID, then SET { UTCTime | GeneralizedTime }
+    """
+    pos = blob.find(_SIGNING_TIME_OID)
+    while pos != -1:
+        at = pos + len(_SIGNING_TIME_OID)
+        if blob[at:at + 1] == b"\x31" and len(blob) > at + 3:
+            tag, length = blob[at + 2], blob[at + 3]
+            value = blob[at + 4:at + 4 + length].decode("ascii", "replace")
+            try:
+                if tag == 0x17:    # UTCTime YYMMDDHHMMSSZ
+                    parsed = datetime.strptime(value, "%y%m%d%H%M%SZ")
+                elif tag == 0x18:  # GeneralizedTime YYYYMMDDHHMMSSZ
+                    parsed = datetime.strptime(value, "%Y%m%d%H%M%SZ")
+                else:
+                    parsed = None
+            except ValueError:
+                parsed = None
+            if parsed is not None:
+                return parsed.strftime("%Y-%m-%dT%H:%M:%S+0000")
+        pos = blob.find(_SIGNING_TIME_OID, pos + 1)
+    return None
+
+
+def parse_pe(path: str) -> tuple[Optional[str], Optional[str], Optional[str]]:
+    """(ProductName, ProductVersion, signing time); runs in pool workers"""
+    import pefile
+
+    try:
+        pe = pefile.PE(path, fast_load=True)
+    except (pefile.PEFormatError, OSError) as exc:
+        logger.debug("Not a PE file %s: %s", path, exc)
+        return None, None, None
+    try:
+        pe.parse_data_directories(directories=[pefile.DIRECTORY_ENTRY["IMAGE_DIRECTORY_ENTRY_RESOURCE"]])
+        strings: dict[bytes, bytes] = {}
+        for file_info in getattr(pe, "FileInfo", None) or []:
+            for info in file_info:
+                for table in getattr(info, "StringTable", None) or []:
+                    strings.update(table.entries)
+        name = strings.get(b"ProductName")
+        version = strings.get(b"ProductVersion")
+        security = pe.OPTIONAL_HEADER.DATA_DIRECTORY[_IMAGE_DIRECTORY_ENTRY_SECURITY]
+        signed = None
+        if security.VirtualAddress and security.Size:
+            # the security directory address is a file offset, not an RVA
+            signed = _signing_time(pe.__data__[security.VirtualAddress:security.VirtualAddress + security.Size])
+        return (
+            name.decode("utf-8", "replace").strip("\x00") if name else None,
+            version.decode("utf-8", "replace").strip("\x00") if version else None,
+            signed,
+        )
+    except Exception as exc:
+        logger.debug("Cannot parse PE file %s: %s", path, exc)
+        return None, None, None
+    finally:
+        pe.close()
+
+
+@dataclass
+class ScanStats:
+    files: int = 0
+    unchanged: int = 0
+    fingerprinted: int = 0
+    removed: int = 0
+    products: int = 0
+    unknown_folders: int = 0
+
+
+def _resolve_slugs(conn, slugs: set[str]) -> dict[str, int]:
+    """folder slug -> product id; prefers a game among products sharing the slug"""
+    resolved: dict[str, int] = {}
+    for slug, rows in catalog_products_mgr.get_many_by_slug(conn, slugs).items():
+        games = [row for row in rows if row.type == "game"]
+        resolved[slug] = (games or rows)[0].id
+    return resolved
+
+
+def fingerprint_rows(
+    size: int,
+    digests: Mapping[str, str],
+    pe_info: tuple[Optional[str], Optional[str], Optional[str]],
+) -> list[FingerprintRow]:
+    """one artifact_fingerprints row per digest of a file, sharing its PE details"""
+    name, version, signed = pe_info
+    return [
+        {
+            "hash_type": hash_type,
+            "hash_value": digest,
+            "exe_size_bytes": size,
+            "pe_product_name": name,
+            "pe_product_version": version,
+            "sig_timestamp": signed,
+        }
+        for hash_type, digest in digests.items()
+    ]
+
+
+def _write_batch(
+    database: db.Database,
+    store_id: int,
+    batch: list[tuple[str, os.stat_result, Future, Future]],
+) -> None:
+    fingerprints: list[FingerprintRow] = []
+    files: list[tuple[str, os.stat_result, Optional[str]]] = []
+    for rel, st, hashed, parsed in batch:
+        try:
+            digests = hashed.result()
+        except OSError as exc:
+            logger.warning("Cannot hash %s: %s", rel, exc)
+            continue
+        fingerprints.extend(fingerprint_rows(st.st_size, digests, parsed.result()))
+        files.append((rel, st, digests[HASH_TYPE]))
+    with database.connect() as conn:
+        ids = artifact_fingerprints_mgr.upsert_many(conn, fingerprints)
+        rows: list[LibraryFileRow] = [
+            {
+                "store_id": store_id,
+                "path": rel,
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "fingerprint_id": ids.get((HASH_TYPE, digest)),
+            }
+            for rel, st, digest in files
+        ]
+        library_files_mgr.upsert_many(conn, rows)
+
+
+def scan_store(
+    database: db.Database,
+    name: str,
+    root: Path,
+    *,
+    hash_threads: int = 4,
+    pe_workers: int | None = None,
+) -> ScanStats:
+    root = root.expanduser()
+    stats = ScanStats()
+    with database.connect() as conn:
+        store_id = library_stores_mgr.ensure_store(conn, name, str(root))
+        known_files = library_files_mgr.get_stats(conn, store_id)
+        known_products = library_products_mgr.get_for_store(conn, store_id)
+
+    seen: set[str] = set()
+    folder_mtimes: dict[str, float] = {}
+    meter = hashing.HashMeter()
+    with ThreadPoolExecutor(max_workers=hash_threads, thread_name_prefix="library-hash") as hashers, \
+            ProcessPoolExecutor(max_workers=pe_workers) as parsers:
+        pending: deque[list[tuple[str, os.stat_result, Future, Future]]] = deque()
+        batch: list[tuple[str, os.stat_result, Future, Future]] = []
+        for rel, st in _walk(root):
+            stats.files += 1
+            folder, sep, _rest = rel.partition("/")
+            if sep:
+                folder_mtimes[folder] = max(folder_mtimes.get(folder, 0.0), st.st_mtime)
+            if not rel.lower().endswith(_FINGERPRINT_SUFFIXES):
+                continue
+            seen.add(rel)
+            if known_files.get(rel) == (st.st_size, st.st_mtime_ns):
+                stats.unchanged += 1
+                continue
+            path = str(root / rel)
+            batch.append((rel, st, hashers.submit(hashing.hash_file, path, HASH_TYPES, meter=meter), parsers.submit(parse_pe, path)))
+            if len(batch) >= _FILES_PER_BATCH:
+                pending.append(batch)
+                batch = []
+                if len(pending) > _BATCHES_AHEAD:
+                    done = pending.popleft()
+                    _write_batch(database, store_id, done)
+                    stats.fingerprinted += len(done)
+        if batch:
+            pending.append(batch)
+        while pending:
+            done = pending.popleft()
+            _write_batch(database, store_id, done)
+            stats.fingerprinted += len(done)
+
+    hashed = meter.snapshot()
+    if hashed.files:
+        logger.info(
+            "Hashed %d files, %.1f MB: %.1f MB/s overall, %.1f MB/s per thread",
+            hashed.files, hashed.bytes / 2**20, meter.wall_mb_per_s(), hashed.mb_per_s,
+        )
+
+    removed_files = known_files.keys() - seen
+    stats.removed = len(removed_files)
+    with database.connect() as conn:
+        library_files_mgr.delete_paths(conn, store_id, removed_files)
+        by_slug = _resolve_slugs(conn, set(folder_mtimes))
+        stats.unknown_folders = len(folder_mtimes) - len(by_slug)
+        for folder in folder_mtimes.keys() - by_slug.keys():
+            logger.debug("Library folder %s/%s matches no catalog slug", name, folder)
+        rows: dict[int, LibraryProductRow] = {}
+        for folder, product_id in by_slug.items():
+            last_updated = _date_published_format(folder_mtimes[folder])
+            current = rows.get(product_id)
+            if current is None or last_updated > (current["last_updated"] or ""):
+                rows[product_id] = {"store_id": store_id, "product_id": product_id, "last_updated": last_updated}
+        stats.products = len(rows)
+        changed = [pid for pid, row in rows.items() if known_products.get(pid, "") != row["last_updated"]]
+        library_products_mgr.upsert_many(conn, (rows[pid] for pid in changed))
+        gone = known_products.keys() - rows.keys()
+        if gone:
+            library_products_mgr.delete_products(conn, store_id, gone)
+            library_staleness_mgr.refresh_for_store(conn, store_id)
+        elif changed:
+            library_staleness_mgr.refresh_for_store(conn, store_id, changed)
+    logger.info(
+        "Scanned %s: files=%d unchanged=%d fingerprinted=%d removed=%d products=%d unknown_folders=%d",
+        name, stats.files, stats.unchanged, stats.fingerprinted, stats.removed, stats.products, stats.unknown_folders,
+    )
+    return stats
+
+
+def scan_library(
+    database: db.Database,
+    stores: Mapping[str, str],
+    *,
+    hash_threads: int = 4,
+    pe_workers: int | None = None,
+) -> dict[str, ScanStats]:
+    results: dict[str, ScanStats] = {}
+    for name, path in stores.items():
+        root = Path(path).expanduser()
+        if not root.is_dir():
+            logger.warning("Library store %s: %s is not a directory, skipping", name, root)
+            continue
+        results[name] = scan_store(database, name, root, hash_threads=hash_threads, pe_workers=pe_workers)
+    return results
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument(
+        "--config",
+        type=str,
+        default="config.toml",
+        help="Path to TOML config file (default: config.toml)",
+    )
+    parser.add_argument(
+        "--hash-threads",
+        type=int,
+        default=4,
+        help="Threads hashing files (default: 4)",
+    )
+    parser.add_argument(
+        "--pe-workers",
+        type=int,
+        default=None,
+        help="Processes parsing PE headers (default: one per CPU)",
+    )
+    args, _unknown = parser.parse_known_args(argv)
+    return args
+
+
+def cli(argv: list[str] | None = None) -> None:
+    from . import config, log
+    args = _parse_args(argv)
+    SETTINGS = config.load_config(args.config)
+    log.setup_logging(SETTINGS)
+    database_cfg = SETTINGS.get("database", {})
+    db_path = Path(database_cfg.get("path", "data/catalog.db")).expanduser()
+    dbase = db.Database(str(db_path))
+    scan_library(dbase, SETTINGS.get("library", {}), hash_threads=args.hash_threads, pe_workers=args.pe_workers)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,104 @@
+from collections.abc import Iterable
+from typing import Optional, TypedDict
+
+from sqlalchemy import select, delete, case, and_, true
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+
+from .catalog_builds import latest_builds_subquery
+from .db_schema import catalog_builds, library_products, library_staleness
+
+
+class StalenessRow(TypedDict):
+    store_id: int
+    product_id: int
+    latest_build_id: Optional[int]  # newest catalog build, None if the catalog has none
+    latest_date: Optional[str]      # its date_published
+    is_stale: bool                  # local copy (last_updated) predates latest_date
+
+
+def _refresh(conn: Connection, *where) -> None:
+    """
+    recompute staleness for the library_products rows matching where, in one
+    INSERT ... SELECT. last_updated and date_published share GOG's ISO format,
+    so they compare as strings; a product never downloaded (last_updated NULL)
+    with a catalog build is stale.
+    """
+    latest = latest_builds_subquery(
+        catalog_builds.c.product_id.in_(select(library_products.c.product_id).where(*where))
+    )
+    is_stale = case(
+        (latest.c.id.is_(None), False),
+        (library_products.c.last_updated.is_(None), True),
+        (latest.c.date_published > library_products.c.last_updated, True),
+        else_=False,
+    )
+    source = (
+        select(
+            library_products.c.store_id,
+            library_products.c.product_id,
+            latest.c.id,
+            latest.c.date_published,
+            is_stale,
+        )
+        .select_from(library_products.outerjoin(latest, latest.c.product_id == library_products.c.product_id))
+        # SQLite needs a WHERE before ON CONFLICT in INSERT ... SELECT
+        .where(and_(true(), *where))
+    )
+    stmt = insert(library_staleness).from_select(
+        ["store_id", "product_id", "latest_build_id", "latest_date", "is_stale"], source
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[library_staleness.c.store_id, library_staleness.c.product_id],
+        set_={c.name: stmt.excluded[c.name] for c in library_staleness.c if not c.primary_key},
+    )
+    conn.execute(stmt)
+
+
+def refresh_for_products(conn: Connection, product_ids: Iterable[int]) -> None:
+    """after catalog builds of these products changed: every store holding them"""
+    id_list = list(set(product_ids))
+    # stay well under SQLite's bound-parameter limit
+    for start in range(0, len(id_list), 500):
+        _refresh(conn, library_products.c.product_id.in_(id_list[start:start + 500]))
+
+
+def refresh_for_store(conn: Connection, store_id: int, product_ids: Iterable[int] | None = None) -> None:
+    """
+    after a library scan changed local copies: the given products of one store, or the
+    whole store (also dropping rows whose library product is gone) when product_ids is None
+    """
+    if product_ids is not None:
+        id_list = list(set(product_ids))
+        for start in range(0, len(id_list), 500):
+            _refresh(
+                conn,
+                library_products.c.store_id == store_id,
+                library_products.c.product_id.in_(id_list[start:start + 500]),
+            )
+        return
+    conn.execute(
+        delete(library_staleness).where(
+            library_staleness.c.store_id == store_id,
+            library_staleness.c.product_id.not_in(
+                select(library_products.c.product_id).where(library_products.c.store_id == store_id)
+            ),
+        )
+    )
+    _refresh(conn, library_products.c.store_id == store_id)
+
+
+def rebuild(conn: Connection) -> None:
+    """recompute the whole table, e.g. after a bulk catalog load"""
+    conn.execute(delete(library_staleness))
+    _refresh(conn)
+
+
+def get_stale(conn: Connection, store_id: int | None = None) -> list[StalenessRow]:
+    """what needs re-downloading: one scan of idx_library_staleness_stale"""
+    stmt = select(library_staleness).where(library_staleness.c.is_stale.is_(True))
+    if store_id is not None:
+        stmt = stmt.where(library_staleness.c.store_id == store_id)
+    stmt = stmt.order_by(library_staleness.c.store_id, library_staleness.c.product_id)
+    rows = conn.execute(stmt).mappings().all()
+    return [StalenessRow(**row) for row in rows]
@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+from typing import TypedDict
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+
+from .db_schema import library_stores
+
+
+class StoreRow(TypedDict):
+    id: int
+    name: str
+    path: str
+    is_active: bool
+    created_at: str
+    updated_at: str
+
+
+def ensure_store(conn: Connection, name: str, path: str) -> int:
+    """id of the store called name, creating it or updating its path; marks it active"""
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    stmt = insert(library_stores).values(name=name, path=path, is_active=True, created_at=now, updated_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[library_stores.c.name],
+        set_={"path": path, "is_active": True, "updated_at": now},
+    )
+    conn.execute(stmt)
+    return conn.execute(select(library_stores.c.id).where(library_stores.c.name == name)).scalar_one()
+
+
+def get_active(conn: Connection) -> list[StoreRow]:
+    stmt = select(library_stores).where(library_stores.c.is_active.is_(True)).order_by(library_stores.c.id)
+    return [StoreRow(**row) for row in conn.execute(stmt).mappings()]
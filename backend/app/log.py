@@ -1,45 +1,189 @@
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+from collections import deque
+from collections.abc import Iterable
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 from datetime import datetime
+from typing import Any, NamedTuple
 
 from .config import Settings
 
 logger = logging.getLogger(__name__)
 
+def _freeze(arg: Any) -> Any:
+    # scalars are kept for %d/%f; anything else is rendered now, so a later mutation
+    # does not show up and large objects are not kept alive by the buffer
+    if arg is None or isinstance(arg, (str, int, float)):
+        return arg
+    try:
+        return str(arg)
+    except Exception:
+        return object.__repr__(arg)
+
+
+def _freeze_args(args: Any) -> Any:
+    if isinstance(args, tuple):
+        return tuple(_freeze(arg) for arg in args)
+    if isinstance(args, dict):
+        # logger.info("%(key)s", mapping)
+        return {key: _freeze(value) for key, value in args.items()}
+    return _freeze(args)
+
+
+class LogEntry(NamedTuple):
+    """
+    what InMemoryHandler keeps of a record: its unformatted msg and args, frozen
+    (message() renders them on demand) and, if there was one, the already rendered
+    traceback
+    """
+    created: float
+    levelno: int
+    name: str
+    msg: Any
+    args: Any
+    exc_text: str | None
+
+    @property
+    def levelname(self) -> str:
+        return logging.getLevelName(self.levelno)
+
+    def message(self) -> str:
+        msg = str(self.msg)
+        if not self.args:
+            return msg
+        try:
+            return msg % self.args
+        except Exception:
+            # a bad logging call must not break every later get_logs()
+            return f"{self.msg!r} % {self.args!r}"
+
+    def to_record(self) -> logging.LogRecord:
+        return logging.makeLogRecord({
+            "name": self.name,
+            "levelno": self.levelno,
+            "levelname": self.levelname,
+            "msg": self.message(),
+            "args": None,
+            "exc_text": self.exc_text,
+            "created": self.created,
+            "msecs": (self.created - int(self.created)) * 1000,
+        })
+
+
 class InMemoryHandler(logging.Handler):
+    """
+    ring buffer of the last capacity records. emit is O(1) and formats nothing;
+    get_logs() and query() format only the entries they return.
+    """
     
     def __init__(self, capacity: int = 1000):
         super().__init__()
         self.capacity = capacity
-        self.buffer: list[str] = []
+        self.buffer: deque[LogEntry] = deque(maxlen=capacity)
     
     def emit(self, record: logging.LogRecord) -> None:
         try:
-            msg = self.format(record)
-            self.buffer.append(msg)
-            if len(self.buffer) > self.capacity:
-                self.buffer.pop(0)
+            exc_text = record.exc_text
+            if record.exc_info and not exc_text:
+                # render now rather than keep the traceback (and its frames) alive
+                exc_text = logging.Formatter().formatException(record.exc_info)
+            self.buffer.append(
+                LogEntry(record.created, record.levelno, record.name, record.msg, _freeze_args(record.args), exc_text)
+            )
         except Exception:
             self.handleError(record)
     
+    def query(
+        self,
+        *,
+        level: int | str | None = None,
+        logger: str | None = None,
+        since: float | datetime | None = None,
+        until: float | datetime | None = None,
+        limit: int | None = None,
+    ) -> list[LogEntry]:
+        """
+        entries at or above level, from logger or its children, created in
+        [since, until), oldest first; limit keeps the newest matches
+        """
+        if isinstance(level, str):
+            level = logging.getLevelName(level.upper())
+            if not isinstance(level, int):
+                raise ValueError(f"unknown log level: {level}")
+        if isinstance(since, datetime):
+            since = since.timestamp()
+        if isinstance(until, datetime):
+            until = until.timestamp()
+        prefix = None if logger is None else logger + "."
+        matches: list[LogEntry] = []
+        # newest first, so a limited query stops early
+        for entry in reversed(self.buffer.copy()):
+            if since is not None and entry.created < since:
+                break
+            if until is not None and entry.created >= until:
+                continue
+            if level is not None and entry.levelno < level:
+                continue
+            if logger is not None and entry.name != logger and not entry.name.startswith(prefix):
+                continue
+            matches.append(entry)
+            if limit is not None and len(matches) >= limit:
+                break
+        matches.reverse()
+        return matches
+    
+    def format_entries(self, entries: Iterable[LogEntry]) -> list[str]:
+        return [self.format(entry.to_record()) for entry in entries]
+    
     def get_logs(self, last_n: int | None = None) -> list[str]:
-        if last_n is None:
-            return self.buffer.copy()
-        return self.buffer[-last_n:]
+        entries = self.buffer.copy()
+        if last_n is not None:
+            entries = list(entries)[-last_n:] if last_n > 0 else []
+        return self.format_entries(entries)
     
     def clear(self) -> None:
         self.buffer.clear()
 
+
+class _LocalQueueHandler(QueueHandler):
+    """
+    QueueHandler.prepare formats each record so it can be pickled; the listener here
+    is a thread of the same process, so records are queued as they are and formatted
+    by the listener's handlers instead of on the logging thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
 _memory_handler: InMemoryHandler | None = None
+_listener: QueueListener | None = None
 def get_memory_handler() -> InMemoryHandler:
     if _memory_handler is None:
         raise RuntimeError("Logging not configured; call setup_logging() first")
     return _memory_handler
 
 
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()  # drains what is still queued
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(_stop_listener)
+
+
 def setup_logging(settings: Settings) -> None:
-    global _memory_handler
+    """
+    console and file output run on a QueueListener thread behind a QueueHandler, so
+    logging threads only enqueue; the in-memory buffer is attached directly.
+    """
+    global _memory_handler, _listener
     
     log_cfg = settings.get("logging", {})
     log_level_str = log_cfg.get("level", "INFO").upper()
@@ -83,21 +227,25 @@ def setup_logging(settings: Settings) -> None:
         )
         file_handler.setFormatter(formatter)
         handlers.append(file_handler)
-        logger.debug(f"File logging enabled: {target} (max {max_bytes} bytes, {backup_count} backups)")
+        logger.debug("File logging enabled: %s (max %d bytes, %d backups)", target, max_bytes, backup_count)
     
     buffer_capacity = log_cfg.get("buffer_capacity", 1000)
     _memory_handler = InMemoryHandler(capacity=buffer_capacity)
     _memory_handler.setFormatter(formatter)
-    handlers.append(_memory_handler)
-    logger.debug(f"In-memory log buffer enabled (capacity: {buffer_capacity})")
+    logger.debug("In-memory log buffer enabled (capacity: %d)", buffer_capacity)
     
     root_logger = logging.getLogger()
     root_logger.setLevel(log_level)
     
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
+    _stop_listener()
     
-    for handler in handlers:
-        root_logger.addHandler(handler)
+    if handlers:
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        _listener = QueueListener(records, *handlers, respect_handler_level=True)
+        _listener.start()
+        root_logger.addHandler(_LocalQueueHandler(records))
+    root_logger.addHandler(_memory_handler)
     
-    logger.info(f"Logging configured: level={log_level_str}, handlers={len(handlers)}")
\ No newline at end of file
+    logger.info("Logging configured: level=%s, handlers=%d", log_level_str, len(handlers) + 1)
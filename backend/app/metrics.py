@@ -0,0 +1,227 @@
+"""
+process-wide counters and histograms, rendered as Prometheus text or JSON.
+
+instruments are declared once at module level (metrics.counter(...)) and are cheap
+no-ops until enable() is called: inc() and observe() return after one attribute
+check, and hot loops can test metrics.enabled() once to skip their timing calls.
+"""
+
+import bisect
+import json
+import math
+import threading
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from time import perf_counter
+
+# seconds, from sub-millisecond statement executions up to whole-run commits
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_Labels = tuple[tuple[str, str], ...]
+
+
+class _State:
+    enabled = False
+
+
+_state = _State()
+
+
+def _key(labels: dict[str, str]) -> _Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _render_labels(labels: _Labels, extra: _Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    rendered = (
+        '{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(rendered) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values: dict[_Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if not _state.enabled:
+            return
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(_key(labels), 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"type": "counter", "help": self.help, "values": [
+                {"labels": dict(labels), "value": value} for labels, value in sorted(self._values.items())
+            ]}
+
+    def prometheus(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_render_labels(labels)} {_number(value)}"
+
+
+class _Series:
+    __slots__ = ("buckets", "count", "sum", "min", "max")
+
+    def __init__(self, size: int) -> None:
+        self.buckets = [0] * size  # per bucket, not cumulative; the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.bounds = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series: dict[_Labels, _Series] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not _state.enabled:
+            return
+        key = _key(labels)
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.bounds) + 1)
+            series.buckets[index] += 1
+            series.count += 1
+            series.sum += value
+            series.min = min(series.min, value)
+            series.max = max(series.max, value)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        if not _state.enabled:
+            yield
+            return
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(_key(labels))
+        return 0 if series is None else series.count
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            values = [
+                {
+                    "labels": dict(labels),
+                    "count": series.count,
+                    "sum": series.sum,
+                    "min": series.min if series.count else None,
+                    "max": series.max if series.count else None,
+                    "buckets": dict(zip([*map(str, self.bounds), "+Inf"], series.buckets)),
+                }
+                for labels, series in sorted(self._series.items())
+            ]
+        return {"type": "histogram", "help": self.help, "values": values}
+
+    def prometheus(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(labels, list(series.buckets), series.count, series.sum) for labels, series in sorted(self._series.items())]
+        for labels, buckets, count, total in items:
+            cumulative = 0
+            for bound, n in zip([*map(repr, self.bounds), "+Inf"], buckets):
+                cumulative += n
+                yield f"{self.name}_bucket{_render_labels(labels, (('le', bound),))} {cumulative}"
+            yield f"{self.name}_sum{_render_labels(labels)} {_number(total)}"
+            yield f"{self.name}_count{_render_labels(labels)} {count}"
+
+
+_registry_lock = threading.Lock()
+_registry: dict[str, Counter | Histogram] = {}
+
+
+def _register(instrument):
+    with _registry_lock:
+        existing = _registry.get(instrument.name)
+        if existing is not None:
+            if type(existing) is not type(instrument):
+                raise ValueError(f"metric {instrument.name} already registered as {type(existing).__name__}")
+            return existing
+        _registry[instrument.name] = instrument
+        return instrument
+
+
+def counter(name: str, help: str) -> Counter:
+    """the counter called name, created on first use"""
+    return _register(Counter(name, help))
+
+
+def histogram(name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """the histogram called name, created on first use"""
+    return _register(Histogram(name, help, buckets))
+
+
+def enabled() -> bool:
+    return _state.enabled
+
+
+def enable() -> None:
+    _state.enabled = True
+
+
+def disable() -> None:
+    _state.enabled = False
+
+
+def reset() -> None:
+    """zero every instrument (they stay registered)"""
+    with _registry_lock:
+        instruments = list(_registry.values())
+    for instrument in instruments:
+        instrument.reset()
+
+
+def snapshot() -> dict[str, dict]:
+    with _registry_lock:
+        instruments = sorted(_registry.items())
+    return {name: instrument.snapshot() for name, instrument in instruments}
+
+
+def to_json() -> str:
+    return json.dumps(snapshot(), indent=2, sort_keys=True)
+
+
+def to_prometheus() -> str:
+    """text exposition format 0.0.4"""
+    with _registry_lock:
+        instruments = sorted(_registry.items())
+    lines = [line for _name, instrument in instruments for line in instrument.prometheus()]
+    return "\n".join(lines) + "\n"
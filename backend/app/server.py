@@ -0,0 +1,359 @@
+"""
+read API over the catalog tables.
+
+every handler reads through Database.connect_readonly(), so an import holding the
+writer connection never stalls clients; they keep seeing the last committed catalog.
+responses carry an ETag derived from the catalog generation (catalog_meta), which
+each import bumps: If-None-Match gets a 304 until the next import, and serialized
+bodies are kept in an in-process LRU until then. listings are keyset-paginated
+(?after=<last id>), bulk exports stream NDJSON a page at a time, and /search
+ranks products by title and slug (catalog_search).
+
+    python -m app.server --config config.toml
+"""
+
+import argparse
+import json
+import logging
+import secrets
+import threading
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+
+from . import db
+from . import metrics
+from . import catalog_products as catalog_products_mgr
+from . import catalog_builds as catalog_builds_mgr
+from . import catalog_installers as catalog_installers_mgr
+from . import catalog_meta as catalog_meta_mgr
+from . import catalog_search as catalog_search_mgr
+from . import catalog_import_runs as catalog_import_runs_mgr
+from .catalog_products import ProductRow
+from .catalog_reader import CatalogReader, _LRU, _MISSING
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE = 100
+MAX_PAGE = 1000
+EXPORT_PAGE = 1000
+MAX_SEARCH = 100
+
+_REQUEST_SECONDS = metrics.histogram("http_request_seconds", "Request handling time, by route and status")
+# the latest catalog_import_runs row, exported as catalog_last_import_<column> gauges
+_RUN_GAUGES = (
+    "seconds", "new_products", "changed_products", "skipped_products", "unchanged_products", "vanished_products",
+    "new_builds", "changed_builds", "skipped_builds", "unchanged_builds", "vanished_builds",
+    "member_bytes", "rows_written", "parse_seconds", "extract_seconds", "flush_seconds",
+)
+
+_JSON = "application/json"
+_NDJSON = "application/x-ndjson"
+
+
+def _plain(value: Any) -> Any:
+    """catalog rows (NamedTuples) as JSON objects rather than arrays, also inside lists and dicts"""
+    if isinstance(value, tuple) and hasattr(value, "_asdict"):
+        return value._asdict()
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    return value
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(_plain(value), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _etag(generation: int) -> str:
+    return f'"catalog-{generation}"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in tags or "*" in tags
+
+
+class ResponseCache:
+    """serialized bodies keyed by request path and query, valid for one catalog generation"""
+
+    def __init__(self, maxsize: int) -> None:
+        self._lock = threading.Lock()
+        self._generation: int | None = None
+        self._bodies: _LRU[str, bytes] = _LRU(maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, generation: int, key: str) -> bytes | None:
+        with self._lock:
+            if generation != self._generation:
+                self._bodies.clear()
+                self._generation = generation
+            body = self._bodies.get(key)
+            if body is _MISSING:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return body
+
+    def put(self, generation: int, key: str, body: bytes) -> None:
+        with self._lock:
+            if generation == self._generation:
+                self._bodies.put(key, body)
+
+
+def create_app(
+    database: db.Database,
+    *,
+    api_key: str | None = None,
+    cache_size: int = 4096,
+    reader: CatalogReader | None = None,
+    metrics_endpoint: bool = False,
+) -> FastAPI:
+    """
+    the API app; requests must send X-API-Key when api_key is set. metrics_endpoint
+    turns on the process metrics and serves them, with the last import run, at /metrics.
+    """
+    reader = reader or CatalogReader(database)
+    cache = ResponseCache(cache_size)
+
+    def require_key(x_api_key: str | None = Header(default=None)) -> None:
+        if api_key and not (x_api_key and secrets.compare_digest(x_api_key, api_key)):
+            raise HTTPException(status_code=401, detail="invalid or missing X-API-Key")
+
+    app = FastAPI(title="MAGOG catalog", dependencies=[Depends(require_key)])
+    app.state.database = database
+    app.state.reader = reader
+    app.state.response_cache = cache
+
+    def generation() -> int:
+        with database.connect_readonly() as conn:
+            return catalog_meta_mgr.get_generation(conn)
+
+    def cached(request: Request, compute: Callable[[], Any]) -> Response:
+        """
+        JSON response for compute(), answered from the cache (or with a 304) while
+        the catalog generation is unchanged. compute raises HTTPException for 404s,
+        which are not cached.
+        """
+        current = generation()
+        etag = _etag(current)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
+        key = request.url.path + "?" + str(request.query_params)
+        body = cache.get(current, key)
+        if body is None:
+            body = _dumps(compute())
+            cache.put(current, key, body)
+        return Response(body, media_type=_JSON, headers=headers)
+
+    def page(rows: list, limit: int) -> dict:
+        return {"items": rows, "next": rows[-1].id if len(rows) == limit else None}
+
+    @app.get("/products")
+    def list_products(
+        request: Request,
+        after: int | None = None,
+        limit: int = Query(DEFAULT_PAGE, ge=1, le=MAX_PAGE),
+    ) -> Response:
+        def compute():
+            with database.connect_readonly() as conn:
+                return page(catalog_products_mgr.list_after(conn, after, limit), limit)
+        return cached(request, compute)
+
+    @app.get("/products/by-slug/{slug}")
+    def products_by_slug(request: Request, slug: str) -> Response:
+        def compute():
+            rows = reader.products_by_slug([slug]).get(slug)
+            if not rows:
+                raise HTTPException(status_code=404, detail=f"no product with slug {slug!r}")
+            return rows
+        return cached(request, compute)
+
+    def require_product(product_id: int) -> ProductRow:
+        product = reader.product(product_id)
+        if product is None:
+            raise HTTPException(status_code=404, detail=f"product {product_id} not found")
+        return product
+
+    @app.get("/products/{product_id}")
+    def get_product(request: Request, product_id: int) -> Response:
+        return cached(request, lambda: require_product(product_id))
+
+    @app.get("/products/{product_id}/builds")
+    def product_builds(request: Request, product_id: int) -> Response:
+        def compute():
+            require_product(product_id)
+            with database.connect_readonly() as conn:
+                return catalog_builds_mgr.get_for_product(conn, product_id)
+        return cached(request, compute)
+
+    @app.get("/products/{product_id}/builds/latest")
+    def latest_build(request: Request, product_id: int) -> Response:
+        def compute():
+            require_product(product_id)
+            build = reader.latest_build(product_id)
+            if build is None:
+                raise HTTPException(status_code=404, detail=f"product {product_id} has no builds")
+            return build
+        return cached(request, compute)
+
+    @app.get("/products/{product_id}/dlcs")
+    def product_dlcs(request: Request, product_id: int) -> Response:
+        def compute():
+            require_product(product_id)
+            return reader.installable_dlcs([product_id])[product_id]
+        return cached(request, compute)
+
+    @app.get("/products/{product_id}/installers")
+    def product_installers(request: Request, product_id: int) -> Response:
+        def compute():
+            require_product(product_id)
+            with database.connect_readonly() as conn:
+                return catalog_installers_mgr.get_for_product(conn, product_id)
+        return cached(request, compute)
+
+    @app.get("/search")
+    def search(
+        request: Request,
+        q: str = Query(min_length=1, max_length=200),
+        limit: int = Query(20, ge=1, le=MAX_SEARCH),
+        fuzzy: bool = True,
+    ) -> Response:
+        def compute():
+            with database.connect_readonly() as conn:
+                return catalog_search_mgr.search(conn, q, limit=limit, fuzzy=fuzzy)
+        return cached(request, compute)
+
+    @app.get("/builds")
+    def list_builds(
+        request: Request,
+        after: int | None = None,
+        limit: int = Query(DEFAULT_PAGE, ge=1, le=MAX_PAGE),
+    ) -> Response:
+        def compute():
+            with database.connect_readonly() as conn:
+                return page(catalog_builds_mgr.list_after(conn, after, limit), limit)
+        return cached(request, compute)
+
+    def export(request: Request, list_after: Callable) -> Response:
+        current = generation()
+        etag = _etag(current)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
+
+        def lines() -> Iterator[bytes]:
+            # one short read per page rather than one long-lived cursor, so a slow
+            # client does not pin a pooled connection (or a WAL snapshot) for the
+            # whole export. an import landing mid-export shows up in later pages.
+            after = None
+            while True:
+                with database.connect_readonly() as conn:
+                    rows = list_after(conn, after, EXPORT_PAGE)
+                if not rows:
+                    return
+                yield b"".join(_dumps(row) + b"\n" for row in rows)
+                if len(rows) < EXPORT_PAGE:
+                    return
+                after = rows[-1].id
+
+        return StreamingResponse(lines(), media_type=_NDJSON, headers=headers)
+
+    @app.get("/export/products.ndjson")
+    def export_products(request: Request) -> Response:
+        return export(request, catalog_products_mgr.list_after)
+
+    @app.get("/export/builds.ndjson")
+    def export_builds(request: Request) -> Response:
+        return export(request, catalog_builds_mgr.list_after)
+
+    if metrics_endpoint:
+        metrics.enable()
+
+        @app.middleware("http")
+        async def time_requests(request: Request, call_next):
+            started = time.perf_counter()
+            response = await call_next(request)
+            route = request.scope.get("route")
+            _REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                route=getattr(route, "path", "unmatched"),
+                status=str(response.status_code),
+            )
+            return response
+
+        @app.get("/metrics")
+        def get_metrics(format: str = Query("prometheus", pattern="^(prometheus|json)$")) -> Response:
+            with database.connect_readonly() as conn:
+                current = catalog_meta_mgr.get_generation(conn)
+                runs = catalog_import_runs_mgr.get_recent(conn, limit=1)
+            last_run = runs[0] if runs else None
+            if format == "json":
+                body = {"catalog_generation": current, "last_import": last_run, "metrics": metrics.snapshot()}
+                return Response(_dumps(body), media_type=_JSON)
+            lines = [
+                "# HELP catalog_generation Catalog generation, bumped by every import write",
+                "# TYPE catalog_generation gauge",
+                f"catalog_generation {current}",
+            ]
+            if last_run is not None:
+                for column in _RUN_GAUGES:
+                    lines.append(f"# TYPE catalog_last_import_{column} gauge")
+                    lines.append(f"catalog_last_import_{column} {last_run[column]}")
+            text = "\n".join(lines) + "\n" + metrics.to_prometheus()
+            return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+    return app
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="serve the catalog read API")
+    parser.add_argument(
+        "--config",
+        type=str,
+        default="config.toml",
+        help="Path to TOML config file (default: config.toml)",
+    )
+    args, _unknown = parser.parse_known_args(argv)
+    return args
+
+
+def cli(argv: list[str] | None = None) -> None:
+    import uvicorn
+
+    from . import config, log
+    args = _parse_args(argv)
+    SETTINGS = config.load_config(args.config)
+    log.setup_logging(SETTINGS)
+    database_cfg = SETTINGS.get("database", {})
+    db_path = Path(database_cfg.get("path", "data/catalog.db")).expanduser()
+    server_cfg = SETTINGS.get("server", {})
+
+    dbase = db.Database(str(db_path))
+    app = create_app(
+        dbase,
+        api_key=server_cfg.get("api_key") or None,
+        cache_size=int(server_cfg.get("cache_size", 4096)),
+        metrics_endpoint=bool(server_cfg.get("metrics", False)),
+    )
+    host = server_cfg.get("listen", "127.0.0.1")
+    port = int(server_cfg.get("port", 8000))
+    logger.info("Serving catalog from %s on %s:%d", db_path, host, port)
+    try:
+        uvicorn.run(app, host=host, port=port, log_config=None)
+    finally:
+        dbase.dispose()
+
+
+if __name__ == "__main__":
+    cli()
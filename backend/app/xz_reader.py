@@ -0,0 +1,275 @@
+"""
+multi-threaded xz decompression for snapshot archives.
+
+xz files written by `xz -T`, pixz or archive_index's re-pack consist of several
+independently compressed blocks, listed in the index at the end of each stream.
+each block is wrapped into a tiny standalone single-block stream and decoded on a
+thread pool (liblzma releases the GIL), then served in order as one byte stream.
+
+single-block files cannot be split, so they are decoded on one background thread
+instead, which at least overlaps decompression with whatever consumes the bytes.
+"""
+
+import contextlib
+import io
+import lzma
+import os
+import queue
+import struct
+import tarfile
+import threading
+import zlib
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+_HEADER_MAGIC = b"\xfd7zXZ\x00"
+_FOOTER_MAGIC = b"YZ"
+_HEADER_SIZE = 12
+_FOOTER_SIZE = 12
+_CHUNK_SIZE = 1024 * 1024
+
+
+class XZFormatError(ValueError):
+    """not an xz file, or an xz container this reader cannot split"""
+
+
+class _Block(NamedTuple):
+    stream_flags: bytes   # 2 bytes, copied into the synthetic stream header/footer
+    offset: int           # compressed offset of the block header
+    unpadded_size: int
+    uncompressed_size: int
+
+
+def _read_varint(buf: bytes, pos: int) -> tuple[int, int]:
+    value = 0
+    for i in range(9):
+        byte = buf[pos + i]
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            return value, pos + i + 1
+    raise XZFormatError("xz index varint too long")
+
+
+def _encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _round4(n: int) -> int:
+    return (n + 3) & ~3
+
+
+def read_block_index(f: BinaryIO) -> list[_Block]:
+    """list every block of every stream, in file order, from the stream indexes"""
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+    streams: list[list[_Block]] = []
+    while end > 0:
+        # stream padding between concatenated streams is zero bytes in 4-byte units
+        f.seek(end - 4)
+        if f.read(4) == b"\x00\x00\x00\x00":
+            end -= 4
+            continue
+        if end < _HEADER_SIZE + _FOOTER_SIZE:
+            raise XZFormatError("truncated xz stream")
+        f.seek(end - _FOOTER_SIZE)
+        footer = f.read(_FOOTER_SIZE)
+        if footer[10:] != _FOOTER_MAGIC:
+            raise XZFormatError("missing xz stream footer")
+        backward_size = (struct.unpack("<I", footer[4:8])[0] + 1) * 4
+        flags = footer[8:10]
+        index_start = end - _FOOTER_SIZE - backward_size
+        f.seek(index_start)
+        index = f.read(backward_size)
+        if index[0] != 0:
+            raise XZFormatError("missing xz index indicator")
+        count, pos = _read_varint(index, 1)
+        records = []
+        for _ in range(count):
+            unpadded, pos = _read_varint(index, pos)
+            uncompressed, pos = _read_varint(index, pos)
+            records.append((unpadded, uncompressed))
+        blocks_size = sum(_round4(u) for u, _ in records)
+        stream_start = index_start - blocks_size - _HEADER_SIZE
+        if stream_start < 0:
+            raise XZFormatError("xz index does not fit the file")
+        f.seek(stream_start)
+        header = f.read(_HEADER_SIZE)
+        if header[:6] != _HEADER_MAGIC or header[6:8] != flags:
+            raise XZFormatError("xz stream header does not match its footer")
+        offset = stream_start + _HEADER_SIZE
+        blocks = []
+        for unpadded, uncompressed in records:
+            blocks.append(_Block(flags, offset, unpadded, uncompressed))
+            offset += _round4(unpadded)
+        streams.append(blocks)
+        end = stream_start
+    return [block for stream in reversed(streams) for block in stream]
+
+
+def _standalone_stream(block: _Block, block_bytes: bytes) -> bytes:
+    """wrap one block in a stream header, a one-record index and a footer"""
+    header = _HEADER_MAGIC + block.stream_flags + struct.pack("<I", zlib.crc32(block.stream_flags))
+    index = b"\x00" + _encode_varint(1) + _encode_varint(block.unpadded_size) + _encode_varint(block.uncompressed_size)
+    index += b"\x00" * (_round4(len(index)) - len(index))
+    index += struct.pack("<I", zlib.crc32(index))
+    backward = struct.pack("<I", len(index) // 4 - 1)
+    footer = struct.pack("<I", zlib.crc32(backward + block.stream_flags)) + backward + block.stream_flags + _FOOTER_MAGIC
+    return header + block_bytes + index + footer
+
+
+def _decode_block(path: str, block: _Block) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(block.offset)
+        block_bytes = f.read(_round4(block.unpadded_size))
+    data = lzma.decompress(_standalone_stream(block, block_bytes), format=lzma.FORMAT_XZ)
+    if len(data) != block.uncompressed_size:
+        raise XZFormatError(f"block at {block.offset} decoded to {len(data)} bytes, index says {block.uncompressed_size}")
+    return data
+
+
+class _ChunkStream(io.RawIOBase):
+    """RawIOBase over an iterator of byte chunks"""
+
+    def __init__(self, chunks: Iterator[bytes], on_close=None) -> None:
+        self._chunks = chunks
+        self._current = memoryview(b"")
+        self._on_close = on_close
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._current:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._current = memoryview(chunk)
+        n = min(len(b), len(self._current))
+        b[:n] = self._current[:n]
+        self._current = self._current[n:]
+        return n
+
+    def close(self) -> None:
+        if not self.closed and self._on_close is not None:
+            self._on_close()
+        super().close()
+
+
+def _iter_blocks_parallel(path: str, blocks: list[_Block], pool: ThreadPoolExecutor, ahead: int) -> Iterator[bytes]:
+    pending: deque[Future] = deque()
+    remaining = iter(blocks)
+    for block in remaining:
+        pending.append(pool.submit(_decode_block, path, block))
+        if len(pending) >= ahead:
+            break
+    while pending:
+        data = pending.popleft().result()
+        nxt = next(remaining, None)
+        if nxt is not None:
+            pending.append(pool.submit(_decode_block, path, nxt))
+        yield data
+
+
+def _open_parallel(path: str, blocks: list[_Block], threads: int) -> BinaryIO:
+    pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="xz-block")
+    raw = _ChunkStream(
+        _iter_blocks_parallel(path, blocks, pool, ahead=threads * 2),
+        on_close=lambda: pool.shutdown(wait=True, cancel_futures=True),
+    )
+    return io.BufferedReader(raw, buffer_size=_CHUNK_SIZE)
+
+
+_DONE = object()
+
+
+def _open_threaded(path: str, depth: int = 8) -> BinaryIO:
+    """decode on a background thread into a bounded queue of chunks"""
+    chunks: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def decode() -> None:
+        try:
+            with lzma.open(path, "rb") as xz:
+                while True:
+                    chunk = xz.read(_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if not put(chunk):
+                        return
+            put(_DONE)
+        except BaseException as exc:
+            put(exc)
+
+    thread = threading.Thread(target=decode, name="xz-decode", daemon=True)
+    thread.start()
+
+    def iter_chunks() -> Iterator[bytes]:
+        while True:
+            item = chunks.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def close() -> None:
+        stop.set()
+        thread.join()
+
+    return io.BufferedReader(_ChunkStream(iter_chunks(), on_close=close), buffer_size=_CHUNK_SIZE)
+
+
+def open_xz(path: str | Path, *, threads: int | None = None) -> BinaryIO:
+    """
+    decompressed byte stream of an .xz file.
+    threads=None uses one thread per CPU; threads=1 keeps plain lzma.open.
+    """
+    path = str(path)
+    if threads is None:
+        threads = os.cpu_count() or 1
+    if threads <= 1:
+        return lzma.open(path, "rb")
+    try:
+        with open(path, "rb") as f:
+            blocks = read_block_index(f)
+    except (XZFormatError, IndexError, struct.error) as exc:
+        logger.debug("Cannot read xz block index of %s (%s); decoding on one thread", path, exc)
+        blocks = []
+    if len(blocks) > 1:
+        return _open_parallel(path, blocks, threads)
+    return _open_threaded(path)
+
+
+@contextlib.contextmanager
+def open_tar(path: str | Path, *, threads: int | None = None) -> Iterator[tarfile.TarFile]:
+    """
+    sequential ("r|") tar reader over open_xz; members must be read in archive order,
+    which is how every snapshot reader in this repo walks archives anyway
+    """
+    stream = open_xz(path, threads=threads)
+    try:
+        with tarfile.open(fileobj=stream, mode="r|") as tf:
+            yield tf
+    finally:
+        stream.close()
@@ -0,0 +1,4 @@
+"""
+benchmark scripts and their shared pieces: snapshot (synthetic GOGDB .tar.xz
+archives) and results (timing, JSON result files, comparing two runs).
+"""
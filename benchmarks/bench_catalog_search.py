@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+search latency of backend/app/catalog_search at catalog scale, against LIKE scans
+
+    python benchmarks/bench_catalog_search.py --products 100000 --queries 200
+
+builds a scratch database of synthetic products (titles drawn from a fixed word
+list, slugs derived from them), indexes it through catalog_search.index_products in
+import-sized batches and times prefix, multi-word, typo and no-match queries.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text  # noqa: E402
+
+from backend.app import db, catalog_search  # noqa: E402
+from backend.app import catalog_products as catalog_products_mgr  # noqa: E402
+
+WORDS = (
+    "witcher wild hunt cyberpunk baldur gate divinity original sin pillars eternity "
+    "disco elysium fallout new vegas planescape torment heroes might magic settlers "
+    "stronghold crusader commandos desperados shadow tactics frostpunk banished rimworld "
+    "darkest dungeon hollow knight celeste hades bastion transistor pyre stardew valley "
+    "terraria factorio oxygen included kingdom deliverance mount blade bannerlord "
+    "king arthur knight edition definitive complete gold remastered enhanced legacy "
+    "chronicles saga tales legend return rise fall empire war age mystery island"
+).split()
+
+
+def _title(rng: random.Random, n: int) -> str:
+    words = [rng.choice(WORDS).capitalize() for _ in range(rng.randint(2, 5))]
+    if rng.random() < 0.3:
+        words.append(str(rng.randint(2, 4)))
+    return " ".join(words) + ("" if rng.random() < 0.7 else f" {n}")
+
+
+def _typo(rng: random.Random, word: str) -> str:
+    i = rng.randrange(len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def populate(database: db.Database, products: int, batch_size: int) -> float:
+    rng = random.Random(1)
+    rows = []
+    for n in range(1, products + 1):
+        title = _title(rng, n)
+        rows.append(catalog_products_mgr.ProductRow(
+            id=1_000_000_000 + n,
+            type="game",
+            slug=title.lower().replace(" ", "_"),
+            title=title,
+            global_date=None,
+            is_in_development=False,
+            image_boxart=None,
+        ))
+    start = time.perf_counter()
+    with database.connect() as conn:
+        for offset in range(0, len(rows), batch_size):
+            batch = rows[offset:offset + batch_size]
+            catalog_products_mgr.upsert_many(conn, batch)
+            catalog_search.index_products(conn, batch)
+    return time.perf_counter() - start
+
+
+def _time(label: str, fn, queries: list[str]) -> None:
+    latencies = []
+    found = 0
+    for query in queries:
+        start = time.perf_counter()
+        found += len(fn(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{label:<28}: p50 {statistics.median(latencies):7.2f} ms  p95 {p95:7.2f} ms"
+        f"  max {latencies[-1]:7.2f} ms  avg hits {found / len(queries):5.1f}"
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(2)
+    with tempfile.TemporaryDirectory() as tmp:
+        database = db.Database(str(Path(tmp) / "search.db"))
+        elapsed = populate(database, args.products, args.batch_size)
+        print(f"{args.products} products indexed in {elapsed:.2f}s ({args.products / elapsed:,.0f}/s)")
+
+        query_sets = {
+            "prefix (1 word, 3 chars)": [rng.choice(WORDS)[:3] for _ in range(args.queries)],
+            "words (2 full words)": [" ".join(rng.sample(WORDS, 2)) for _ in range(args.queries)],
+            "typo (1 word, fuzzy)": [_typo(rng, rng.choice(WORDS)) for _ in range(args.queries)],
+            "no match": [f"zzq{n}xv" for n in range(args.queries)],
+        }
+        like = text("SELECT id FROM catalog_products WHERE title LIKE :pattern OR slug LIKE :pattern LIMIT :limit")
+        with database.connect_readonly() as conn:
+            for label, queries in query_sets.items():
+                _time(f"fts5 {label}", lambda q: catalog_search.search(conn, q, limit=args.limit), queries)
+                _time(
+                    f"LIKE {label}",
+                    lambda q: conn.execute(like, {"pattern": f"%{q}%", "limit": args.limit}).all(),
+                    queries,
+                )
+        database.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
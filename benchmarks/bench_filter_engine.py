@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+compare the native filter engine, the jq coprocess and one jq subprocess per product.json
+
+    python benchmarks/bench_filter_engine.py --products 2000
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import process_archive  # noqa: E402
+from benchmarks import snapshot  # noqa: E402
+
+
+def _time(archive: Path, engine: str) -> tuple[float, int]:
+    start = time.perf_counter()
+    count = sum(1 for _ in process_archive.iter_products(str(archive), engine=engine))
+    return time.perf_counter() - start, count
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = Path(tmp) / "snapshot.tar.xz"
+        # product.json members only, a third of them filtered out as coming-soon
+        snapshot.write_snapshot(archive, snapshot.SnapshotSpec(products=args.products, manifests=False, coming_soon_ratio=0.33))
+        results = {}
+        for engine in ("native", "coprocess", "jq"):
+            elapsed, count = _time(archive, engine)
+            results[engine] = elapsed
+            print(f"{engine:>9}: {count} products in {elapsed:.3f}s ({args.products / elapsed:,.0f} files/s)")
+        for engine in ("native", "coprocess"):
+            print(f"{engine} speedup over jq: {results['jq'] / results[engine]:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
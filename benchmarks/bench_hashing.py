@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+compare backend/app/hashing.py with naive hashlib reads (one pass per digest, small reads)
+
+    python benchmarks/bench_hashing.py --files 4 --size-mb 512 --threads 4
+
+files are written to --dir (default: a temp dir) and are usually still in the page
+cache afterwards; point --dir at the library disk and drop caches between runs
+(echo 3 > /proc/sys/vm/drop_caches) to measure the disks instead of memory.
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.app import hashing  # noqa: E402
+
+ALGORITHMS = ("md5", "sha256")
+
+
+def naive(path: Path) -> dict[str, str]:
+    digests = {}
+    for name in ALGORITHMS:
+        h = hashlib.new(name)
+        with open(path, "rb") as f:
+            while chunk := f.read(64 * 1024):
+                h.update(chunk)
+        digests[name] = h.hexdigest()
+    return digests
+
+
+def write_files(directory: Path, files: int, size_mb: int) -> list[Path]:
+    paths = []
+    block = os.urandom(1024 * 1024)
+    for n in range(files):
+        path = directory / f"installer_{n}.bin"
+        with open(path, "wb") as f:
+            for _ in range(size_mb):
+                f.write(block)
+        paths.append(path)
+    return paths
+
+
+def _run(label: str, fn, paths: list[Path], threads: int, total_mb: float) -> list[dict[str, str]]:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(fn, paths))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32}: {elapsed:6.2f}s {total_mb / elapsed:8.1f} MB/s")
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--size-mb", type=int, default=512)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--dir", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        paths = write_files(Path(tmp), args.files, args.size_mb)
+        total_mb = args.files * args.size_mb
+        print(f"{args.files} files x {args.size_mb} MB, digests {'+'.join(ALGORITHMS)}, {os.cpu_count()} CPUs")
+        expected = _run("naive, 1 thread", naive, paths, 1, total_mb)
+        for threads in sorted({1, args.threads}):
+            got = _run(f"hash_file read, {threads} threads", lambda p: hashing.hash_file(p, ALGORITHMS), paths, threads, total_mb)
+            assert got == expected
+            got = _run(
+                f"hash_file mmap, {threads} threads",
+                lambda p: hashing.hash_file(p, ALGORITHMS, use_mmap=True),
+                paths, threads, total_mb,
+            )
+            assert got == expected
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
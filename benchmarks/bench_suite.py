@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+end-to-end timings on a synthetic snapshot (benchmarks/snapshot.py): archive filtering,
+member decoding, catalog imports into an empty and an already loaded database, and the
+catalog query helpers. results go to --output as JSON; compare two runs with
+benchmarks/results.py. MAGOG_JSON_BACKEND=stdlib times the decoder fallback.
+
+    python -m benchmarks.bench_suite --products 20000 --output before.json
+    ... change things ...
+    python -m benchmarks.bench_suite --products 20000 --output after.json
+    python -m benchmarks.results before.json after.json
+"""
+
+import argparse
+import random
+import sys
+import tarfile
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import process_archive  # noqa: E402
+from backend.app import db, catalog_ingest, catalog_search, json_codec  # noqa: E402
+from backend.app import catalog_products as catalog_products_mgr  # noqa: E402
+from backend.app import catalog_builds as catalog_builds_mgr  # noqa: E402
+from backend.app import catalog_dlcs as catalog_dlcs_mgr  # noqa: E402
+from backend.app.catalog_reader import CatalogReader  # noqa: E402
+from benchmarks import snapshot  # noqa: E402
+from benchmarks.results import Recorder  # noqa: E402
+
+
+def _remove_db(path: Path) -> None:
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+
+def bench_archive(rec: Recorder, archive: Path, info: snapshot.SnapshotInfo, repeat: int) -> None:
+    rec.measure(
+        "process_archive.iter_products native",
+        lambda: sum(1 for _ in process_archive.iter_products(str(archive), engine="native")),
+        repeat=repeat, items=info.products, unit="products",
+    )
+
+
+def bench_parse(rec: Recorder, archive: Path, info: snapshot.SnapshotInfo, repeat: int) -> None:
+    """member decoding and row extraction alone, with the archive already in memory"""
+    with tarfile.open(archive, mode="r:xz") as tf:
+        members = [(member.name, tf.extractfile(member).read(), "") for member in tf if member.isfile()]
+    rec.measure(
+        "catalog_ingest._parse_members, in memory",
+        lambda: catalog_ingest._parse_members(members),
+        repeat=repeat, items=info.products + info.manifests, unit="members",
+    )
+
+
+def bench_import(rec: Recorder, archive: Path, db_path: Path, info: snapshot.SnapshotInfo, repeat: int, workers: int) -> None:
+    members = info.products + info.manifests
+    state: dict[str, db.Database] = {}
+
+    def fresh() -> None:
+        if "db" in state:
+            state.pop("db").dispose()
+        _remove_db(db_path)
+        state["db"] = db.Database(str(db_path))
+
+    def run(incremental: bool = True) -> catalog_ingest.ImportStats:
+        with state["db"].connect() as conn:
+            return catalog_ingest.import_archive(conn, archive, workers=workers, incremental=incremental)
+
+    stats = rec.measure("import_archive cold", run, setup=fresh, repeat=repeat, items=members, unit="members")
+    rec.results[-1].extra["rows_written"] = stats.rows_written
+    rec.measure("import_archive warm, unchanged (incremental)", run, repeat=repeat, items=members, unit="members")
+    rec.measure("import_archive warm, --full", lambda: run(False), repeat=repeat, items=members, unit="members")
+    state.pop("db").dispose()
+
+
+def bench_queries(rec: Recorder, db_path: Path, info: snapshot.SnapshotInfo, lookups: int, repeat: int) -> None:
+    rng = random.Random(1)
+    database = db.Database(str(db_path))
+    ids = rng.sample(info.product_ids, min(lookups, len(info.product_ids)))
+    with database.connect_readonly() as conn:
+        slugs = [row.slug for row in catalog_products_mgr.get_many_by_id(conn, ids).values()]
+        words = [title.split()[0] for title in (row.title for row in catalog_products_mgr.get_many_by_id(conn, ids[:50]).values())]
+        n = len(ids)
+
+        rec.measure("catalog_products.get_by_id, one query each",
+                    lambda: [catalog_products_mgr.get_by_id(conn, i) for i in ids], repeat=repeat, items=n, unit="lookups")
+        rec.measure("catalog_products.get_many_by_id",
+                    lambda: catalog_products_mgr.get_many_by_id(conn, ids), repeat=repeat, items=n, unit="lookups")
+        rec.measure("catalog_products.get_many_by_slug",
+                    lambda: catalog_products_mgr.get_many_by_slug(conn, slugs), repeat=repeat, items=len(slugs), unit="lookups")
+        rec.measure("catalog_builds.get_latest_for_product, one each",
+                    lambda: [catalog_builds_mgr.get_latest_for_product(conn, i) for i in ids], repeat=repeat, items=n, unit="lookups")
+        rec.measure("catalog_builds.get_latest_for_products",
+                    lambda: catalog_builds_mgr.get_latest_for_products(conn, ids), repeat=repeat, items=n, unit="lookups")
+        rec.measure("catalog_dlcs.get_installable_for_parents",
+                    lambda: catalog_dlcs_mgr.get_installable_for_parents(conn, ids), repeat=repeat, items=n, unit="lookups")
+        rec.measure("catalog_search.search, prefix",
+                    lambda: [catalog_search.search(conn, word[:4]) for word in words], repeat=repeat, items=len(words), unit="queries")
+
+    reader = CatalogReader(database)
+    rec.measure("CatalogReader.products, cold cache",
+                lambda: reader.products(ids), setup=reader.clear, repeat=repeat, items=n, unit="lookups")
+    rec.measure("CatalogReader.products, warm cache",
+                lambda: reader.products(ids), repeat=repeat, items=n, unit="lookups")
+    database.dispose()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    snapshot.add_spec_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1, help="catalog_ingest process pool size")
+    parser.add_argument("--lookups", type=int, default=2000, help="Product ids per query-helper run")
+    parser.add_argument("--output", type=Path, default=None, help="Write results here as JSON")
+    args = parser.parse_args(argv)
+
+    spec = snapshot.spec_from_args(args)
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = Path(tmp) / "snapshot.tar.xz"
+        info = snapshot.write_snapshot(archive, spec)
+        print(
+            f"snapshot: {info.products} products, {info.manifests} manifests "
+            f"({info.gen1_manifests} gen1 / {info.gen2_manifests} gen2), "
+            f"{info.member_bytes / 2**20:.1f} MiB -> {info.compressed_bytes / 2**20:.1f} MiB xz"
+        )
+        rec = Recorder("catalog", params={
+            "spec": info.spec, "repeat": args.repeat, "workers": args.workers, "lookups": args.lookups,
+            "json_backend": json_codec.backend(),
+        })
+        db_path = Path(tmp) / "catalog.db"
+        bench_archive(rec, archive, info, args.repeat)
+        bench_parse(rec, archive, info, args.repeat)
+        bench_import(rec, archive, db_path, info, args.repeat, args.workers)
+        bench_queries(rec, db_path, info, args.lookups, args.repeat)
+    if args.output:
+        rec.write(args.output)
+        print(f"wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+compare tarfile's single-threaded "r:xz" with backend/app/xz_reader on a large snapshot
+
+    python benchmarks/bench_xz_reader.py --size-mb 300 --threads 8
+
+the snapshot is compressed in independent blocks (`xz -T0 --block-size`, or
+independent streams when xz is not on PATH), as `xz -T` and archive_index --repack
+write them. pass --archive to time an existing snapshot instead.
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.app import archive_index, xz_reader  # noqa: E402
+
+
+def _manifest(rng: random.Random, build_id: int) -> dict:
+    return {
+        "version": 2,
+        "buildId": str(build_id),
+        "products": [{"productId": str(rng.randint(1, 10**9)), "name": f"Product {n}"} for n in range(rng.randint(1, 4))],
+        "depots": [
+            {
+                "productId": str(rng.randint(1, 10**9)),
+                "manifest": f"{rng.getrandbits(128):032x}",
+                "size": rng.randint(1, 10**10),
+                "languages": rng.sample(["en", "de", "fr", "pl", "ru", "zh"], 2),
+            }
+            for _ in range(rng.randint(5, 60))
+        ],
+    }
+
+
+def write_tar(path: Path, size_mb: int, seed: int = 0) -> int:
+    rng = random.Random(seed)
+    members = 0
+    with tarfile.open(path, mode="w") as tf:
+        while path.stat().st_size < size_mb * 1024 * 1024:
+            members += 1
+            raw = json.dumps(_manifest(rng, members), indent=2).encode("utf-8")
+            info = tarfile.TarInfo(f"products/{members % 5000}/builds/{members}.json")
+            info.size = len(raw)
+            tf.addfile(info, io.BytesIO(raw))
+    return members
+
+
+def compress(tar_path: Path, out: Path, block_size: int) -> None:
+    if shutil.which("xz"):
+        with open(out, "wb") as f:
+            subprocess.run(["xz", "-T0", f"--block-size={block_size}", "-c", str(tar_path)], stdout=f, check=True)
+        return
+    with open(tar_path, "rb") as src, open(out, "wb") as dst:
+        writer = archive_index._BlockWriter(dst, block_size, 6)
+        while chunk := src.read(1024 * 1024):
+            writer.write(chunk)
+        writer.close()
+
+
+def _walk(tf: tarfile.TarFile) -> int:
+    total = 0
+    for member in tf:
+        if member.isfile():
+            f = tf.extractfile(member)
+            if f is not None:
+                total += len(f.read())
+    return total
+
+
+def _time_tarfile(archive: Path) -> tuple[float, int]:
+    start = time.perf_counter()
+    with tarfile.open(archive, mode="r:xz") as tf:
+        total = _walk(tf)
+    return time.perf_counter() - start, total
+
+
+def _time_xz_reader(archive: Path, threads: int) -> tuple[float, int]:
+    start = time.perf_counter()
+    with xz_reader.open_tar(archive, threads=threads) as tf:
+        total = _walk(tf)
+    return time.perf_counter() - start, total
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=300, help="Uncompressed tar size to generate")
+    parser.add_argument("--block-size", type=int, default=8 * 1024 * 1024)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--archive", type=Path, default=None, help="Time this .tar.xz instead of generating one")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = args.archive
+        if archive is None:
+            tar_path = Path(tmp) / "snapshot.tar"
+            members = write_tar(tar_path, args.size_mb)
+            archive = Path(tmp) / "snapshot.tar.xz"
+            compress(tar_path, archive, args.block_size)
+            tar_path.unlink()
+            print(f"generated {members} members, {args.size_mb} MB tar, {archive.stat().st_size / 2**20:.1f} MB xz")
+        with open(archive, "rb") as f:
+            print(f"{len(xz_reader.read_block_index(f))} xz blocks, {os.cpu_count()} CPUs")
+
+        base, size = _time_tarfile(archive)
+        print(f"tarfile r:xz      : {base:.2f}s ({size / 2**20 / base:,.0f} MB/s of members)")
+        for threads in sorted({1, 2, args.threads}):
+            elapsed, checked = _time_xz_reader(archive, threads)
+            assert checked == size
+            print(f"xz_reader {threads:>2} thr  : {elapsed:.2f}s ({size / 2**20 / elapsed:,.0f} MB/s, {base / elapsed:.2f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+timing and JSON result files for the benchmark scripts, and a comparison of two of
+them to catch regressions between versions.
+
+    python -m benchmarks.results baseline.json current.json --threshold 0.10
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "-C", str(_ROOT), "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def environment() -> dict[str, Any]:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+@dataclass
+class Result:
+    name: str
+    runs: list[float]            # seconds per run
+    items: int | None = None     # work units per run (products, queries, ...), for throughput
+    unit: str = "items"
+    extra: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def best(self) -> float:
+        return min(self.runs)
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.runs)
+
+    def to_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        data["best"] = self.best
+        data["median"] = self.median
+        if self.items:
+            data["per_second"] = self.items / self.best
+        return data
+
+
+class Recorder:
+    """collects Results; measure() times a callable, write() saves them with the environment"""
+
+    def __init__(self, suite: str, params: dict[str, Any] | None = None) -> None:
+        self.suite = suite
+        self.params = params or {}
+        self.results: list[Result] = []
+
+    def measure(
+        self,
+        name: str,
+        fn: Callable[[], T],
+        *,
+        repeat: int = 3,
+        items: int | None = None,
+        unit: str = "items",
+        setup: Callable[[], Any] | None = None,
+        **extra: Any,
+    ) -> T:
+        """best of repeat runs of fn() (setup() runs untimed before each); returns the last fn() result"""
+        runs = []
+        value = None
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            value = fn()
+            runs.append(time.perf_counter() - start)
+        result = Result(name, runs, items, unit, extra)
+        self.results.append(result)
+        rate = f" {items / result.best:12,.0f} {unit}/s" if items else ""
+        print(f"{name:<48}: best {result.best:8.4f}s  median {result.median:8.4f}s{rate}", flush=True)
+        return value
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "suite": self.suite,
+            "environment": environment(),
+            "params": self.params,
+            "results": {result.name: result.to_dict() for result in self.results},
+        }
+
+    def write(self, path: str | Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2, default=str) + "\n", encoding="utf-8")
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any], *, threshold: float = 0.10) -> list[tuple[str, float, float, float, str]]:
+    """
+    (name, baseline best, current best, change, verdict) for every result in both files;
+    change is current / baseline - 1, and beyond +threshold counts as a regression
+    """
+    rows = []
+    for name, old in baseline["results"].items():
+        new = current["results"].get(name)
+        if new is None:
+            continue
+        change = new["best"] / old["best"] - 1 if old["best"] else 0.0
+        if change > threshold:
+            verdict = "REGRESSION"
+        elif change < -threshold:
+            verdict = "faster"
+        else:
+            verdict = "~"
+        rows.append((name, old["best"], new["best"], change, verdict))
+    return rows
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    current = json.loads(args.current.read_text(encoding="utf-8"))
+    if baseline.get("params") != current.get("params"):
+        print("warning: the two runs used different parameters", file=sys.stderr)
+    print(
+        f"{baseline['environment'].get('git_revision')} -> {current['environment'].get('git_revision')}"
+    )
+    rows = compare(baseline, current, threshold=args.threshold)
+    for name, old, new, change, verdict in rows:
+        print(f"{name:<48}: {old:8.4f}s -> {new:8.4f}s  {change:+7.1%}  {verdict}")
+    return 1 if any(verdict == "REGRESSION" for *_rest, verdict in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+synthetic GOGDB-shaped snapshots: products/<id>/product.json for every product and
+products/<id>/builds/<build id>.json for its build manifests (gen1 repository v1 or
+gen2 v2), packed as .tar.xz. same spec and seed, same bytes.
+
+    python -m benchmarks.snapshot snapshot.tar.xz --products 20000 --gen2-ratio 0.7
+"""
+
+import argparse
+import io
+import json
+import random
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+LANGUAGES = ("en", "de", "fr", "pl", "ru", "zh", "es", "it", "ja", "pt-BR")
+SYSTEMS = ("windows", "windows", "windows", "osx", "linux")
+WORDS = (
+    "witcher", "wild", "hunt", "gate", "divinity", "original", "sin", "pillars", "eternity",
+    "elysium", "fallout", "vegas", "torment", "heroes", "might", "magic", "settlers", "stronghold",
+    "crusader", "shadow", "tactics", "dungeon", "knight", "valley", "kingdom", "legacy", "saga",
+    "chronicles", "empire", "war", "age", "island", "mystery", "legend", "return", "rise",
+)
+
+_FIRST_PRODUCT_ID = 1_000_000_000
+_FIRST_BUILD_ID = 50_000_000_000_000_000
+
+
+@dataclass
+class SnapshotSpec:
+    products: int = 2000
+    builds_per_product: tuple[int, int] = (0, 4)      # inclusive range, per game or DLC
+    installers_per_product: tuple[int, int] = (0, 3)  # dl_installer entries
+    dlc_ratio: float = 0.25        # products that are DLCs, each requiring an earlier game
+    pack_ratio: float = 0.05
+    coming_soon_ratio: float = 0.03
+    gen2_ratio: float = 0.6        # build manifests in gen2 format, the rest gen1
+    depots_per_manifest: tuple[int, int] = (5, 40)
+    manifests: bool = True         # write build manifests at all
+    seed: int = 0
+    block_size: int | None = None  # xz block size (multi-block via the xz CLI); None: one stream
+
+
+@dataclass
+class SnapshotInfo:
+    path: str
+    spec: dict = field(default_factory=dict)
+    products: int = 0
+    manifests: int = 0
+    gen1_manifests: int = 0
+    gen2_manifests: int = 0
+    member_bytes: int = 0
+    compressed_bytes: int = 0
+    product_ids: list[int] = field(default_factory=list, repr=False)
+
+
+def _title(rng: random.Random) -> str:
+    words = [rng.choice(WORDS).capitalize() for _ in range(rng.randint(2, 4))]
+    if rng.random() < 0.3:
+        words.append(str(rng.randint(2, 4)))
+    return " ".join(words)
+
+
+def _product(rng: random.Random, spec: SnapshotSpec, product_id: int, games: list[int], next_build: list[int]) -> dict:
+    roll = rng.random()
+    if games and roll < spec.dlc_ratio:
+        kind = "dlc"
+    elif roll < spec.dlc_ratio + spec.pack_ratio:
+        kind = "pack"
+    else:
+        kind = "game"
+    title = _title(rng)
+    builds = []
+    if kind != "pack":
+        for n in range(rng.randint(*spec.builds_per_product)):
+            next_build[0] += rng.randint(1, 1000)
+            builds.append({
+                "id": next_build[0],
+                "product_id": product_id,
+                "os": rng.choice(SYSTEMS),
+                "date_published": f"20{rng.randint(15, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T12:00:00+0000",
+                "version": f"{n + 1}.{rng.randint(0, 9)}",
+                "generation": 2 if rng.random() < spec.gen2_ratio else 1,
+                "legacy_build_id": rng.randint(10**7, 10**8) if rng.random() < 0.2 else None,
+            })
+    return {
+        "id": product_id,
+        "type": kind,
+        "slug": f"{title.lower().replace(' ', '_')}_{product_id % 100000}",
+        "title": title,
+        "store_state": "coming-soon" if rng.random() < spec.coming_soon_ratio else "default",
+        "global_date": f"20{rng.randint(10, 24)}-{rng.randint(1, 12):02d}-01T00:00:00+0000",
+        "is_in_development": rng.random() < 0.05,
+        "image_boxart": f"https://images.example/{product_id:x}.png",
+        "requires": [rng.choice(games)] if kind == "dlc" else [],
+        "dl_installer": [
+            {
+                "id": f"{rng.choice(LANGUAGES)}{n + 1}installer{rng.randint(0, 9)}",
+                "language": {"code": rng.choice(LANGUAGES)},
+                "os": rng.choice(SYSTEMS),
+                "version": f"{rng.randint(1, 3)}.{rng.randint(0, 9)}",
+            }
+            for n in range(rng.randint(*spec.installers_per_product))
+        ],
+        "builds": builds,
+    }
+
+
+def _depots(rng: random.Random, spec: SnapshotSpec, product_ids: list[str], gen2: bool) -> list[dict]:
+    depots = []
+    for _ in range(rng.randint(*spec.depots_per_manifest)):
+        if gen2:
+            depots.append({
+                "productId": rng.choice(product_ids),
+                "manifest": f"{rng.getrandbits(128):032x}",
+                "size": rng.randint(1, 10**10),
+                "compressedSize": rng.randint(1, 10**10),
+                "languages": rng.sample(LANGUAGES, 2),
+            })
+        else:
+            depots.append({
+                "gameIDs": [rng.choice(product_ids)],
+                "languages": rng.sample(LANGUAGES, 2),
+                "manifest": f"{rng.getrandbits(128):032x}.json",
+                "size": str(rng.randint(1, 10**10)),
+                "systems": [rng.choice(("Windows", "Osx", "Linux"))],
+            })
+    return depots
+
+
+def _manifest(rng: random.Random, spec: SnapshotSpec, product: dict, build: dict, dlcs: list[dict]) -> dict:
+    ids = [str(product["id"])] + [str(dlc["id"]) for dlc in dlcs]
+    if build["generation"] == 2:
+        manifest = {
+            "version": 2,
+            "baseProductId": str(product["id"]),
+            "installDirectory": product["title"],
+            "products": [
+                {"productId": str(product["id"]), "name": product["title"], "temp_executable": "game.exe"},
+                *({"productId": str(dlc["id"]), "name": dlc["title"]} for dlc in dlcs),
+            ],
+            "depots": _depots(rng, spec, ids, True),
+        }
+        # GOG's gen2 manifests do not always repeat their build id; the importer
+        # falls back to the member name
+        if rng.random() < 0.8:
+            manifest["buildId"] = str(build["id"])
+        return manifest
+    return {
+        "version": 1,
+        "product": {
+            "rootGameID": str(product["id"]),
+            "projectName": product["slug"],
+            "gameIDs": [
+                {"gameID": str(product["id"]), "name": {"en": product["title"]}, "standalone": True},
+                *(
+                    {"gameID": str(dlc["id"]), "name": {"en": dlc["title"]}, "dependency": str(product["id"])}
+                    for dlc in dlcs
+                ),
+            ],
+            "depots": _depots(rng, spec, ids, False),
+        },
+    }
+
+
+def _add(tf: tarfile.TarFile, name: str, obj: dict) -> int:
+    raw = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+    info = tarfile.TarInfo(name)
+    info.size = len(raw)
+    info.mtime = 1_700_000_000
+    tf.addfile(info, io.BytesIO(raw))
+    return len(raw)
+
+
+def _write_tar(tf: tarfile.TarFile, spec: SnapshotSpec, info: SnapshotInfo) -> None:
+    rng = random.Random(spec.seed)
+    products = []
+    games: list[int] = []
+    next_build = [_FIRST_BUILD_ID]
+    for n in range(spec.products):
+        product = _product(rng, spec, _FIRST_PRODUCT_ID + n * 7, games, next_build)
+        products.append(product)
+        if product["type"] == "game":
+            games.append(product["id"])
+    dlcs_of: dict[int, list[dict]] = {}
+    for product in products:
+        if product["requires"]:
+            dlcs_of.setdefault(product["requires"][0], []).append(product)
+
+    for product in products:
+        info.member_bytes += _add(tf, f"products/{product['id']}/product.json", product)
+        info.products += 1
+        info.product_ids.append(product["id"])
+        if not spec.manifests:
+            continue
+        for build in product["builds"]:
+            manifest = _manifest(rng, spec, product, build, dlcs_of.get(product["id"], []))
+            info.member_bytes += _add(tf, f"products/{product['id']}/builds/{build['id']}.json", manifest)
+            info.manifests += 1
+            if manifest["version"] == 2:
+                info.gen2_manifests += 1
+            else:
+                info.gen1_manifests += 1
+
+
+def write_snapshot(path: str | Path, spec: SnapshotSpec | None = None) -> SnapshotInfo:
+    """write a snapshot for spec to path (.tar.xz)"""
+    spec = spec or SnapshotSpec()
+    path = Path(path)
+    info = SnapshotInfo(str(path), asdict(spec))
+    if spec.block_size is None or not shutil.which("xz"):
+        with tarfile.open(path, mode="w:xz") as tf:
+            _write_tar(tf, spec, info)
+    else:
+        with tempfile.TemporaryDirectory(dir=path.parent) as tmp:
+            tar_path = Path(tmp) / "snapshot.tar"
+            with tarfile.open(tar_path, mode="w") as tf:
+                _write_tar(tf, spec, info)
+            with open(path, "wb") as f:
+                subprocess.run(["xz", "-T0", f"--block-size={spec.block_size}", "-c", str(tar_path)], stdout=f, check=True)
+    info.compressed_bytes = path.stat().st_size
+    return info
+
+
+def _range(value: str) -> tuple[int, int]:
+    low, _, high = value.partition("-")
+    return int(low), int(high or low)
+
+
+def add_spec_arguments(parser: argparse.ArgumentParser) -> None:
+    """SnapshotSpec fields as --options, for scripts that generate their own snapshot"""
+    defaults = SnapshotSpec()
+    parser.add_argument("--products", type=int, default=defaults.products)
+    parser.add_argument("--builds", type=_range, default=defaults.builds_per_product, metavar="MIN-MAX",
+                        help="Builds per game/DLC")
+    parser.add_argument("--installers", type=_range, default=defaults.installers_per_product, metavar="MIN-MAX",
+                        help="dl_installer entries per product")
+    parser.add_argument("--dlc-ratio", type=float, default=defaults.dlc_ratio)
+    parser.add_argument("--gen2-ratio", type=float, default=defaults.gen2_ratio)
+    parser.add_argument("--depots", type=_range, default=defaults.depots_per_manifest, metavar="MIN-MAX",
+                        help="Depots per build manifest")
+    parser.add_argument("--no-manifests", action="store_true", help="Only write product.json members")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--block-size", type=int, default=None, help="Compress in xz blocks of this size")
+
+
+def spec_from_args(args: argparse.Namespace) -> SnapshotSpec:
+    return SnapshotSpec(
+        products=args.products,
+        builds_per_product=args.builds,
+        installers_per_product=args.installers,
+        dlc_ratio=args.dlc_ratio,
+        gen2_ratio=args.gen2_ratio,
+        depots_per_manifest=args.depots,
+        manifests=not args.no_manifests,
+        seed=args.seed,
+        block_size=args.block_size,
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", type=Path)
+    add_spec_arguments(parser)
+    args = parser.parse_args(argv)
+    info = write_snapshot(args.output, spec_from_args(args))
+    print(
+        f"{info.path}: {info.products} products, {info.manifests} manifests "
+        f"({info.gen1_manifests} gen1, {info.gen2_manifests} gen2), "
+        f"{info.member_bytes / 2**20:.1f} MiB of members, {info.compressed_bytes / 2**20:.1f} MiB compressed"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,35 @@
 #!/usr/bin/env python3
 
 import argparse
+import collections
+import contextlib
+import hashlib
+import http.client
+import io
+import itertools
 import json
 import os
+import re
+import sqlite3
 import subprocess
 import sys
 import tarfile
-from typing import Any, Dict, List, Optional, Iterator
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Iterator, Union
+
+try:
+    from backend.app import json_codec, xz_reader
+except ImportError:  # script copied out of the repository checkout
+    json_codec = xz_reader = None
+
+# snapshot members, jq replies and diff payloads decode through the fastest installed
+# JSON backend when the repository is importable; same results as json.loads
+_json_loads = json_codec.loads if json_codec is not None else json.loads
 
 JQ_FILTER = (
     'select((.type == "game" or .type == "dlc") and .store_state != "coming-soon") '
@@ -15,6 +38,25 @@ JQ_FILTER = (
     '| {id, date_published, version, generation}]}'
 )
 
+# every field catalog_ingest's row extractors read, so a changeset can be applied
+# with the same code path as a full product.json import
+DIFF_FILTER = (
+    '{id,type,slug,title,store_state,global_date,is_in_development,image_boxart,requires,'
+    'dl_installer:[.dl_installer[]? | {id,language,os,version}],'
+    'builds:[.builds[]? | {id,product_id,date_published,generation,version,legacy_build_id,os}]}'
+)
+
+# mode="sql" default: the products catalog_ingest imports, with every field its row
+# extractors read (JQ_FILTER drops requires, build os/product_id/legacy_build_id, ...)
+SQL_FILTER = (
+    'select((.type == "game" or .type == "dlc" or .type == "pack") and .store_state != "coming-soon") | '
+    + DIFF_FILTER
+)
+
+
+ENGINES = ("auto", "native", "coprocess", "jq")
+SOURCE_TYPES = ("path", "url")
+
 
 class UnsupportedModeError(RuntimeError):
     """unsupported combination of arguments"""
@@ -24,23 +66,66 @@ def process_archive(
     *,
     source_type: str = "path",
     mode: str = "json",
-    jq_filter: str = JQ_FILTER,
-) -> List[Dict[str, Any]]:
-    if source_type != "path":
+    jq_filter: Optional[str] = None,
+    engine: str = "auto",
+    output: Optional[str] = None,
+    defer_indexes: bool = False,
+    cache_path: Optional[str] = None,
+) -> Union[List[Dict[str, Any]], int]:
+    """
+    mode="json" returns the filtered products; mode="sql" writes them into the
+    SQLite catalog at output (see write_sql) and returns how many were written.
+    jq_filter defaults to JQ_FILTER for json and SQL_FILTER for sql; a custom filter
+    for sql must keep the fields DIFF_FILTER keeps, or the rows it fills stay empty.
+    """
+    if source_type not in SOURCE_TYPES:
         raise UnsupportedModeError(
             f"source_type={source_type} is not supported (yet)"
         )
-    if mode != "json":
+    if mode not in ("json", "sql"):
         raise UnsupportedModeError(
             f"mode={mode} is not supported (yet)"
         )
-    return list(
-        iter_products(
-            source,
-            source_type=source_type,
-            jq_filter=jq_filter,
-        )
+    if jq_filter is None:
+        jq_filter = SQL_FILTER if mode == "sql" else JQ_FILTER
+    products = iter_products(
+        source,
+        source_type=source_type,
+        jq_filter=jq_filter,
+        engine=engine,
+        cache_path=cache_path,
     )
+    if mode == "sql":
+        if output is None:
+            raise UnsupportedModeError("mode=sql needs an output database path")
+        return write_sql(products, output, defer_indexes=defer_indexes)
+    return list(products)
+
+def write_sql(
+    records: Iterable[Dict[str, Any]],
+    output: str,
+    *,
+    defer_indexes: bool = False,
+    batch_size: int = 5000,
+) -> int:
+    """
+    stream filtered products into the catalog tables of the SQLite file at output
+    (created if missing), in one transaction with batched executemany upserts.
+    rows are extracted as catalog_ingest does for product.json, so records must keep
+    the fields SQL_FILTER keeps (requires, build os, ...). with defer_indexes, the secondary catalog
+    indexes are dropped for the load and built once at the end.
+    """
+    from backend.app import catalog_ingest, db, db_schema
+
+    database = db.Database(output)
+    with database.connect() as conn:
+        if defer_indexes:
+            db_schema.drop_catalog_indexes(conn)
+        count = catalog_ingest.import_product_records(conn, records, batch_size=batch_size)
+        if defer_indexes:
+            db_schema.create_catalog_indexes(conn)
+    database.dispose()
+    return count
 
 def _run_jq_on_bytes(data: bytes, jq_filter: str) -> Optional[Dict[str, Any]]:
     try:
@@ -73,12 +158,882 @@ def _run_jq_on_bytes(data: bytes, jq_filter: str) -> Optional[Dict[str, Any]]:
         return None
 
     try:
-        return json.loads(stdout)
+        return _json_loads(stdout)
     except json.JSONDecodeError as exc:
         raise RuntimeError(
             f"Failed to parse jq output as JSON. Output was: {stdout}"
         ) from exc
 
+# ---------------------------------------------------------------------------
+# native filter engine
+#
+# Covers the subset of jq that JQ_FILTER (and filters shaped like it) use:
+# paths (.a.b, .a[], .[], .["k"], .b[.a]; `?` after any of their terms), pipes,
+# commas, select(), object and array construction, ==/!=/</<=/>/>=, and/or/not,
+# literals, empty, length.
+# Anything else raises _JqCompileError and iter_products falls back to jq.
+# ---------------------------------------------------------------------------
+
+class _JqCompileError(ValueError):
+    """filter uses jq syntax the native engine does not implement"""
+
+
+class _JqRuntimeError(RuntimeError):
+    """native equivalent of a jq runtime error (exit code 5)"""
+
+
+_Filter = Callable[[Any], Iterator[Any]]
+
+_TOKEN_RE = re.compile(
+    r"""\s*(?:
+        (?P<field>\.(?:[A-Za-z_][A-Za-z0-9_]*|"(?:[^"\\]|\\.)*"))
+      | (?P<str>"(?:[^"\\]|\\.)*")
+      | (?P<num>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+      | (?P<ident>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<op>==|!=|<=|>=|\.\.|[.|,:()\[\]{}<>?])
+    )""",
+    re.VERBOSE,
+)
+
+
+def _tokenize(jq_filter: str) -> List[tuple[str, str]]:
+    tokens: List[tuple[str, str]] = []
+    pos = 0
+    end = len(jq_filter.rstrip())
+    while pos < end:
+        m = _TOKEN_RE.match(jq_filter, pos)
+        if m is None:
+            raise _JqCompileError(f"unsupported syntax at offset {pos}: {jq_filter[pos:pos + 20]!r}")
+        kind = m.lastgroup
+        assert kind is not None
+        tokens.append((kind, m.group(kind)))
+        pos = m.end()
+    return tokens
+
+
+def _jq_type(v: Any) -> str:
+    if v is None:
+        return "null"
+    if isinstance(v, bool):
+        return "boolean"
+    if isinstance(v, (int, float)):
+        return "number"
+    if isinstance(v, str):
+        return "string"
+    if isinstance(v, list):
+        return "array"
+    return "object"
+
+
+_TYPE_ORDER = {"null": 0, "boolean": 1, "number": 2, "string": 3, "array": 4, "object": 5}
+
+
+def _jq_sort_key(v: Any) -> tuple:
+    t = _jq_type(v)
+    if t == "array":
+        return (_TYPE_ORDER[t], [_jq_sort_key(x) for x in v])
+    if t == "object":
+        return (_TYPE_ORDER[t], sorted(v), [_jq_sort_key(v[k]) for k in sorted(v)])
+    if t == "null":
+        return (0,)
+    return (_TYPE_ORDER[t], v)
+
+
+def _truthy(v: Any) -> bool:
+    return v is not None and v is not False
+
+
+def _identity(v: Any) -> Iterator[Any]:
+    yield v
+
+
+def _index(v: Any, key: Any) -> Any:
+    if v is None:
+        return None
+    if isinstance(v, dict) and isinstance(key, str):
+        return v.get(key)
+    if isinstance(v, list) and isinstance(key, int) and not isinstance(key, bool):
+        return v[key] if -len(v) <= key < len(v) else None
+    raise _JqRuntimeError(f"Cannot index {_jq_type(v)} with {_jq_type(key)}")
+
+
+def _iterate(v: Any) -> Iterator[Any]:
+    if isinstance(v, list):
+        return iter(v)
+    if isinstance(v, dict):
+        return iter(v.values())
+    raise _JqRuntimeError(f"Cannot iterate over {_jq_type(v)}")
+
+
+class _Parser:
+    """recursive-descent compiler from jq source to generator closures"""
+
+    def __init__(self, jq_filter: str):
+        self.tokens = _tokenize(jq_filter)
+        self.pos = 0
+
+    def _peek(self) -> Optional[tuple[str, str]]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _accept(self, value: str) -> bool:
+        tok = self._peek()
+        if tok is not None and tok[1] == value and tok[0] in ("op", "ident"):
+            self.pos += 1
+            return True
+        return False
+
+    def _expect(self, value: str) -> None:
+        if not self._accept(value):
+            raise _JqCompileError(f"expected {value!r} at token {self.pos}")
+
+    def compile(self) -> _Filter:
+        f = self._pipe()
+        if self._peek() is not None:
+            raise _JqCompileError(f"unexpected token {self._peek()!r}")
+        return f
+
+    def _pipe(self, allow_comma: bool = True) -> _Filter:
+        f = self._comma() if allow_comma else self._or()
+        while self._accept("|"):
+            g = self._comma() if allow_comma else self._or()
+            f = self._compose(f, g)
+        return f
+
+    @staticmethod
+    def _compose(f: _Filter, g: _Filter) -> _Filter:
+        def piped(v: Any) -> Iterator[Any]:
+            for x in f(v):
+                yield from g(x)
+        return piped
+
+    def _comma(self) -> _Filter:
+        parts = [self._or()]
+        while self._accept(","):
+            parts.append(self._or())
+        if len(parts) == 1:
+            return parts[0]
+
+        def comma(v: Any) -> Iterator[Any]:
+            for p in parts:
+                yield from p(v)
+        return comma
+
+    def _or(self) -> _Filter:
+        f = self._and()
+        while self._accept("or"):
+            f = self._bool_op(f, self._and(), is_and=False)
+        return f
+
+    def _and(self) -> _Filter:
+        f = self._compare()
+        while self._accept("and"):
+            f = self._bool_op(f, self._compare(), is_and=True)
+        return f
+
+    @staticmethod
+    def _bool_op(lhs: _Filter, rhs: _Filter, *, is_and: bool) -> _Filter:
+        # jq short-circuits: `false and ...` / `true or ...` never runs rhs
+        def op(v: Any) -> Iterator[Any]:
+            for a in lhs(v):
+                if _truthy(a) != is_and:
+                    yield not is_and
+                    continue
+                for b in rhs(v):
+                    yield _truthy(b)
+        return op
+
+    _COMPARATORS: Dict[str, Callable[[Any, Any], bool]] = {
+        "==": lambda a, b: _jq_sort_key(a) == _jq_sort_key(b),
+        "!=": lambda a, b: _jq_sort_key(a) != _jq_sort_key(b),
+        "<": lambda a, b: _jq_sort_key(a) < _jq_sort_key(b),
+        "<=": lambda a, b: _jq_sort_key(a) <= _jq_sort_key(b),
+        ">": lambda a, b: _jq_sort_key(a) > _jq_sort_key(b),
+        ">=": lambda a, b: _jq_sort_key(a) >= _jq_sort_key(b),
+    }
+
+    def _compare(self) -> _Filter:
+        lhs = self._postfix()
+        tok = self._peek()
+        if tok is None or tok[0] != "op" or tok[1] not in self._COMPARATORS:
+            return lhs
+        self.pos += 1
+        cmp = self._COMPARATORS[tok[1]]
+        rhs = self._postfix()
+
+        # jq evaluates the right-hand side first (outer loop)
+        def compare(v: Any) -> Iterator[Any]:
+            for b in rhs(v):
+                for a in lhs(v):
+                    yield cmp(a, b)
+        return compare
+
+    def _postfix(self) -> _Filter:
+        tok = self._peek()
+        if tok is not None and tok[0] == "field":
+            # a path from `.`: the field is its first suffix
+            f = _identity
+        elif tok == ("op", ".") and self._is_bracket_next():
+            self.pos += 1
+            f = _identity
+        else:
+            f = self._primary()
+        while True:
+            tok = self._peek()
+            if tok == ("op", "["):
+                f = self._bracket_suffix(f)
+            elif tok is not None and tok[0] == "field":
+                f = self._field_suffix(f)
+            elif tok == ("op", ".") and self._is_bracket_next():
+                self.pos += 1
+                f = self._bracket_suffix(f)
+            elif tok == ("op", "?"):
+                # `?` not attached to a suffix (after a parenthesized term, or a second `?`)
+                self.pos += 1
+                f = self._try(f)
+            else:
+                return f
+
+    def _is_bracket_next(self) -> bool:
+        nxt = self.tokens[self.pos + 1] if self.pos + 1 < len(self.tokens) else None
+        return nxt == ("op", "[")
+
+    @staticmethod
+    def _try(f: _Filter) -> _Filter:
+        # jq 1.6 `try`: an error ends the whole term's output, keeping what came before
+        def tried(v: Any) -> Iterator[Any]:
+            try:
+                yield from f(v)
+            except _JqRuntimeError:
+                return
+        return tried
+
+    def _field_suffix(self, f: _Filter) -> _Filter:
+        _, raw = self.tokens[self.pos]
+        self.pos += 1
+        key = raw[1:] if raw[1] != '"' else self._string(raw[1:])
+        optional = self._accept("?")
+
+        def field(v: Any) -> Iterator[Any]:
+            for x in f(v):
+                try:
+                    yield _index(x, key)
+                except _JqRuntimeError:
+                    if not optional:
+                        raise
+        return field
+
+    def _bracket_suffix(self, f: _Filter) -> _Filter:
+        """
+        f[] or f[key]; key is evaluated against the input of the whole path (jq's
+        .b[.a] indexes .b with the input's .a) and is the outer loop. a trailing `?`
+        drops the errors of this index only, per value, as jq's INDEX_OPT/EACH_OPT do.
+        """
+        self._expect("[")
+        if self._accept("]"):
+            optional = self._accept("?")
+
+            def each(v: Any) -> Iterator[Any]:
+                for x in f(v):
+                    try:
+                        items = _iterate(x)
+                    except _JqRuntimeError:
+                        if not optional:
+                            raise
+                        continue
+                    yield from items
+            return each
+        key_f = self._pipe()
+        self._expect("]")
+        optional = self._accept("?")
+
+        def index(v: Any) -> Iterator[Any]:
+            for key in key_f(v):
+                for x in f(v):
+                    try:
+                        yield _index(x, key)
+                    except _JqRuntimeError:
+                        if not optional:
+                            raise
+        return index
+
+    @staticmethod
+    def _string(raw: str) -> str:
+        if "\\(" in raw:
+            raise _JqCompileError("string interpolation is not supported")
+        return json.loads(raw)
+
+    def _primary(self) -> _Filter:
+        tok = self._peek()
+        if tok is None:
+            raise _JqCompileError("unexpected end of filter")
+        kind, value = tok
+        self.pos += 1
+        if kind == "op" and value == ".":
+            return _identity
+        if kind == "str":
+            return self._const(self._string(value))
+        if kind == "num":
+            return self._const(json.loads(value))
+        if kind == "op" and value == "(":
+            f = self._pipe()
+            self._expect(")")
+            return f
+        if kind == "op" and value == "[":
+            if self._accept("]"):
+                return self._const_factory(list)
+            inner = self._pipe()
+            self._expect("]")
+
+            def collect(v: Any) -> Iterator[Any]:
+                yield list(inner(v))
+            return collect
+        if kind == "op" and value == "{":
+            return self._object()
+        if kind == "ident":
+            return self._builtin(value)
+        raise _JqCompileError(f"unsupported token {value!r}")
+
+    @staticmethod
+    def _const(c: Any) -> _Filter:
+        def const(v: Any) -> Iterator[Any]:
+            yield c
+        return const
+
+    @staticmethod
+    def _const_factory(factory: Callable[[], Any]) -> _Filter:
+        def const(v: Any) -> Iterator[Any]:
+            yield factory()
+        return const
+
+    def _builtin(self, name: str) -> _Filter:
+        if name in ("true", "false", "null"):
+            return self._const({"true": True, "false": False, "null": None}[name])
+        if name == "empty":
+            def empty(v: Any) -> Iterator[Any]:
+                return iter(())
+            return empty
+        if name == "not":
+            def negate(v: Any) -> Iterator[Any]:
+                yield not _truthy(v)
+            return negate
+        if name == "length":
+            def length(v: Any) -> Iterator[Any]:
+                if v is None:
+                    yield 0
+                elif isinstance(v, bool):
+                    raise _JqRuntimeError("boolean has no length")
+                elif isinstance(v, (int, float)):
+                    yield abs(v)
+                else:
+                    yield len(v)
+            return length
+        if name == "select":
+            self._expect("(")
+            cond = self._pipe()
+            self._expect(")")
+
+            def select(v: Any) -> Iterator[Any]:
+                for c in cond(v):
+                    if _truthy(c):
+                        yield v
+            return select
+        raise _JqCompileError(f"unsupported builtin {name!r}")
+
+    def _object(self) -> _Filter:
+        entries: List[tuple[str, _Filter]] = []
+        if not self._accept("}"):
+            while True:
+                tok = self._peek()
+                if tok is None or tok[0] not in ("ident", "str"):
+                    raise _JqCompileError(f"unsupported object key at token {self.pos}")
+                self.pos += 1
+                key = tok[1] if tok[0] == "ident" else self._string(tok[1])
+                if self._accept(":"):
+                    entries.append((key, self._object_value()))
+                else:
+                    entries.append((key, self._field_getter(key)))
+                if self._accept("}"):
+                    break
+                self._expect(",")
+
+        keys = [k for k, _ in entries]
+        value_fs = [f for _, f in entries]
+
+        def build(v: Any) -> Iterator[Any]:
+            for values in itertools.product(*(list(f(v)) for f in value_fs)):
+                yield dict(zip(keys, values))
+        return build
+
+    def _object_value(self) -> _Filter:
+        # jq object values may pipe but not comma (comma separates entries)
+        f = self._postfix()
+        while self._accept("|"):
+            f = self._compose(f, self._postfix())
+        return f
+
+    @staticmethod
+    def _field_getter(key: str) -> _Filter:
+        def field(v: Any) -> Iterator[Any]:
+            yield _index(v, key)
+        return field
+
+
+def _compile_native_filter(jq_filter: str) -> Callable[[bytes], Optional[Dict[str, Any]]]:
+    """
+    compile jq_filter once into a callable with the same contract as _run_jq_on_bytes.
+    raises _JqCompileError if the filter is outside the supported subset.
+    """
+    f = _Parser(jq_filter).compile()
+
+    def run(data: bytes) -> Optional[Dict[str, Any]]:
+        try:
+            doc = _json_loads(data)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            # jq exits non-zero without output on unparsable input
+            return None
+        outputs: List[Any] = []
+        try:
+            for out in f(doc):
+                outputs.append(out)
+        except _JqRuntimeError as exc:
+            if outputs:
+                raise RuntimeError(f"jq filter failed after partial output: {exc}") from exc
+            return None
+        if not outputs:
+            return None
+        if len(outputs) > 1:
+            raise RuntimeError(
+                f"Filter produced {len(outputs)} results for one product, expected at most 1"
+            )
+        return outputs[0]
+
+    return run
+
+
+# ---------------------------------------------------------------------------
+# persistent jq coprocess
+#
+# One `jq --seq` process serves the whole run. Every product is followed by a
+# sync marker that the wrapped program echoes back unchanged, so the reader
+# always knows where one product's output ends - even when the product was
+# filtered out, raised a jq error, or was not valid JSON (which --seq skips).
+# ---------------------------------------------------------------------------
+
+_RS = b"\x1e"
+_SYNC_KEY = "__process_archive_sync__"
+
+
+class _JqCoprocessDied(RuntimeError):
+    """jq exited or closed its pipes mid-request"""
+
+
+class _JqCoprocess:
+    def __init__(self, jq_filter: str):
+        self.program = (
+            f'if (type == "object" and has("{_SYNC_KEY}")) then . '
+            f'else (try ["ok", [({jq_filter})]] catch ["error", tostring]) end'
+        )
+        self._proc: Optional[subprocess.Popen] = None
+        self._stderr_tail: Deque[str] = collections.deque(maxlen=20)
+        self._seq = 0
+
+    def _start(self) -> subprocess.Popen:
+        try:
+            proc = subprocess.Popen(
+                ["jq", "-c", "--seq", "--unbuffered", self.program],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        except FileNotFoundError as exc:
+            raise RuntimeError(
+                "jq not on PATH?"
+            ) from exc
+        self._stderr_tail.clear()
+        threading.Thread(
+            target=self._drain_stderr, args=(proc.stderr,), daemon=True
+        ).start()
+        self._proc = proc
+        return proc
+
+    def _drain_stderr(self, stream) -> None:
+        for line in stream:
+            self._stderr_tail.append(line.decode("utf-8", "replace").rstrip())
+
+    def close(self) -> None:
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+
+    def _roundtrip(self, data: bytes) -> List[Any]:
+        proc = self._proc or self._start()
+        self._seq += 1
+        sync = json.dumps({_SYNC_KEY: self._seq}).encode("ascii")
+        try:
+            proc.stdin.write(_RS + data + b"\n" + _RS + sync + b"\n")
+            proc.stdin.flush()
+        except (BrokenPipeError, ValueError) as exc:
+            raise _JqCoprocessDied("jq closed its stdin") from exc
+
+        replies: List[Any] = []
+        while True:
+            line = proc.stdout.readline()
+            if not line:
+                raise _JqCoprocessDied(f"jq exited with code {proc.poll()}")
+            text = line.strip(_RS + b"\n")
+            if not text:
+                continue
+            value = _json_loads(text)
+            if isinstance(value, dict) and _SYNC_KEY in value:
+                if value[_SYNC_KEY] == self._seq:
+                    return replies
+                continue  # leftover marker from a request that died mid-flight
+            replies.append(value)
+
+    def __call__(self, data: bytes) -> Optional[Dict[str, Any]]:
+        try:
+            replies = self._roundtrip(data)
+        except _JqCoprocessDied:
+            # restart once; a second crash on the same input is the input's fault
+            self.close()
+            try:
+                replies = self._roundtrip(data)
+            except _JqCoprocessDied as exc:
+                stderr = " | ".join(self._stderr_tail)
+                self.close()
+                raise RuntimeError(f"jq coprocess crashed twice on this input: {exc}; stderr: {stderr}") from exc
+
+        # no reply: jq --seq skipped an unparsable text, same as an empty jq run
+        if not replies:
+            return None
+        status, payload = replies[0]
+        if status == "error":
+            return None
+        if len(payload) > 1:
+            raise RuntimeError(
+                f"Filter produced {len(payload)} results for one product, expected at most 1"
+            )
+        return payload[0] if payload else None
+
+
+@contextlib.contextmanager
+def _open_filter(jq_filter: str, engine: str) -> Iterator[Callable[[bytes], Optional[Dict[str, Any]]]]:
+    if engine not in ENGINES:
+        raise UnsupportedModeError(f"engine={engine} is not supported")
+    if engine in ("auto", "native"):
+        try:
+            native = _compile_native_filter(jq_filter)
+        except _JqCompileError:
+            if engine == "native":
+                raise
+        else:
+            yield native
+            return
+    if engine == "jq":
+        yield lambda data: _run_jq_on_bytes(data, jq_filter=jq_filter)
+        return
+    coprocess = _JqCoprocess(jq_filter)
+    try:
+        yield coprocess
+    finally:
+        coprocess.close()
+
+_VALIDATOR_SUFFIX = ".validator"
+
+
+def _read_validator(path: str) -> Dict[str, str]:
+    """ETag/Last-Modified recorded for path (a cache file or its .part), {} if none"""
+    try:
+        with open(path + _VALIDATOR_SUFFIX, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {key: value for key, value in data.items() if key in ("etag", "last_modified") and isinstance(value, str)}
+
+
+def _write_validator(path: str, validator: Dict[str, str]) -> None:
+    if not validator:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path + _VALIDATOR_SUFFIX)
+        return
+    with open(path + _VALIDATOR_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump(validator, f)
+
+
+def _response_validator(response) -> Dict[str, str]:
+    validator = {}
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        # If-Range only accepts strong validators
+        validator["etag"] = etag
+    last_modified = response.headers.get("Last-Modified")
+    if last_modified:
+        validator["last_modified"] = last_modified
+    return validator
+
+
+def _if_range(validator: Dict[str, str]) -> Optional[str]:
+    return validator.get("etag") or validator.get("last_modified")
+
+
+def _remove_download(path: str) -> None:
+    for name in (path, path + _VALIDATOR_SUFFIX):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(name)
+
+
+class _HttpSource(io.RawIOBase):
+    """
+    compressed bytes of an http(s) archive, read as they arrive.
+    a dropped connection is resumed with a Range request from the current offset,
+    guarded by If-Range with the first response's ETag (or Last-Modified): if the file
+    changed upstream meanwhile the download fails instead of splicing two versions.
+    with cache_path the bytes are also written to <cache_path>.part, renamed to
+    cache_path once complete; validators are kept next to both in <file>.validator.
+    start() makes the first request: it revalidates a complete cache (conditional GET)
+    and resumes an existing .part only if the server confirms it is the same file;
+    otherwise the .part is discarded and the download starts over.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        cache_path: Optional[str] = None,
+        retries: int = 5,
+        timeout: float = 60.0,
+    ) -> None:
+        self.url = url
+        self.pos = 0
+        self.validator: Dict[str, str] = {}
+        self._retries = retries
+        self._timeout = timeout
+        self._response: Optional[http.client.HTTPResponse] = None
+        self._length: Optional[int] = None
+        self._started = False
+        self._done = False
+        self._discard = False
+        self._cache_path = cache_path
+        self._part_path = None if cache_path is None else cache_path + ".part"
+        self._cache = None
+        self._replaying = False
+
+    def readable(self) -> bool:
+        return True
+
+    def _open(self, headers: Dict[str, str]) -> http.client.HTTPResponse:
+        """urlopen with retries on transient errors; HTTPError (incl. 304/416) propagates"""
+        request = urllib.request.Request(self.url, headers={"User-Agent": "process_archive", **headers})
+        failures = 0
+        while True:
+            try:
+                return urllib.request.urlopen(request, timeout=self._timeout)
+            except urllib.error.HTTPError:
+                raise
+            except (http.client.HTTPException, ConnectionError, TimeoutError, urllib.error.URLError) as exc:
+                failures += 1
+                if failures > self._retries:
+                    raise RuntimeError(f"{self.url}: giving up on connecting: {exc}") from exc
+                time.sleep(min(2 ** (failures - 1), 30))
+
+    def _set_length(self, response: http.client.HTTPResponse) -> None:
+        if response.status == 206:
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            self._length = int(total) if total.isdigit() else None
+        else:
+            length = response.headers.get("Content-Length")
+            self._length = int(length) if length is not None else None
+
+    def start(self) -> bool:
+        """
+        first request; True when the complete cache at cache_path is still current
+        (304), in which case nothing is downloaded and the caller should read the cache
+        """
+        if self._started:
+            return False
+        self._started = True
+        headers: Dict[str, str] = {}
+        part_size = 0
+        part_validator: Dict[str, str] = {}
+        if self._cache_path is not None:
+            if os.path.exists(self._cache_path):
+                cached = _read_validator(self._cache_path)
+                if cached.get("etag"):
+                    headers["If-None-Match"] = cached["etag"]
+                elif cached.get("last_modified"):
+                    headers["If-Modified-Since"] = cached["last_modified"]
+            if os.path.exists(self._part_path):
+                part_validator = _read_validator(self._part_path)
+                if _if_range(part_validator):
+                    part_size = os.path.getsize(self._part_path)
+            if part_size:
+                headers["Range"] = f"bytes={part_size}-"
+                headers["If-Range"] = _if_range(part_validator)
+        try:
+            response = self._open(headers)
+        except urllib.error.HTTPError as exc:
+            if exc.code == 304:
+                return True
+            if exc.code == 416 and part_size:
+                # If-Range matched and nothing lies past the .part: it is complete
+                self.validator = part_validator
+                self._done = True
+                self._resume_part()
+                return False
+            raise
+        if part_size and response.status == 206 and response.headers.get("Content-Range", "").startswith(f"bytes {part_size}-"):
+            self.validator = part_validator
+            self._set_length(response)
+            self._response = response
+            self._resume_part()
+            return False
+        if response.status != 200:
+            response.close()
+            raise RuntimeError(f"{self.url}: unexpected HTTP status {response.status}")
+        # a fresh download: no .part, or the file changed since it was written
+        self.validator = _response_validator(response)
+        self._set_length(response)
+        self._response = response
+        if self._part_path is not None:
+            self._cache = open(self._part_path, "wb")
+            _write_validator(self._part_path, self.validator)
+        return False
+
+    def _resume_part(self) -> None:
+        # "a+b": reads start at 0 (replay), writes always append
+        self._cache = open(self._part_path, "a+b")
+        self._cache.seek(0)
+        self._replaying = True
+
+    def _reconnect(self) -> None:
+        """resume after a dropped connection, at self.pos, only if the file is unchanged"""
+        headers = {"Range": f"bytes={self.pos}-"}
+        if_range = _if_range(self.validator)
+        if if_range:
+            headers["If-Range"] = if_range
+        try:
+            response = self._open(headers)
+        except urllib.error.HTTPError as exc:
+            if exc.code == 416:
+                # nothing left past the bytes we already have
+                self._done = True
+                return
+            raise
+        if response.status != 206:
+            response.close()
+            self._discard = True
+            if if_range:
+                raise RuntimeError(f"{self.url}: changed upstream during the download (at byte {self.pos}); start over")
+            raise RuntimeError(f"{self.url}: server ignored the Range request, cannot resume at byte {self.pos}")
+        previous = self._length
+        self._set_length(response)
+        if not if_range and previous is not None and self._length != previous:
+            # no validator to send: a different total size is the only tell
+            response.close()
+            self._discard = True
+            raise RuntimeError(f"{self.url}: size changed from {previous} to {self._length} during the download")
+        self._response = response
+
+    def _drop(self) -> None:
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+
+    def readinto(self, b) -> int:
+        if not self._started:
+            self.start()
+        if self._replaying:
+            n = self._cache.readinto(b)
+            if n:
+                self.pos += n
+                return n
+            self._replaying = False
+        failures = 0
+        while not self._done:
+            try:
+                if self._response is None:
+                    self._reconnect()
+                    if self._done:
+                        break
+                n = self._response.readinto(b)
+            except (http.client.HTTPException, ConnectionError, TimeoutError, urllib.error.URLError) as exc:
+                if isinstance(exc, urllib.error.HTTPError):
+                    raise
+                self._drop()
+                failures += 1
+                if failures > self._retries:
+                    raise RuntimeError(f"{self.url}: giving up at byte {self.pos}: {exc}") from exc
+                time.sleep(min(2 ** (failures - 1), 30))
+                continue
+            if n == 0:
+                self._drop()
+                if self._length is not None and self.pos < self._length:
+                    # body ended early without an error; resume like a dropped connection
+                    failures += 1
+                    if failures > self._retries:
+                        raise RuntimeError(f"{self.url}: giving up at byte {self.pos} of {self._length}")
+                    continue
+                self._done = True
+                break
+            self.pos += n
+            if self._cache is not None:
+                self._cache.write(b[:n])
+            return n
+        return 0
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self._drop()
+        if self._cache is not None:
+            self._cache.close()
+            if self._discard:
+                _remove_download(self._part_path)
+            elif self._done:
+                os.replace(self._part_path, self._cache_path)
+                _write_validator(self._cache_path, self.validator)
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(self._part_path + _VALIDATOR_SUFFIX)
+        super().close()
+
+
+@contextlib.contextmanager
+def _open_url_archive(url: str, cache_path: Optional[str]) -> Iterator[tarfile.TarFile]:
+    source = _HttpSource(url, cache_path=cache_path)
+    try:
+        if source.start():
+            # 304: the cached copy is what the server has
+            source.close()
+            with _open_archive(cache_path) as tf:
+                yield tf
+            return
+        with tarfile.open(fileobj=io.BufferedReader(source, 1024 * 1024), mode="r|xz") as tf:
+            yield tf
+            # finish the download so the cache copy is complete
+            while source.read(1024 * 1024):
+                pass
+    finally:
+        source.close()
+
+
+def _open_archive(source: str, *, source_type: str = "path", cache_path: Optional[str] = None):
+    """sequential tar reader; multi-block xz archives are decoded on several threads"""
+    if source_type == "url":
+        return _open_url_archive(source, cache_path)
+    if xz_reader is None:
+        return tarfile.open(source, mode="r:xz")
+    return xz_reader.open_tar(source)
+
 def _iter_product_members(tf: tarfile.TarFile):
     for member in tf:
         if not member.isfile():
@@ -91,39 +1046,312 @@ def iter_products(
     *,
     source_type: str = "path",
     jq_filter: str = JQ_FILTER,
+    engine: str = "auto",
+    product_ids: Optional[Iterable[int]] = None,
+    cache_path: Optional[str] = None,
 ) -> Iterator[Dict[str, Any]]:
-    if source_type != "path":
+    """
+    engine selects how jq_filter is applied:
+      - native: in-process engine, compiled once; fails on unsupported filters
+      - coprocess: one long-lived jq process for the whole run
+      - jq: one jq subprocess per product.json
+      - auto: native when the filter compiles, coprocess otherwise
+    product_ids restricts the output to those products, read through the archive's
+    index (backend/app/archive_index.py) instead of a full pass.
+    source_type="url" streams an http(s) archive through the xz decoder while it
+    downloads (see _HttpSource); cache_path keeps a copy of the download there.
+    """
+    if source_type not in SOURCE_TYPES:
         raise UnsupportedModeError(
             f"source_type={source_type} is not supported yet"
         )
 
-    with tarfile.open(source, mode="r:xz") as tf:
+    if product_ids is not None:
+        if source_type != "path":
+            raise UnsupportedModeError("product_ids needs an indexed local archive (source_type=path)")
+        yield from _iter_indexed_products(source, product_ids, jq_filter=jq_filter, engine=engine)
+        return
+
+    with _open_filter(jq_filter, engine) as apply_filter, \
+            _open_archive(source, source_type=source_type, cache_path=cache_path) as tf:
         for member in _iter_product_members(tf):
             f = tf.extractfile(member)
             if f is None:
                 continue
             raw = f.read()
-            record = _run_jq_on_bytes(raw, jq_filter=jq_filter)
+            try:
+                record = apply_filter(raw)
+            except RuntimeError as exc:
+                raise RuntimeError(f"{member.name}: {exc}") from exc
             if record is not None:
                 # yield as soon as we have a product
                 yield record
 
 
+def _iter_indexed_products(
+    source: str,
+    product_ids: Iterable[int],
+    *,
+    jq_filter: str,
+    engine: str,
+) -> Iterator[Dict[str, Any]]:
+    from backend.app import archive_index
+
+    with _open_filter(jq_filter, engine) as apply_filter, \
+            archive_index.ArchiveIndex(Path(source)) as index:
+        for product_id in product_ids:
+            raw = index.read("product", product_id)
+            if raw is None:
+                continue
+            try:
+                record = apply_filter(raw)
+            except RuntimeError as exc:
+                raise RuntimeError(f"product {product_id}: {exc}") from exc
+            if record is not None:
+                yield record
+
+
+# ---------------------------------------------------------------------------
+# snapshot diff
+# ---------------------------------------------------------------------------
+
+def _digest(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _product_summary(product: Dict[str, Any]) -> tuple[str, Dict[str, Any], Dict[str, Any]]:
+    """(content digest, {build id: [version, date_published]}, {installer id: version})"""
+    canonical = json.dumps(product, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    digest = _digest(canonical.encode("utf-8"))
+    builds = {
+        str(b.get("id")): [b.get("version"), b.get("date_published")]
+        for b in product.get("builds") or []
+    }
+    installers = {
+        str(i.get("id")): i.get("version")
+        for i in product.get("dl_installer") or []
+    }
+    return digest, builds, installers
+
+
+def _iter_diff_items(
+    source: str, apply_filter: Callable[[bytes], Optional[Dict[str, Any]]]
+) -> Iterator[tuple[str, Any, Any]]:
+    """
+    ("product", product id, DIFF_FILTER projection) for product.json members and
+    ("manifest", build id, raw bytes) for numeric build manifest members
+    """
+    with _open_archive(source) as tf:
+        for member in tf:
+            if not member.isfile():
+                continue
+            basename = os.path.basename(member.name)
+            is_product = basename == "product.json"
+            is_manifest = basename.endswith(".json") and basename[:-5].isdigit()
+            if not (is_product or is_manifest):
+                continue
+            f = tf.extractfile(member)
+            if f is None:
+                continue
+            raw = f.read()
+            if is_manifest:
+                yield "manifest", int(basename[:-5]), raw
+                continue
+            try:
+                product = apply_filter(raw)
+            except RuntimeError as exc:
+                raise RuntimeError(f"{member.name}: {exc}") from exc
+            if product is not None and product.get("id") is not None:
+                yield "product", product["id"], product
+
+
+def iter_changeset(
+    old_source: str,
+    new_source: str,
+    *,
+    engine: str = "auto",
+) -> Iterator[Dict[str, Any]]:
+    """
+    stream two snapshots and yield what differs, as records:
+      {"op": "added", "id", "product"}
+      {"op": "changed", "id", "new_builds", "changed_builds", "changed_installers",
+       "removed_installers", "product"}
+      {"op": "removed", "id"}
+      {"op": "manifest", "build_id", "manifest"}   (new or changed build manifest)
+    "product" is the DIFF_FILTER projection of the new product.json.
+    the old snapshot is summarized into an on-disk SQLite spill (digests plus build and
+    installer versions per product), so neither archive is held in memory and
+    member order may differ between the two.
+    """
+    with _open_filter(DIFF_FILTER, engine) as apply_filter, \
+            tempfile.TemporaryDirectory(prefix="process_archive_diff_") as tmp:
+        spill = sqlite3.connect(os.path.join(tmp, "old.db"))
+        try:
+            spill.execute(
+                "CREATE TABLE old (id INTEGER PRIMARY KEY, digest TEXT NOT NULL, "
+                "builds TEXT NOT NULL, installers TEXT NOT NULL, seen INTEGER NOT NULL DEFAULT 0)"
+            )
+            spill.execute(
+                "CREATE TABLE old_manifests (build_id INTEGER PRIMARY KEY, digest TEXT NOT NULL, "
+                "seen INTEGER NOT NULL DEFAULT 0)"
+            )
+            for kind, key, payload in _iter_diff_items(old_source, apply_filter):
+                if kind == "manifest":
+                    spill.execute(
+                        "INSERT OR REPLACE INTO old_manifests (build_id, digest) VALUES (?, ?)",
+                        (key, _digest(payload)),
+                    )
+                    continue
+                digest, builds, installers = _product_summary(payload)
+                spill.execute(
+                    "INSERT OR REPLACE INTO old (id, digest, builds, installers) VALUES (?, ?, ?, ?)",
+                    (key, digest, json.dumps(builds), json.dumps(installers)),
+                )
+
+            for kind, key, payload in _iter_diff_items(new_source, apply_filter):
+                if kind == "manifest":
+                    old_manifest = spill.execute(
+                        "SELECT digest FROM old_manifests WHERE build_id = ?", (key,)
+                    ).fetchone()
+                    if old_manifest is not None:
+                        spill.execute("UPDATE old_manifests SET seen = 1 WHERE build_id = ?", (key,))
+                        if old_manifest[0] == _digest(payload):
+                            continue
+                    try:
+                        manifest = _json_loads(payload)
+                    except json.JSONDecodeError:
+                        continue
+                    yield {"op": "manifest", "build_id": key, "manifest": manifest}
+                    continue
+
+                product_id, product = key, payload
+                digest, builds, installers = _product_summary(product)
+                old = spill.execute(
+                    "SELECT digest, builds, installers FROM old WHERE id = ?", (product_id,)
+                ).fetchone()
+                if old is None:
+                    yield {"op": "added", "id": product_id, "product": product}
+                    continue
+                spill.execute("UPDATE old SET seen = 1 WHERE id = ?", (product_id,))
+                old_digest, old_builds_raw, old_installers_raw = old
+                if old_digest == digest:
+                    continue
+                old_builds = json.loads(old_builds_raw)
+                old_installers = json.loads(old_installers_raw)
+                build_ids = {str(b.get("id")): b.get("id") for b in product.get("builds") or []}
+                yield {
+                    "op": "changed",
+                    "id": product_id,
+                    "new_builds": [build_ids[b] for b in builds if b not in old_builds],
+                    "changed_builds": [
+                        build_ids[b] for b in builds if b in old_builds and old_builds[b] != builds[b]
+                    ],
+                    "changed_installers": [
+                        i for i in installers
+                        if i not in old_installers or old_installers[i] != installers[i]
+                    ],
+                    "removed_installers": [i for i in old_installers if i not in installers],
+                    "product": product,
+                }
+
+            for (product_id,) in spill.execute("SELECT id FROM old WHERE seen = 0 ORDER BY id"):
+                yield {"op": "removed", "id": product_id}
+        finally:
+            spill.close()
+
+
+def _write_json_lines(records: Iterator[Dict[str, Any]]) -> None:
+    for record in records:
+        json.dump(record, sys.stdout, ensure_ascii=False, separators=(',', ':'))
+        sys.stdout.write('\n')
+
+
+def _diff_cli(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="process_archive diff",
+        description="emit a JSON-lines changeset between two GOGDB daily snapshots",
+    )
+    parser.add_argument("old", help="Path to the older .tar.xz archive.")
+    parser.add_argument("new", help="Path to the newer .tar.xz archive.")
+    parser.add_argument("--engine", choices=ENGINES, default="auto")
+    args = parser.parse_args(argv)
+    _write_json_lines(iter_changeset(args.old, args.new, engine=args.engine))
+    return 0
+
+
 def _cli(argv: Optional[list[str]] = None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ["diff"]:
+        return _diff_cli(argv[1:])
+
     parser = argparse.ArgumentParser(
-        description="collate product.json from a GOGDB daily snapshot"
+        description="collate product.json from a GOGDB daily snapshot "
+        "(or 'diff OLD NEW' for a changeset between two snapshots)"
     )
     parser.add_argument(
         "source",
-        help="Path to the .tar.xz archive (local file).",
+        help="Path (or, with --source-type url, http(s) URL) of the .tar.xz archive.",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["json", "sql"],
+        default="json",
+        help="Write JSON lines to stdout (json) or load the catalog tables of --output (sql).",
+    )
+    parser.add_argument(
+        "--output",
+        help="SQLite database file for --mode sql (created if missing).",
+    )
+    parser.add_argument(
+        "--defer-indexes",
+        action="store_true",
+        help="With --mode sql, drop the catalog indexes during the load and build them afterwards.",
+    )
+    parser.add_argument(
+        "--source-type",
+        choices=SOURCE_TYPES,
+        default="path",
+        help="Read source as a local file (path) or stream it over http(s) (url).",
+    )
+    parser.add_argument(
+        "--cache",
+        dest="cache_path",
+        help="With --source-type url, keep the downloaded archive here. It is revalidated "
+        "(ETag/Last-Modified) before reuse, and a partial download (CACHE.part) is resumed "
+        "only if the server file is unchanged.",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="auto",
+        help="Filter engine: in-process (native), one long-lived jq (coprocess), "
+        "jq subprocess per file (jq), or native with coprocess fallback (auto).",
+    )
+    parser.add_argument(
+        "--product-id",
+        dest="product_ids",
+        type=int,
+        action="append",
+        help="Only emit this product (repeatable); needs an index from backend/app/archive_index.py",
     )
-    # parser.add_argument("--mode", choices=["json", "sql"], default="json", ...)
-    # parser.add_argument("--source-type", choices=["path", "url"], default="path", ...)
     args = parser.parse_args(argv)
+    if args.mode == "sql" and args.output is None:
+        parser.error("--mode sql requires --output")
 
-    for product in iter_products(args.source, source_type="path"):
-        json.dump(product, sys.stdout, ensure_ascii=False, separators=(',', ':'))
-        sys.stdout.write('\n')
+    products = iter_products(
+        args.source,
+        source_type=args.source_type,
+        jq_filter=SQL_FILTER if args.mode == "sql" else JQ_FILTER,
+        engine=args.engine,
+        product_ids=args.product_ids,
+        cache_path=args.cache_path,
+    )
+    if args.mode == "sql":
+        count = write_sql(products, args.output, defer_indexes=args.defer_indexes)
+        print(f"{count} products written to {args.output}", file=sys.stderr)
+        return 0
+    _write_json_lines(products)
     return 0
 
 if __name__ == "__main__":
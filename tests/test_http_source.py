@@ -0,0 +1,171 @@
+"""
+process_archive over http(s), against a local http.server stand-in that supports
+Range/If-Range, ETag/If-None-Match and dropping the connection mid-body.
+"""
+
+import io
+import json
+import os
+import sys
+import tarfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import process_archive  # noqa: E402
+
+
+def _archive(titles: list[str]) -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:xz") as tf:
+        for n, title in enumerate(titles):
+            product = {
+                "id": 1000 + n, "type": "game", "slug": f"p{n}", "title": title, "store_state": "default",
+                "image_boxart": None, "global_date": None, "is_in_development": False, "dl_installer": [],
+                # incompressible padding, so the archive spans several reads
+                "builds": [{"id": n, "os": "windows", "date_published": "2024", "version": os.urandom(2000).hex(),
+                            "generation": 2}],
+            }
+            raw = json.dumps(product).encode()
+            info = tarfile.TarInfo(f"products/{1000 + n}/product.json")
+            info.size = len(raw)
+            tf.addfile(info, io.BytesIO(raw))
+    return buf.getvalue()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        server = self.server
+        server.requests.append(dict(self.headers))
+        body, etag = server.body, server.etag
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        start = 0
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header and (if_range is None or if_range == etag):
+            start = int(range_header.removeprefix("bytes=").rstrip("-"))
+        if start >= len(body) and range_header and start:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(body)}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(206 if start else 200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body) - start))
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        self.end_headers()
+        payload = body[start:]
+        if server.drop_after is not None:
+            # send part of the body, then hang up (once)
+            payload, server.drop_after = payload[:server.drop_after], None
+            self.wfile.write(payload)
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.requests = []
+    httpd.drop_after = None
+    httpd.body = _archive([f"old {n}" for n in range(20)])
+    httpd.etag = '"v1"'
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _url(httpd) -> str:
+    return f"http://127.0.0.1:{httpd.server_address[1]}/snapshot.tar.xz"
+
+
+def _titles(httpd, cache: Path) -> list[str]:
+    products = process_archive.iter_products(_url(httpd), source_type="url", cache_path=str(cache), engine="native")
+    return [product["title"] for product in products]
+
+
+def test_fresh_download_is_cached_and_revalidated(server, tmp_path):
+    cache = tmp_path / "snapshot.tar.xz"
+    assert _titles(server, cache) == [f"old {n}" for n in range(20)]
+    assert cache.read_bytes() == server.body
+    assert not Path(f"{cache}.part").exists()
+
+    # unchanged upstream: 304, the cache is read
+    server.requests.clear()
+    assert _titles(server, cache) == [f"old {n}" for n in range(20)]
+    assert server.requests[0]["If-None-Match"] == '"v1"'
+
+    # changed upstream: the cache is replaced
+    server.body, server.etag = _archive([f"new {n}" for n in range(20)]), '"v2"'
+    assert _titles(server, cache) == [f"new {n}" for n in range(20)]
+    assert cache.read_bytes() == server.body
+
+
+def test_dropped_connection_resumes_with_if_range(server, tmp_path):
+    cache = tmp_path / "snapshot.tar.xz"
+    server.drop_after = len(server.body) // 3
+    assert _titles(server, cache) == [f"old {n}" for n in range(20)]
+    assert cache.read_bytes() == server.body
+    resumed = [headers for headers in server.requests if "Range" in headers]
+    assert resumed and resumed[0]["If-Range"] == '"v1"'
+    assert resumed[0]["Range"] == f"bytes={len(server.body) // 3}-"
+
+
+def test_partial_download_resumes(server, tmp_path):
+    cache = tmp_path / "snapshot.tar.xz"
+    half = len(server.body) // 2
+    Path(f"{cache}.part").write_bytes(server.body[:half])
+    Path(f"{cache}.part.validator").write_text(json.dumps({"etag": '"v1"'}))
+    assert _titles(server, cache) == [f"old {n}" for n in range(20)]
+    assert server.requests[0]["Range"] == f"bytes={half}-"
+    assert cache.read_bytes() == server.body
+
+
+def test_stale_partial_download_is_discarded(server, tmp_path):
+    cache = tmp_path / "snapshot.tar.xz"
+    old = server.body
+    Path(f"{cache}.part").write_bytes(old[: len(old) // 2])
+    Path(f"{cache}.part.validator").write_text(json.dumps({"etag": '"v1"'}))
+    server.body, server.etag = _archive([f"new {n}" for n in range(20)]), '"v2"'
+    assert _titles(server, cache) == [f"new {n}" for n in range(20)]
+    assert cache.read_bytes() == server.body
+
+
+def test_partial_download_without_validator_starts_over(server, tmp_path):
+    cache = tmp_path / "snapshot.tar.xz"
+    Path(f"{cache}.part").write_bytes(b"left over from some other file")
+    assert _titles(server, cache) == [f"old {n}" for n in range(20)]
+    assert "Range" not in server.requests[0]
+    assert cache.read_bytes() == server.body
+
+
+def test_upstream_change_mid_download_fails(server, tmp_path):
+    cache = tmp_path / "snapshot.tar.xz"
+    server.drop_after = len(server.body) // 3
+    products = process_archive.iter_products(_url(server), source_type="url", cache_path=str(cache), engine="native")
+    next(products)
+    server.body, server.etag = _archive([f"new {n}" for n in range(20)]), '"v2"'
+    with pytest.raises(RuntimeError, match="changed upstream"):
+        list(products)
+    assert not cache.exists()
+    assert not Path(f"{cache}.part").exists()
@@ -0,0 +1,67 @@
+"""
+catalog_ingest.import_archive run counts: members that yield no rows count as
+skipped, and an incremental run reports the same counts as a full one.
+"""
+
+import io
+import json
+import sys
+import tarfile
+from dataclasses import asdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.app import catalog_ingest, db  # noqa: E402
+
+_COUNTS = [
+    f"{status}_{kind}s"
+    for kind in ("product", "build")
+    for status in ("new", "changed", "skipped", "unchanged", "vanished")
+]
+
+
+def _product(product_id: int, **extra) -> dict:
+    product = {
+        "id": product_id, "type": "game", "slug": f"p{product_id}", "title": f"Product {product_id}",
+        "store_state": "default", "image_boxart": None, "global_date": None, "is_in_development": False,
+        "dl_installer": [], "builds": [],
+    }
+    product.update(extra)
+    return product
+
+
+def _write_archive(path: Path, products: list[dict]) -> None:
+    with tarfile.open(path, mode="w:xz") as tf:
+        for product in products:
+            raw = json.dumps(product).encode()
+            info = tarfile.TarInfo(f"products/{product['id']}/product.json")
+            info.size = len(raw)
+            tf.addfile(info, io.BytesIO(raw))
+
+
+def _counts(stats: catalog_ingest.ImportStats) -> dict[str, int]:
+    values = asdict(stats)
+    return {name: values[name] for name in _COUNTS}
+
+
+def test_incremental_and_full_runs_count_alike(tmp_path):
+    before, after = tmp_path / "before.tar.xz", tmp_path / "after.tar.xz"
+    _write_archive(before, [_product(1), _product(2)])
+    # product 2 goes back to coming-soon: its old catalog row stays, but it yields no rows now
+    _write_archive(after, [_product(1), _product(2, store_state="coming-soon"), _product(3, type="movie")])
+
+    database = db.Database(str(tmp_path / "catalog.db"))
+    with database.connect() as conn:
+        catalog_ingest.import_archive(conn, before)
+        first = _counts(catalog_ingest.import_archive(conn, after))
+        incremental = _counts(catalog_ingest.import_archive(conn, after))
+        full = _counts(catalog_ingest.import_archive(conn, after, incremental=False))
+    database.dispose()
+
+    assert first["changed_products"] == 0
+    assert first["skipped_products"] == 2
+    assert first["unchanged_products"] == 1
+    assert incremental == full
+    assert incremental["skipped_products"] == 2
+    assert incremental["unchanged_products"] == 1
@@ -0,0 +1,69 @@
+"""
+the native filter engine against jq itself: same filter, same input, same result
+(engine="auto" prefers native whenever a filter compiles, so any difference would
+silently change what gets emitted).
+"""
+
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import process_archive  # noqa: E402
+
+pytestmark = pytest.mark.skipif(shutil.which("jq") is None, reason="jq is not installed")
+
+_PRODUCT = {
+    "id": 1, "type": "dlc", "slug": "p1", "title": "Product 1", "store_state": "default",
+    "global_date": None, "is_in_development": False, "image_boxart": None, "requires": [7],
+    "dl_installer": [{"id": "i1", "language": {"code": "en"}, "os": "linux", "version": "1.0"}],
+    "builds": [
+        {"id": 10, "product_id": 1, "os": "windows", "date_published": "2024", "version": "1", "generation": 2},
+        {"id": 11, "product_id": 1, "os": "osx", "date_published": "2024", "version": "1", "generation": 1},
+    ],
+}
+
+CASES = [
+    # index keys see the path's input, not the value being indexed
+    ("{v: .b[.a]}", {"a": 1, "b": [5, 2, 7]}),
+    ("{v: .b[.a]}", {"a": "k", "b": {"k": 3}}),
+    ("{v: [.b[.a, .c]]}", {"a": 0, "c": 2, "b": [5, 2, 7]}),
+    ("{v: [(.a, .b)[(0, 1)]]}", {"a": [1, 2], "b": [3, 4]}),
+    ("{v: [.[(.x, .y)]]}", {"x": "y", "y": "x"}),
+    ("{v: .b[.a][.c]}", {"a": "k", "c": "m", "b": {"k": {"m": 4}}}),
+    # `?` covers the last suffix, per value
+    ("{v: [.a[].b?]}", {"a": [1, {"b": 2}]}),
+    ("{v: [.a[]?.b]}", {"a": [1]}),
+    ("{v: [.a[]?]}", {"a": 1}),
+    ("{v: [(.a, .b)[]?]}", {"a": 1, "b": [3]}),
+    ("{v: [.a?.b]}", {"a": {"b": 1}}),
+    ("{v: [.a.b?]}", [1]),
+    ("{v: [.a[.k]?]}", {"a": [1], "k": "x"}),
+    ('{v: [.["a"]?]}', [1]),
+    ("{v: [(1, .a, 3)?]}", [1]),
+    ("{v: [.a??]}", [1]),
+    # the shipped filters
+    (process_archive.JQ_FILTER, _PRODUCT),
+    (process_archive.DIFF_FILTER, _PRODUCT),
+    (process_archive.SQL_FILTER, _PRODUCT),
+    (process_archive.SQL_FILTER, dict(_PRODUCT, store_state="coming-soon")),
+]
+
+
+def _outcome(run, data: bytes):
+    try:
+        return run(data)
+    except RuntimeError:
+        return "error"
+
+
+@pytest.mark.parametrize("jq_filter, doc", CASES)
+def test_native_matches_jq(jq_filter, doc):
+    data = json.dumps(doc).encode()
+    native = process_archive._compile_native_filter(jq_filter)
+    expected = _outcome(lambda raw: process_archive._run_jq_on_bytes(raw, jq_filter), data)
+    assert _outcome(native, data) == expected
@@ -0,0 +1,57 @@
+"""
+process_archive mode="sql": the default projection keeps what catalog_ingest's row
+extractors read, so build os and DLC parents reach the catalog tables.
+"""
+
+import io
+import json
+import sqlite3
+import sys
+import tarfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import process_archive  # noqa: E402
+
+
+def _product(product_id: int, product_type: str, **extra) -> dict:
+    product = {
+        "id": product_id, "type": product_type, "slug": f"p{product_id}", "title": f"Product {product_id}",
+        "store_state": "default", "image_boxart": None, "global_date": None, "is_in_development": False,
+        "dl_installer": [{"id": f"installer_{product_id}", "language": {"code": "en"}, "os": "linux", "version": "1.0"}],
+        "builds": [{"id": product_id * 10, "product_id": product_id, "os": "osx", "date_published": "2024-01-01",
+                    "version": "1.0", "generation": 2, "legacy_build_id": 7}],
+    }
+    product.update(extra)
+    return product
+
+
+def _write_archive(path: Path, products: list[dict]) -> None:
+    with tarfile.open(path, mode="w:xz") as tf:
+        for product in products:
+            raw = json.dumps(product).encode()
+            info = tarfile.TarInfo(f"products/{product['id']}/product.json")
+            info.size = len(raw)
+            tf.addfile(info, io.BytesIO(raw))
+
+
+def test_sql_mode_keeps_extractor_fields(tmp_path):
+    archive = tmp_path / "snapshot.tar.xz"
+    _write_archive(archive, [
+        _product(1, "game"),
+        _product(2, "dlc", requires=[1]),
+        _product(3, "pack"),
+        _product(4, "game", store_state="coming-soon"),
+        _product(5, "movie"),
+    ])
+    output = tmp_path / "catalog.db"
+    count = process_archive.process_archive(str(archive), mode="sql", output=str(output), engine="native")
+
+    conn = sqlite3.connect(output)
+    assert count == 3
+    assert sorted(row[0] for row in conn.execute("SELECT id FROM catalog_products")) == [1, 2, 3]
+    assert conn.execute("SELECT parent_id, dlc_id FROM catalog_dlcs").fetchall() == [(1, 2)]
+    assert set(conn.execute("SELECT os, legacy_build_id FROM catalog_builds")) == {("osx", 7)}
+    assert set(conn.execute("SELECT os FROM catalog_installers")) == {("linux",)}
+    conn.close()